@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+from core.utils.calculator import calculate_score
+from core.utils.executor import EXECUTOR_KINDS
+from core.utils.noun_extraction import generate_corpus
+
+'''
+load_test.py
+
+Measures request latency (p50/p99) with many concurrent clients, for each executor kind.
+
+For every kind, the API is started with uvicorn (GREEN_BITE_EXECUTOR=<kind>), and the clients send it a mix of
+requests over HTTP: mostly /score with a recipe of random ingredient strings (random quantities, so the parse cache
+doesn't hide the cost), and some cheap /cache/stats requests. With the "inline" executor the scoring blocks the
+event loop, so every other request, cheap or not, queues up behind it.
+
+Run with: python -m benchmarks.load_test --clients 32 --requests 20
+'''
+
+
+def make_recipe(corpus: list, size: int) -> list:
+    return [f'{random.randint(1, 500)} {random.choice(corpus)}' for _ in range(size)]
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind: str, port: int, workers: int, max_pending: int) -> subprocess.Popen:
+    environment = dict(os.environ, GREEN_BITE_EXECUTOR=kind, GREEN_BITE_MAX_PENDING=str(max_pending))
+    if workers:
+        environment['GREEN_BITE_WORKERS'] = str(workers)
+    return subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+                            env=environment)
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get('/cache/stats')
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError('The server did not start')
+
+
+async def client_session(client: httpx.AsyncClient, corpus: list, requests: int, recipe_size: int, latencies: dict):
+    for _ in range(requests):
+        start = time.perf_counter()
+        if random.random() < 0.2:
+            kind = 'cheap'
+            response = await client.get('/cache/stats')
+        else:
+            kind = 'score'
+            response = await client.post('/score', params={'ingredients': make_recipe(corpus, recipe_size)})
+        latencies[kind].append(time.perf_counter() - start)
+        latencies['status'].append(response.status_code)
+
+
+async def run_load(base_url: str, clients: int, requests: int, recipe_size: int) -> dict:
+    # Leave out ingredients matching SHARP rows without GHGE/land use data, their NaN score can't be sent as JSON.
+    corpus = [string.split(' ', 1)[1] for string in generate_corpus(size=500)]
+    corpus = [ingredient for ingredient in corpus if calculate_score(f'1 {ingredient}') == calculate_score(f'1 {ingredient}')]
+    latencies = {'score': [], 'cheap': [], 'status': []}
+
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        await wait_until_up(client)
+        # Warm up the server (and its pool), so startup is not part of the measurement.
+        await client.post('/score', params={'ingredients': make_recipe(corpus, recipe_size)})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_session(client, corpus, requests, recipe_size, latencies) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    summary = {'requests per second': len(latencies['status']) / elapsed,
+               'rejected (503)': latencies['status'].count(503)}
+    for kind in ['score', 'cheap']:
+        milliseconds = np.array(latencies[kind]) * 1000
+        summary[f'{kind} p50 ms'] = np.percentile(milliseconds, 50)
+        summary[f'{kind} p99 ms'] = np.percentile(milliseconds, 99)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--recipe-size', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--kinds', nargs='+', default=list(EXECUTOR_KINDS), choices=EXECUTOR_KINDS)
+    args = parser.parse_args()
+
+    for kind in args.kinds:
+        port = get_free_port()
+        # Allow every client to be in flight at once, so the comparison measures latency rather than rejections.
+        server = start_server(kind, port, args.workers, max_pending=args.clients)
+        try:
+            summary = asyncio.run(run_load(f'http://127.0.0.1:{port}', args.clients, args.requests, args.recipe_size))
+        finally:
+            server.terminate()
+            server.wait()
+        print(kind.ljust(8) + '  '.join(f'{name}: {value:.1f}' for name, value in summary.items()))
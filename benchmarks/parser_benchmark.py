@@ -0,0 +1,74 @@
+from fractions import Fraction
+import re
+import sys
+import timeit
+import unicodedata
+from core.utils.ingredient_parser import blacklisted_words, get_quantity, get_unit_of_measurement, lex, list_of_units
+from core.utils.noun_extraction import generate_corpus
+
+'''
+parser_benchmark.py
+
+Compares the per string cost of the precompiled lexer ("ingredient_lexer.py") against the regex functions it replaced,
+which are kept below as a reference. Noun extraction is left out, as it is the same for both.
+
+Run with: python -m benchmarks.parser_benchmark [number of strings]
+'''
+
+
+def regex_description(raw_string: str, unit_exclusion_list: list = list_of_units) -> str:
+    string = re.sub(r'[¼-¾⅐-⅞↉]+', '', raw_string)
+    string = re.sub(r"\([^()]*\)", "", string)
+    string = re.sub(r'[0-9]+', '', string)
+    string = re.sub('|'.join(unit_exclusion_list), '', string)
+    string = re.sub('|'.join(blacklisted_words), '', string)
+    string = re.sub(',', '', string)
+    return string.strip()
+
+
+def regex_quantity(raw_string: str) -> float:
+    quantity = 0.0
+    find_fraction_symbols = re.search(r'[¼-¾⅐-⅞↉]+', raw_string)
+    find_written_fractions = re.search(r'(?:[1-9][0-9]*|0)\/[1-9][0-9]*', raw_string)
+    find_integers = re.search(r'[0-9]+', raw_string)
+
+    if bool(find_fraction_symbols):
+        quantity += unicodedata.numeric(find_fraction_symbols.group(0))
+    if bool(find_written_fractions):
+        quantity += float(Fraction(find_written_fractions.group(0)))
+    if bool(find_integers):
+        quantity += int(find_integers.group(0))
+    return quantity
+
+
+def regex_unit(raw_string: str, unit_list: list = list_of_units) -> str:
+    search = re.search('|'.join(unit_list), raw_string)
+    return search.group(0) if search else 'whole'
+
+
+def regex_parse(raw_string: str) -> tuple:
+    return regex_quantity(raw_string), regex_unit(raw_string), regex_description(raw_string)
+
+
+def benchmark(corpus: list, repeat: int = 5) -> dict:
+    '''Returns the best per string cost (in microseconds) of each implementation over the corpus.'''
+    implementations = {
+        'regex: quantity + unit + description': regex_parse,
+        'lexer: quantity + unit + description': lex,
+        'regex: quantity': regex_quantity,
+        'lexer: get_quantity': get_quantity,
+        'regex: unit': regex_unit,
+        'lexer: get_unit_of_measurement': get_unit_of_measurement,
+    }
+
+    results = {}
+    for name, function in implementations.items():
+        seconds = min(timeit.repeat(lambda: [function(string) for string in corpus], number=1, repeat=repeat))
+        results[name] = seconds / len(corpus) * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    corpus = generate_corpus(size=int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    for name, microseconds in benchmark(corpus).items():
+        print(f'{name:<40} {microseconds:8.2f} µs per string')
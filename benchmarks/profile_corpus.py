@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+from core.utils.cache import invalidate_caches
+from core.utils.calculator import score_ingredient
+from core.utils.profiler import merge_profiles, profile_call
+from benchmarks.suite import generate_ingredient_strings
+
+'''
+profile_corpus.py
+
+Profiles the scoring of a corpus of ingredient strings, to find the hotspots of the pipeline (see "core/utils/profiler.py").
+
+Every string is scored under the profiler, and the profiles are added up into:
+
+|- hotspots.txt / hotspots.json: The functions with the most self time, with their total time and number of calls.
+|- stacks.collapsed: The call stacks in the collapsed format, for flamegraph.pl ("flamegraph.pl stacks.collapsed >
+|                    flamegraph.svg"), speedscope or inferno.
+|- slowest.txt: The ingredient strings that took the longest (with the profiler's overhead).
+
+The corpus is a text file with one ingredient string per line, a JSONL file of recipes ({"ingredients": [...]}), or
+generated like the benchmark suite's. With --cold, the caches are cleared before every string, to profile the work
+that is otherwise cached.
+
+Run with: python -m benchmarks.profile_corpus --corpus ingredients.txt --output-dir profiles
+'''
+
+
+def read_corpus(path: str) -> list:
+    with open(path) as file:
+        if path.endswith('.jsonl'):
+            return [ingredient for line in file if line.strip() for ingredient in json.loads(line)['ingredients']]
+        return [line.strip() for line in file if line.strip()]
+
+
+def profile_corpus(ingredient_strings: list, cold: bool = False) -> tuple:
+    '''Scores every string under the profiler, returns the merged Profile and the profiles of every string.'''
+    profiles = []
+    for ingredient_string in ingredient_strings:
+        if cold:
+            invalidate_caches()
+        profiles.append(profile_call(ingredient_string, score_ingredient, ingredient_string)[1])
+    return merge_profiles(profiles, f'{len(ingredient_strings)} ingredient strings'), profiles
+
+
+def format_hotspots(hotspots: list) -> str:
+    lines = [f'{"self ms":>10} {"total ms":>10} {"calls":>8}  function']
+    lines += [f'{row["selfMs"]:10.3f} {row["totalMs"]:10.3f} {row["calls"]:8d}  {row["function"]}' for row in hotspots]
+    return '\n'.join(lines) + '\n'
+
+
+def write_reports(profile, profiles: list, directory: str, limit: int = 30, slowest: int = 20):
+    os.makedirs(directory, exist_ok=True)
+    hotspots = profile.hotspots(limit)
+    with open(os.path.join(directory, 'hotspots.txt'), 'w') as file:
+        file.write(format_hotspots(hotspots))
+    with open(os.path.join(directory, 'hotspots.json'), 'w') as file:
+        json.dump(profile.summary(limit), file, indent=2)
+    with open(os.path.join(directory, 'stacks.collapsed'), 'w') as file:
+        file.write(profile.collapsed())
+    with open(os.path.join(directory, 'slowest.txt'), 'w') as file:
+        for string_profile in sorted(profiles, key=lambda p: p.seconds, reverse=True)[:slowest]:
+            file.write(f'{string_profile.seconds * 1000:10.3f} ms  {string_profile.name}\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile the scoring of a corpus of ingredient strings.')
+    parser.add_argument('--corpus', default=None, help='Text file (one string per line) or JSONL recipes (default: generated)')
+    parser.add_argument('--size', type=int, default=1000, help='Number of strings to generate, without --corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cold', action='store_true', help='Clear the caches before every string')
+    parser.add_argument('--limit', type=int, default=30, help='Number of hotspots reported')
+    parser.add_argument('--output-dir', default='profiles')
+    args = parser.parse_args()
+
+    corpus = read_corpus(args.corpus) if args.corpus else generate_ingredient_strings(args.size, seed=args.seed)
+    # Load the data first, so it isn't part of the profile.
+    score_ingredient(corpus[0])
+    profile, profiles = profile_corpus(corpus, cold=args.cold)
+    write_reports(profile, profiles, args.output_dir, args.limit)
+    print(format_hotspots(profile.hotspots(args.limit)))
+    print(f'Reports written to {args.output_dir}/')
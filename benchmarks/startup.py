@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+'''
+startup.py
+
+Measures how long a fresh worker takes before it serves its first request quickly, i.e when a pod is autoscaled.
+
+Every run starts a new Python process, which:
+
+|- Imports the app (without loading any data, see "core/utils/startup.py").
+|- Warms up (loads the dataset, builds the noun extractor, scores a first ingredient, starts the executor), or not.
+|- Sends a first /score request through the ASGI app, and times it.
+
+With the warm-up, the first request is as fast as any other, the cost is paid before /ready reports ready.
+Without it ("lazy"), the first request pays for loading the data.
+
+Run with: python -m benchmarks.startup --repeat 5
+'''
+
+FIRST_REQUEST = ['1 cup of milk', '2 tablespoons sugar', '3 eggs']
+
+
+async def send_first_request(app) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        start = time.perf_counter()
+        response = await client.post('/score', params={'ingredients': FIRST_REQUEST})
+        elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+def measure_in_process(warm_up: bool) -> dict:
+    '''Times the startup of this process (run it in a fresh one), returns seconds per phase.'''
+    start = time.perf_counter()
+    from main import app
+    from core.utils.executor import get_executor
+    from core.utils.startup import get_readiness
+    timings = {'import': time.perf_counter() - start}
+
+    if warm_up:
+        start = time.perf_counter()
+        get_readiness().warm_up()
+        timings['warm_up'] = time.perf_counter() - start
+
+    timings['first_request'] = asyncio.run(send_first_request(app))
+    get_executor().shutdown()
+    return timings
+
+
+def measure_startup(warm_up: bool) -> dict:
+    '''Runs measure_in_process() in a new Python process.'''
+    command = [sys.executable, '-m', 'benchmarks.startup', '--child'] + ([] if warm_up else ['--lazy'])
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize_startup(seconds: list) -> dict:
+    milliseconds = np.array(seconds) * 1000
+    return {'unit': 'ms', 'min': float(milliseconds.min()), 'median': float(np.median(milliseconds)),
+            'repeat': len(seconds)}
+
+
+def run_startup_benchmarks(repeat: int = 3) -> dict:
+    warm = [measure_startup(warm_up=True) for _ in range(repeat)]
+    lazy = [measure_startup(warm_up=False) for _ in range(repeat)]
+
+    return {
+        'import main': summarize_startup([run['import'] for run in warm + lazy]),
+        'warm-up': summarize_startup([run['warm_up'] for run in warm]),
+        'ready (import + warm-up)': summarize_startup([run['import'] + run['warm_up'] for run in warm]),
+        'first /score (warm)': summarize_startup([run['first_request'] for run in warm]),
+        'first /score (lazy)': summarize_startup([run['first_request'] for run in lazy]),
+        'import + first /score (lazy)': summarize_startup([run['import'] + run['first_request'] for run in lazy]),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the startup time of a worker.')
+    parser.add_argument('--repeat', type=int, default=5, help='Processes started per measurement (the median is kept)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--lazy', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_process(warm_up=not args.lazy)))
+    else:
+        for name, result in run_startup_benchmarks(args.repeat).items():
+            print(f"{name:<30} {result['median']:10.1f} {result['unit']}  (min {result['min']:.1f})")
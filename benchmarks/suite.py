@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import csv
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import httpx
+import numpy as np
+from core.utils.cache import invalidate_caches
+from core.utils.calculator import calculate_score, get_match_candidates, lookup_weight_in_grams, match_ingredient, match_row_ids
+from core.utils.executor import configure_executor, get_executor
+from core.utils.ingredient_parser import get_ingredient_description, get_quantity, get_unit_of_measurement
+from core.utils.snapshot import frequencies_csv
+from benchmarks.startup import run_startup_benchmarks
+
+'''
+suite.py
+
+The benchmark suite: a performance baseline for the parser, matcher, scorer and HTTP endpoints, runs offline against
+the bundled CSVs.
+
+|- Microbenchmarks: get_quantity, get_unit_of_measurement, get_ingredient_description, match_ingredient,
+|                   match_row_ids, get_match_candidates, lookup_weight_in_grams and calculate_score, cold (caches cleared) and warm where it matters.
+|- End to end: latency (p50/p95/p99) and throughput of /parse and /score, through the ASGI app (no network).
+|- Startup: time to import the app, warm up and serve a first request, in fresh processes (see "startup.py").
+
+The corpora are generated from "ingredient_frequency.csv" with a fixed seed: ingredients are drawn weighted by how
+often they occur in recipes, with random quantities and units. The same seed and sizes always give the same corpus.
+
+Results are written as JSON. Comparing two result files flags every benchmark that got slower by more than the
+threshold (the exit code is 1 if any did), so a baseline can be checked in CI or before merging.
+
+Run with:  python -m benchmarks.suite run --output results.json
+Compare:   python -m benchmarks.suite compare baseline.json results.json --threshold 0.1
+'''
+
+RESULTS_VERSION = 1
+
+QUANTITIES = ['1', '2', '3', '4', '½', '1½', '1/2', '3/4', '250', '500', '1 (14 ounce)']
+UNITS = ['', 'cup', 'cups', 'tablespoons', 'teaspoon', 'ounces', 'pound', 'grams', 'kg', 'liter', 'pinch', 'can']
+TEMPLATES = ['{quantity} {unit} {ingredient}', '{quantity} {unit} of {ingredient}', '{quantity} {unit} {ingredient}, chopped']
+
+
+def generate_ingredient_strings(size: int, seed: int = 0, frequencies_filepath: str = frequencies_csv,
+                                vocabulary: int = 500) -> list:
+    '''
+    Generates ingredient strings such as "2 cups of shredded cheddar cheese". Ingredients are drawn from the vocabulary
+    most frequent names, weighted by their frequency, so common ingredients repeat as they would in real recipes.
+    '''
+    with open(frequencies_filepath, newline='') as file:
+        rows = sorted(csv.DictReader(file), key=lambda row: int(row['frequency']), reverse=True)[:vocabulary]
+    names = [row['ingredient_name'] for row in rows]
+    weights = [int(row['frequency']) for row in rows]
+
+    generator = random.Random(seed)
+    strings = []
+    for name in generator.choices(names, weights=weights, k=size):
+        template = generator.choice(TEMPLATES)
+        string = template.format(quantity=generator.choice(QUANTITIES), unit=generator.choice(UNITS), ingredient=name)
+        strings.append(' '.join(string.split()))
+    return strings
+
+
+def generate_recipes(count: int, seed: int = 0, min_size: int = 4, max_size: int = 16, **kwargs) -> list:
+    '''Generates count recipes, each a list of min_size to max_size ingredient strings.'''
+    generator = random.Random(seed)
+    sizes = [generator.randint(min_size, max_size) for _ in range(count)]
+    strings = iter(generate_ingredient_strings(sum(sizes), seed=seed, **kwargs))
+    return [[next(strings) for _ in range(size)] for size in sizes]
+
+
+def summarize(seconds: list, count: int) -> dict:
+    '''Per call statistics (in microseconds) over repeated timings of count calls each.'''
+    per_call = np.array(seconds) / count * 1e6
+    return {'unit': 'us', 'min': float(per_call.min()), 'median': float(np.median(per_call)), 'repeat': len(seconds),
+            'calls': count}
+
+
+def measure(function, inputs: list, repeat: int = 5, setup=None) -> dict:
+    '''Times function over every input, repeat times. setup() runs before every repeat, outside of the timing.'''
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for argument in inputs:
+            function(argument)
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds, len(inputs))
+
+
+def run_microbenchmarks(size: int = 1000, seed: int = 0, repeat: int = 5) -> dict:
+    strings = generate_ingredient_strings(size, seed=seed)
+    # Unique descriptions, so the cold match benchmark doesn't hit the cache for repeated ingredients.
+    descriptions = list(dict.fromkeys(get_ingredient_description(string) for string in strings))
+    nouns = [description.split()[-1] for description in descriptions if description]
+
+    return {
+        'get_quantity': measure(get_quantity, strings, repeat),
+        'get_unit_of_measurement': measure(get_unit_of_measurement, strings, repeat),
+        'get_ingredient_description': measure(get_ingredient_description, strings, repeat),
+        'match_ingredient (cold)': measure(match_ingredient, descriptions, repeat, setup=invalidate_caches),
+        'match_ingredient (warm)': measure(match_ingredient, descriptions, repeat),
+        'match_row_ids (cold)': measure(match_row_ids, descriptions, repeat, setup=invalidate_caches),
+        'match_row_ids (warm)': measure(match_row_ids, descriptions, repeat),
+        'get_match_candidates (top 5)': measure(get_match_candidates, descriptions, repeat),
+        'lookup_weight_in_grams': measure(lookup_weight_in_grams, nouns, repeat),
+        'calculate_score (cold)': measure(calculate_score, strings, repeat, setup=invalidate_caches),
+        'calculate_score (warm)': measure(calculate_score, strings, repeat),
+    }
+
+
+def summarize_requests(latencies: list, elapsed: float) -> dict:
+    milliseconds = np.array(latencies) * 1000
+    return {'unit': 'ms', 'p50': float(np.percentile(milliseconds, 50)), 'p95': float(np.percentile(milliseconds, 95)),
+            'p99': float(np.percentile(milliseconds, 99)), 'median': float(np.percentile(milliseconds, 50)),
+            'requests': len(latencies), 'requests_per_second': len(latencies) / elapsed}
+
+
+async def send_requests(client: httpx.AsyncClient, requests: list, concurrency: int) -> dict:
+    '''Sends (method, url, params) requests with concurrency clients. Every response must be a 200.'''
+    queue = iter(requests)
+    latencies = []
+
+    async def worker():
+        for method, url, params in queue:
+            start = time.perf_counter()
+            response = await client.request(method, url, params=params)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize_requests(latencies, time.perf_counter() - start)
+
+
+async def run_endpoint_benchmarks(requests: int = 200, seed: int = 0, concurrency: int = 8) -> dict:
+    from main import app
+
+    # Keep the configured executor, but let every client be in flight at once, so no request is rejected.
+    executor = get_executor()
+    configure_executor(kind=executor.kind, workers=executor.workers,
+                       max_pending=max(executor.max_pending, concurrency))
+
+    strings = generate_ingredient_strings(requests * 2, seed=seed)
+    recipes = generate_recipes(requests, seed=seed)
+
+    # The ingredient string is a path parameter in /parse, so it can't contain a "/" (i.e "1/2 cup").
+    parse_requests = [('GET', f'/parse/ingredient/{string}', None) for string in strings if '/' not in string][:requests]
+    score_requests = [('POST', '/score', {'ingredients': recipe}) for recipe in recipes if recipe]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        for name, endpoint_requests in [('/parse', parse_requests), ('/score', score_requests)]:
+            # Cold runs start with empty caches, warm runs repeat the same requests right after.
+            invalidate_caches()
+            results[f'{name} (cold, sequential)'] = await send_requests(client, endpoint_requests, 1)
+            results[f'{name} (warm, sequential)'] = await send_requests(client, endpoint_requests, 1)
+            results[f'{name} (warm, concurrent)'] = await send_requests(client, endpoint_requests, concurrency)
+    get_executor().shutdown()
+    return results
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(size: int = 1000, requests: int = 200, seed: int = 0, repeat: int = 5, concurrency: int = 8,
+              endpoints: bool = True, startup: bool = True) -> dict:
+    results = {'micro': run_microbenchmarks(size, seed, repeat)}
+    if endpoints:
+        results['endpoints'] = asyncio.run(run_endpoint_benchmarks(requests, seed, concurrency))
+    if startup:
+        results['startup'] = run_startup_benchmarks(repeat)
+
+    return {
+        'version': RESULTS_VERSION,
+        'metadata': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': get_git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {'size': size, 'requests': requests, 'seed': seed, 'repeat': repeat, 'concurrency': concurrency},
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    '''
+    Compares the median (per call or per request) of every benchmark present in both runs.
+    Returns one row per benchmark, with regression set when it got slower by more than threshold (i.e 0.1 = 10%).
+    '''
+    rows = []
+    for group, benchmarks in current['results'].items():
+        for name, result in benchmarks.items():
+            base = baseline['results'].get(group, {}).get(name)
+            if base is None or not base['median']:
+                continue
+            change = result['median'] / base['median'] - 1
+            rows.append({'benchmark': f'{group}: {name}', 'unit': result['unit'], 'baseline': base['median'],
+                         'current': result['median'], 'change': change, 'regression': change > threshold})
+    return rows
+
+
+def print_results(results: dict):
+    for group, benchmarks in results['results'].items():
+        for name, result in benchmarks.items():
+            extra = f"  {result['requests_per_second']:9.1f} req/s" if 'requests_per_second' in result else ''
+            print(f"{group:<10} {name:<34} {result['median']:10.2f} {result['unit']}{extra}")
+
+
+def print_comparison(rows: list):
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else ''
+        print(f"{row['benchmark']:<46} {row['baseline']:10.2f} -> {row['current']:10.2f} {row['unit']:<3}"
+              f" {row['change']:+7.1%}  {flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the benchmark suite, or compare two of its result files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument('--output', default=None, help='Write the results to this JSON file')
+    run_parser.add_argument('--size', type=int, default=1000, help='Ingredient strings in the microbenchmark corpus')
+    run_parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint benchmark')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=5, help='Repeats per microbenchmark (the median is kept)')
+    run_parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients in the concurrent runs')
+    run_parser.add_argument('--no-endpoints', action='store_true', help='Skip the end to end benchmarks')
+    run_parser.add_argument('--no-startup', action='store_true', help='Skip the startup benchmarks')
+    run_parser.add_argument('--baseline', default=None, help='Compare the results against this JSON file')
+    run_parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown flagged as a regression (0.1 = 10%%)')
+
+    compare_parser = commands.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown flagged as a regression (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        current = run_suite(args.size, args.requests, args.seed, args.repeat, args.concurrency, not args.no_endpoints,
+                            not args.no_startup)
+        print_results(current)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(current, file, indent=2)
+        baseline_path = args.baseline
+    else:
+        with open(args.current) as file:
+            current = json.load(file)
+        baseline_path = args.baseline
+
+    if baseline_path:
+        with open(baseline_path) as file:
+            comparison = compare_results(json.load(file), current, args.threshold)
+        print_comparison(comparison)
+        sys.exit(1 if any(row['regression'] for row in comparison) else 0)
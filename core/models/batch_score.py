@@ -0,0 +1,48 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class Recipe(BaseModel):
+    id: Optional[str] = None
+    ingredients: List[str]
+
+
+class BatchScoreRequest(BaseModel):
+    recipes: List[Recipe] = [
+        Recipe(id="milk-pudding", ingredients=["1 cups of milk", "3 tablespoons sugar", "2 tablespoons cornstarch"])
+    ]
+
+
+class IngredientScore(BaseModel):
+    inputIngredientString: str
+    ingredientMatched: Optional[str] = None
+    sustainabilityScore: float
+
+
+class RecipeScore(BaseModel):
+    id: Optional[str] = None
+    sustainabilityScore: float
+    ingredients: List[IngredientScore]
+
+
+class BatchScoreResponse(BaseModel):
+    recipes: List[RecipeScore]
+    datasetVersion: Optional[str] = None
+
+
+class PartialIngredientScore(BaseModel):
+    inputIngredientString: str
+    status: str  # "scored", "unmatched" or "timedOut"
+    ingredientMatched: Optional[str] = None
+    sustainabilityScore: Optional[float] = None  # Left out when timed out
+
+
+class PartialRecipeScore(BaseModel):
+    id: Optional[str] = None
+    status: str  # "complete", or "partial" when any ingredient timed out
+    sustainabilityScore: float  # The sum of the ingredients that were scored
+    ingredients: List[PartialIngredientScore]
+
+
+class PartialScoreResponse(BaseModel):
+    recipes: List[PartialRecipeScore]
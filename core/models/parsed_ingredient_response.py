@@ -1,18 +1,46 @@
 from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class WeightDetails(BaseModel):
+    ingredient: Optional[str] = None  # The weight table entry, left out when the default weight was used
+    grams: float
+    isDefault: bool
+
+
+class DensityDetails(BaseModel):
+    foodItem: Optional[str] = None  # The density table entry, left out when the default density was used
+    gramsPerMl: float
+    isDefault: bool
 
 
 class Details(BaseModel):
     quantity: float
     measurement: str
     description: str
+    # The weight of one whole unit, only included for 'whole' measurements
+    weight: Optional[WeightDetails] = None
+    # The density used to weigh the volume, only included for volume measurements
+    density: Optional[DensityDetails] = None
+
+
+class MatchCandidate(BaseModel):
+    foodItem: str
+    similarity: float
 
 
 class ParsedIngredientResponse(BaseModel):
     inputIngredientString: str = "1 kg of bacon"
-    ingredientMatched: str = "bacon"
+    ingredientMatched: Optional[str] = "bacon"  # null when nothing matched (the score is 0)
     sustainabilityScore: float = 26.05213129
     details: Details = {
         "quantity": 1.0,
         "measurement": "kg",
         "description": "bacon"
     }
+    # Milliseconds spent per pipeline stage, only included when requested with ?timings=true
+    timings: Optional[Dict[str, float]] = None
+    # The most similar SHARP food items, only included when requested with ?candidates=<k>
+    candidates: Optional[List[MatchCandidate]] = None
+    # The version of the dataset the ingredient was scored with (see GET /dataset)
+    datasetVersion: Optional[str] = None
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class FoodItemScore(BaseModel):
+    foodItem: str
+    measurement: str  # Whole units are weighed in grams
+    quantity: float  # Summed over the ingredients of the group
+    sustainabilityScore: float
+    ingredients: List[str]
+
+
+class ScoreBreakdownResponse(BaseModel):
+    sustainabilityScore: float
+    foodItems: List[FoodItemScore]
+    unmatched: List[str]  # Ingredient strings without a match, they score 0
+    datasetVersion: Optional[str] = None
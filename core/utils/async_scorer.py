@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from typing import List, Optional
+import os
+import time
+from core.utils.budget import BudgetExceeded, time_budget
+from core.utils.calculator import ScoredIngredient, score_ingredient
+from core.utils.executor import ScoringExecutor, get_executor
+
+'''
+async_scorer.py
+
+Scores many recipes within a time budget, and returns partial results instead of failing or stalling.
+
+|- Every distinct ingredient string (across all recipes) is scored once, as its own task on the executor.
+|- The request gets a time budget (GREEN_BITE_INGREDIENT_BUDGET_MS, 100 ms by default), shared by all of its ingredients
+|  and counted from when it arrived, so time spent queued for the executor counts too. Once it's spent, the request
+|  returns with whatever was scored by then, without waiting for the rest: queued ingredients are cancelled, and the
+|  ones running give up at their next budget check (see "budget.py"). Until they have, the request still counts
+|  towards GREEN_BITE_MAX_PENDING (see "executor.py").
+|- Every ingredient gets a status: "scored", "unmatched" (scores 0) or "timedOut" (no score). A recipe's score is the
+|  sum of its scored ingredients, and its status is "partial" when any of them timed out.
+'''
+
+INGREDIENT_BUDGET = float(os.environ.get('GREEN_BITE_INGREDIENT_BUDGET_MS', 100)) / 1000
+
+SCORED = 'scored'
+UNMATCHED = 'unmatched'
+TIMED_OUT = 'timedOut'
+
+
+@dataclass
+class IngredientOutcome:
+    raw_string: str
+    status: str
+    result: Optional[ScoredIngredient] = None  # None when timed out
+    score: Optional[float] = None  # None when timed out
+
+
+@dataclass
+class RecipeOutcome:
+    ingredients: List[IngredientOutcome]
+    score: float
+    status: str  # 'complete' or 'partial'
+
+
+def score_within_budget(ingredient_string: str, deadline: float) -> Optional[ScoredIngredient]:
+    '''Scores an ingredient string before the deadline (a time.time()), returns None if it ran out.'''
+    try:
+        # The deadline is a wall clock time, so it means the same in the processes of a process pool.
+        with time_budget(deadline - time.time()):
+            return score_ingredient(ingredient_string)
+    except BudgetExceeded:
+        return None
+
+
+def get_outcome(ingredient_string: str, result: Optional[ScoredIngredient]) -> IngredientOutcome:
+    if result is None:
+        return IngredientOutcome(ingredient_string, TIMED_OUT)
+    status = SCORED if result.food_item is not None else UNMATCHED
+    return IngredientOutcome(ingredient_string, status, result, result.score)
+
+
+async def score_recipes(recipes: List[List[str]], budget: float = INGREDIENT_BUDGET,
+                        executor: ScoringExecutor = None) -> List[RecipeOutcome]:
+    '''
+    Scores every recipe (a list of ingredient strings), within budget seconds from now for all of the ingredients.
+    Returns after at most about budget seconds, ingredients that weren't scored by then have timed out.
+    '''
+    deadline = time.time() + budget
+    executor = executor or get_executor()
+    ingredient_strings = list(dict.fromkeys(ingredient for recipe in recipes for ingredient in recipe))
+    results = await executor.map_items(score_within_budget, ingredient_strings, deadline, timeout=budget)
+    outcomes = {string: get_outcome(string, result) for string, result in zip(ingredient_strings, results)}
+
+    recipe_outcomes = []
+    for recipe in recipes:
+        ingredients = [outcomes[ingredient] for ingredient in recipe]
+        score = sum(outcome.score for outcome in ingredients if outcome.score is not None)
+        status = 'partial' if any(outcome.status == TIMED_OUT for outcome in ingredients) else 'complete'
+        recipe_outcomes.append(RecipeOutcome(ingredients, score, status))
+    return recipe_outcomes
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from typing import List
+from core.utils.calculator import lookup_density, lookup_weight_in_grams, match_row_id
+from core.utils.dataset import Dataset, get_dataset
+from core.utils.ingredient_parser import get_parsed_string
+from core.utils.measurement_conversions import convert_measurements_to_kg
+from core.utils.metrics import match_misses
+
+'''
+batch_scorer.py
+
+Scores many recipes at once. Produces the same scores as calling calculate_score() on every ingredient string, but:
+
+|- Identical ingredient strings are parsed and matched only once for the whole batch.
+|- Unit conversions (with the density of each matched food item) and the GHGE/land use arithmetic are done as
+|  array operations over all unique strings.
+|- Per recipe scores are summed with a single np.bincount().
+'''
+
+
+def match_unique_ingredients(ingredient_strings, dataset: Dataset = None) -> pd.DataFrame:
+    '''Parses and matches each ingredient string, returns one row per string with the data needed to score it.'''
+    dataset = dataset or get_dataset()
+    rows = []
+    for ingredient_string in ingredient_strings:
+        parsed = get_parsed_string(ingredient_string)
+        row_id = match_row_id(parsed['description'], dataset)
+        if row_id is None:
+            match_misses.inc()
+        rows.append((parsed['quantity'], parsed['measurement'], parsed['description'], -1 if row_id is None else row_id))
+
+    ingredients = pd.DataFrame(rows, columns=['quantity', 'measurement', 'description', 'row_id'])
+    row_ids = ingredients['row_id'].to_numpy(dtype=np.intp)
+    matched = row_ids >= 0
+
+    # Gather the matched rows from the columnar SHARP table (see "food_store.py").
+    foods = dataset.foods
+    ingredients['food_item'] = [foods.names[row_id] if row_id >= 0 else None for row_id in row_ids]
+    ingredients['GHGE'] = np.where(matched, foods.ghge[row_ids], np.nan)
+    ingredients['Land Use'] = np.where(matched, foods.land_use[row_ids], np.nan)
+    return ingredients
+
+
+def score_unique_ingredients(ingredients: pd.DataFrame, dataset: Dataset = None) -> np.ndarray:
+    '''Calculates the sustainability score of every row returned by match_unique_ingredients().'''
+    quantity = ingredients['quantity'].to_numpy(dtype=float)
+    measurement = ingredients['measurement'].to_numpy(dtype=object)
+
+    # Whole units are weighed with the weight table, and converted from grams.
+    whole = measurement == 'whole'
+    grams = np.ones(len(quantity))
+    grams[whole] = [lookup_weight_in_grams(description, dataset=dataset) for description in ingredients['description'].to_numpy()[whole]]
+    quantity = np.where(whole, grams * quantity, quantity)
+    measurement = np.where(whole, 'grams', measurement)
+
+    densities = [lookup_density(food_item, dataset).grams_per_ml for food_item in ingredients['food_item']]
+    quantity_kg = convert_measurements_to_kg(measurement, quantity, densities, errors='coerce')
+    land_use = pd.to_numeric(ingredients['Land Use'], errors='coerce').to_numpy(dtype=float)
+    ghge = pd.to_numeric(ingredients['GHGE'], errors='coerce').to_numpy(dtype=float)
+
+    scores = (quantity_kg * land_use) + (quantity_kg * ghge)
+
+    # Unknown measurements, missing matches and SHARP rows without data all score 0.
+    return np.nan_to_num(scores, nan=0.0)
+
+
+def score_batch(recipes: List[List[str]]):
+    '''
+    Scores a batch of recipes, each given as a list of ingredient strings.
+
+    Returns a dataframe with one row per ingredient string (in input order) and the recipe it belongs to,
+    as well as an array with the summed score of each recipe. The whole batch is scored with the same dataset,
+    its version is in ingredients.attrs['dataset_version'].
+    '''
+    dataset = get_dataset()
+    ingredient_strings = [ingredient for recipe in recipes for ingredient in recipe]
+    recipe_ids = np.repeat(np.arange(len(recipes)), [len(recipe) for recipe in recipes])
+
+    # codes maps every ingredient string to its position in unique_strings.
+    codes, unique_strings = pd.factorize(pd.Series(ingredient_strings, dtype=object))
+
+    unique_ingredients = match_unique_ingredients(unique_strings, dataset)
+    unique_scores = score_unique_ingredients(unique_ingredients, dataset)
+
+    ingredients = pd.DataFrame({
+        'recipe': recipe_ids,
+        'ingredient': ingredient_strings,
+        'food_item': unique_ingredients['food_item'].to_numpy(dtype=object)[codes],
+        'score': unique_scores[codes],
+    })
+    ingredients.attrs['dataset_version'] = dataset.version
+    recipe_scores = np.bincount(recipe_ids, weights=ingredients['score'].to_numpy(), minlength=len(recipes))
+
+    return ingredients, recipe_scores
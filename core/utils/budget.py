@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+'''
+budget.py
+
+Time budgets for scoring a single ingredient, so one pathological string can't hold up a whole recipe.
+
+A budget is set around the work with time_budget(seconds). Python can't interrupt a running function, so the scoring
+pipeline checks the budget itself with check_budget(), before each step that can be expensive (matching, and the
+approximate match). Once the budget is spent, check_budget() raises BudgetExceeded. Outside of time_budget() it
+does nothing.
+
+The deadline is kept in a ContextVar, so concurrent requests (threads or tasks) each have their own.
+'''
+
+_deadline = ContextVar('deadline', default=None)
+
+
+class BudgetExceeded(Exception):
+    '''Raised by check_budget() once the time budget is spent.'''
+
+
+@contextmanager
+def time_budget(seconds: float):
+    '''Sets a time budget of seconds (from now) for the work inside the block.'''
+    token = _deadline.set(time.perf_counter() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def check_budget():
+    deadline = _deadline.get()
+    if deadline is not None and time.perf_counter() > deadline:
+        raise BudgetExceeded()
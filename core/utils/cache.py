@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+'''
+cache.py
+
+Size bounded LRU caches for the parse and match steps of the scoring pipeline.
+
+Recipes repeat the same ingredient strings over and over ("1 cup milk", "2 eggs"), so the results of parsing a raw
+string, and of matching a description against the SHARP-DB, are kept in memory and reused.
+
+The caches are configured through environment variables:
+
+|- GREEN_BITE_CACHE_SIZE: Max number of entries per cache (default 4096, 0 disables caching).
+|- GREEN_BITE_CACHE_TTL: Seconds before an entry expires (default: never).
+
+Every cache is registered on creation, so invalidate_caches() can clear all of them when the data is reloaded.
+Persistent caches (see "disk_cache.py") are keyed by dataset version instead, they are only registered for their stats.
+'''
+
+DEFAULT_CACHE_SIZE = int(os.environ.get('GREEN_BITE_CACHE_SIZE', 4096))
+DEFAULT_CACHE_TTL = float(os.environ['GREEN_BITE_CACHE_TTL']) if os.environ.get('GREEN_BITE_CACHE_TTL') else None
+
+_registered_caches = {}
+_persistent_caches = {}
+_invalidation_hooks = []
+
+
+class LRUCache:
+    '''A thread safe, least recently used cache with an optional time to live for its entries.'''
+
+    def __init__(self, name: str, maxsize: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        _registered_caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        '''Returns the cached value for key, or calls compute(key) and caches the result.'''
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # The entry is stale, treat it as a miss.
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        value = compute(key)
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        '''Stores a value, evicting the least recently used entries if the cache is full.'''
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        '''Removes every entry. The counters are kept, so the hit rate survives an invalidation.'''
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hitRate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def register_persistent_cache(name: str, cache):
+    '''Registers a cache that survives invalidations, so its stats are reported by get_cache_stats().'''
+    _persistent_caches[name] = cache
+
+
+def register_invalidation_hook(hook):
+    '''Registers a callable that is run (without arguments) whenever invalidate_caches() is called.'''
+    _invalidation_hooks.append(hook)
+
+
+def invalidate_caches():
+    '''Clears every registered cache. Must be called whenever the data CSVs are reloaded.'''
+    for cache in _registered_caches.values():
+        cache.clear()
+    for hook in _invalidation_hooks:
+        hook()
+
+
+def get_cache_stats() -> dict:
+    '''Returns the stats of every registered cache, keyed by cache name.'''
+    caches = {**_registered_caches, **_persistent_caches}
+    return {name: cache.stats() for name, cache in caches.items()}
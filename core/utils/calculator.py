@@ -1,49 +1,55 @@
+import os
 import pandas as pd
 import warnings
-from core.utils.measurement_conversions import convert_measurement_to_kg
-from core.utils.ingredient_parser import get_ingredient_description, get_quantity, get_unit_of_measurement
+from dataclasses import dataclass, field
+from typing import List, Optional
+from core.utils.measurement_conversions import DensityEntry, UnknownUnitError, canonical_unit, convert_measurement_to_kg, is_volume
+from core.utils.ingredient_parser import get_parsed_string
+from core.utils.weight_index import WeightEntry
+from core.utils.budget import check_budget
+from core.utils.cache import LRUCache
+from core.utils.disk_cache import get_disk_cache
+from core.utils.metrics import match_misses, stage_timer
+from core.utils.dataset import Dataset, get_dataset
 
 # Mute irrelevant pandas warnings
 warnings.filterwarnings('ignore', category=UserWarning)
 
 
-# Filepath to CSV data
-sharp_csv = 'core/data/SHARP.csv'
-frequencies_csv = 'core/data/ingredient_frequency.csv'
-weight_table_csv = 'core/data/weight_table.csv'
+def __getattr__(name: str):
+    # The tables and indexes of the current dataset, i.e calculator.sharp (kept for code that reads them directly).
+    if name == 'data_source':
+        return get_dataset().source
+    if name in Dataset._fields:
+        return getattr(get_dataset(), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
-sharp = pd.read_csv(sharp_csv,
-                    usecols=[
-                        "Food item", "GHGE of 1 kg food as consumed_kgCO2eq",
-                        "Land use of 1 kg food as consumed_m2_yr"
-                    ])
+# (Dataset version, normalized ingredient description, use_frequencies) -> Row IDs of the SHARP matches.
+match_cache = LRUCache('match')
+# Optional persistent cache behind match_cache, shared by the workers on this host (see "disk_cache.py").
+disk_match_cache = get_disk_cache('match')
+# Number of the most frequent ingredient names matched ahead of time into the disk cache, see warm_disk_cache().
+disk_cache_warm_size = int(os.environ.get('GREEN_BITE_DISK_CACHE_WARM', 1000))
 
-# Apply .map() to each column (Series) in the DataFrame
-for column in sharp.select_dtypes(include=['object']).columns:  # select columns with strings
-    sharp[column] = sharp[column].map(lambda s: s.lower() if isinstance(s, str) else s)
+# Descriptions without an exact match are matched approximately, to the most similar name at or above the threshold.
+fuzzy_matching = os.environ.get('GREEN_BITE_FUZZY_MATCHING', 'true').lower() not in ('0', 'false', 'no')
+fuzzy_threshold = float(os.environ.get('GREEN_BITE_FUZZY_THRESHOLD', 0.4))
 
-sharp = sharp.rename(columns={"GHGE of 1 kg food as consumed_kgCO2eq": 'GHGE',
-                              "Land use of 1 kg food as consumed_m2_yr": 'Land Use'})
-food_weights = pd.read_csv(weight_table_csv)
-frequencies = pd.read_csv(frequencies_csv)
-frequencies = frequencies.sort_values('frequency', ascending=False)
 
+def lookup_weight(parsed_ingredient_description: str, dataset: Dataset = None) -> WeightEntry:
+    '''Finds the weight table entry for one whole unit of an ingredient, or the default weight if there is none.'''
+    return (dataset or get_dataset()).weight_index.lookup(parsed_ingredient_description)
 
-def lookup_weight_in_grams(parsed_ingredient_description: str = "egg") -> int:
+
+def lookup_density(food_item: str, dataset: Dataset = None) -> DensityEntry:
+    '''Finds the density table entry for a SHARP food item, or the default density if there is none.'''
+    return (dataset or get_dataset()).density_index.lookup(food_item)
+
+
+def lookup_weight_in_grams(parsed_ingredient_description: str = "egg", dataset: Dataset = None) -> float:
     # Utility function for finding the weight of one whole unit of an ingredient:
-    try:
-        # See if any entry in the 'ingredients' column conatins the parameter - parsed_ingredient_description
-        search_result_weights = food_weights[food_weights['ingredient'].str.contains(
-            parsed_ingredient_description
-        )]
-        search_result_weights = search_result_weights.reset_index()
-        item_weight = int(search_result_weights.at[0, 'grams'])
-        return item_weight
-    except KeyError:
-        return 0
-    except ValueError:
-        return 0
+    return lookup_weight(parsed_ingredient_description, dataset).grams
 
 
 '''
@@ -53,129 +59,306 @@ This file handles the retrieval of GHGE and LU data from the SHARP dataset. By m
 '''
 
 
-def match_ingredient(ingredient_description: str, use_frequencies: bool = True) -> pd.DataFrame:
+def match_row_ids(ingredient_description: str, use_frequencies: bool = True, dataset: Dataset = None) -> tuple:
     '''
-    Performs a regex.search() on all Food Item names in the SHARP-DB, and returns a dataframe with potential matches. The first match is used by default.
+    Finds the SHARP rows whose Food item name contains the ingredient description, and returns their row IDs (see
+    "food_store.py"). When use_frequencies is set, only the most frequently used one (according to
+    ingredient_frequency.csv) is returned.
+
+    Descriptions are matched literally, characters such as "(" or "." have no special meaning. Descriptions that
+    aren't found in any name are matched approximately instead (see find_similar_row_ids()), unless
+    GREEN_BITE_FUZZY_MATCHING is disabled. No match is an empty tuple.
+
+    The match is made against the given dataset, or the current one (see "dataset.py"). Results are cached per dataset
+    version and (lowercased) description in match_cache, and in disk_match_cache when GREEN_BITE_DISK_CACHE is set.
     '''
-    search_result_sharp = None
-    ingredient_description = ingredient_description.lower()
+    dataset = dataset or get_dataset()
+    return match_cache.get_or_compute((dataset.version, ingredient_description.lower(), use_frequencies),
+                                      lambda key: lookup_row_ids(key[1:], dataset))
+
+
+def get_disk_cache_key(key: tuple, dataset: Dataset) -> tuple:
+    # Also keyed by the approximate matching settings, these can change between restarts.
+    return (dataset.version, fuzzy_threshold if fuzzy_matching else None) + tuple(key)
 
-    # Performing a str.match() first, and check wether or not there are results could be usefull.
 
-    try:
-        # Filter the sharp dataframe to only contain possible matches (using regular expressions)
-        search_result_sharp = sharp[sharp['Food item'].str.contains(
-            ingredient_description)]
+def lookup_row_ids(key: tuple, dataset: Dataset) -> tuple:
+    '''find_row_ids(), through the disk cache when there is one.'''
+    if disk_match_cache is None:
+        return find_row_ids(key, dataset)
+    return tuple(disk_match_cache.get_or_compute(get_disk_cache_key(key, dataset), lambda _: find_row_ids(key, dataset)))
 
-        if len(search_result_sharp) == 1:
-            return search_result_sharp.reset_index()
 
-        if (use_frequencies):
-            '''
-            For each ingredient in the now regex-filtered SHARP dataset (a subset of potential ingredient matches),
-            we pick the one which has has the highest ingredient_frequency in ingredient_frequencies.csv.
+def warm_disk_cache(limit: int = None, dataset: Dataset = None) -> int:
+    '''
+    Matches the most frequent ingredient names (according to ingredient_frequency.csv) that aren't in the disk cache yet,
+    and stores them. Workers sharing the file only match what the others haven't. Returns the number of names matched.
+    '''
+    if disk_match_cache is None:
+        return 0
+    dataset = dataset or get_dataset()
+    limit = disk_cache_warm_size if limit is None else limit
 
-            (frequencies here simply mean how often that ingredient has occured in all the recipes.)
-            '''
-            filtered_indexed_sharp = search_result_sharp.reset_index()
+    frequencies = dataset.frequencies.sort_values('frequency', ascending=False).head(limit)
+    descriptions = dict.fromkeys(str(name).lower() for name in frequencies['ingredient_name'])
+    keys = {get_disk_cache_key((description, True), dataset): (description, True) for description in descriptions}
 
-            most_frequent_ingredient = None
-            most_frequent_ingredient_df = pd.DataFrame(
-                {'index': [0], 'Food item': [0], 'GHGE': [0], 'Land Use': [0]})
+    missing = disk_match_cache.missing(list(keys))
+    disk_match_cache.set_many([(disk_key, find_row_ids(keys[disk_key], dataset)) for disk_key in missing])
+    return len(missing)
 
-            # For each ingredient in the filtered SHARP dataset:
-            for i in range(0, len(filtered_indexed_sharp)):
-                food_items_rank = 0  # Get the ingedient's name
-                food_item = filtered_indexed_sharp.at[i, 'Food item']
-                food_items_ghge = filtered_indexed_sharp.at[i, 'GHGE']
-                food_items_LU = filtered_indexed_sharp.at[i, 'Land Use']
 
-                frequencies_search_result = frequencies[frequencies['ingredient_name'].str.contains(
-                    food_item, regex=False)]  # Use that name as a parameter, to filter the frequencies dataset
+def match_row_id(ingredient_description: str, dataset: Dataset = None) -> Optional[int]:
+    '''Returns the row ID of the best match for the description, or None when nothing matched.'''
+    row_ids = match_row_ids(ingredient_description, True, dataset)
+    return row_ids[0] if row_ids else None
 
-                frequencies_search_result = frequencies_search_result.reset_index()
 
-                # If there's a match in the frequency dataset:
-                if len(frequencies_search_result) > 0:
-                    # Retrieve that ingredients frequency
-                    food_items_rank = frequencies_search_result.at[0, 'frequency']
+def match_ingredient(ingredient_description: str, use_frequencies: bool = True, dataset: Dataset = None) -> pd.DataFrame:
+    '''
+    Finds all Food Item names in the SHARP-DB containing the ingredient description, and returns a dataframe with potential matches.
+    When use_frequencies is set, only the most frequently used ingredient (according to ingredient_frequency.csv) is returned,
+    or a placeholder row (Food item: 0) when nothing matched.
 
-                # If this is the first ingredient we compute the frequency for:
-                if most_frequent_ingredient is None:
-                    most_frequent_ingredient = (
-                        str(food_item), int(food_items_rank))
-                    most_frequent_ingredient_df = pd.DataFrame(
-                        {'index': [0], 'Food item': [food_item], 'GHGE': [food_items_ghge], 'Land Use': [food_items_LU]})
+    Builds a dataframe from match_row_ids() on every call, scoring uses the row IDs directly.
+    '''
+    dataset = dataset or get_dataset()
+    row_ids = match_row_ids(ingredient_description, use_frequencies, dataset)
+    if use_frequencies and not row_ids:
+        return pd.DataFrame({'index': [0], 'Food item': [0], 'GHGE': [0], 'Land Use': [0]})
+    return dataset.sharp.iloc[list(row_ids)].reset_index()
 
-                # Otherwise, overwrite the previous ingredient, only if the current's frequency is higher
-                elif most_frequent_ingredient[1] < food_items_rank:
 
-                    most_frequent_ingredient = (
-                        str(food_item), int(food_items_rank))
-                    most_frequent_ingredient_df = pd.DataFrame(
-                        {'index': [0], 'Food item': [food_item], 'GHGE': [food_items_ghge], 'Land Use': [food_items_LU]})
+def find_row_ids(key: tuple, dataset: Dataset = None) -> tuple:
+    '''
+    Uncached match_row_ids(), takes a (ingredient_description, use_frequencies) tuple.
 
-            return most_frequent_ingredient_df
+    Descriptions are resolved through the precomputed match_index, as literal substrings of the names. Within a time
+    budget (see "budget.py"), the approximate match is skipped once the budget is spent. Descriptions with fewer than
+    two letters or digits (i.e "", "(" or "b") don't match anything.
+    '''
+    ingredient_description, use_frequencies = key
+    dataset = dataset or get_dataset()
 
-    except KeyError:
-        print("Something went wrong when filtering out the SHARP dataset for potential ingredient matches.", KeyError)
-        return sharp
+    # Every name contains an empty description, and most contain a single letter: these aren't matched at all.
+    if sum(character.isalnum() for character in ingredient_description) < 2:
+        return ()
 
-    except Exception:
-        return sharp
+    row_ids = dataset.match_index.candidates(ingredient_description)
+    if use_frequencies and len(row_ids) > 1:
+        row_ids = [dataset.match_index.most_frequent(row_ids)]
 
-    return search_result_sharp.reset_index()
+    if not row_ids and fuzzy_matching:
+        check_budget()
+        return find_similar_row_ids(ingredient_description, use_frequencies, dataset)
+    return tuple(row_ids)
 
 
-def calculate_score(raw_ingredient_string: str) -> float:
+def find_similar_row_ids(ingredient_description: str, use_frequencies: bool = True, dataset: Dataset = None) -> tuple:
     '''
-    Calculates the sustainability score of an ingredient string (i.e: "2 ounces of milk")
-    Performs a re.search() based filter with it on the SHARP database. Calculates the availables scores found and returns the sustainability score.
+    Returns the row IDs of the names most similar to the description (at or above fuzzy_threshold), most similar first.
+    When use_frequencies is set, only the most similar one is returned. The result is empty if none are similar enough.
+    '''
+    dataset = dataset or get_dataset()
+    candidates = dataset.fuzzy_index.top_k(ingredient_description, k=1 if use_frequencies else 5, min_similarity=fuzzy_threshold)
+    return tuple(row_id for row_id, similarity in candidates)
+
+
+def get_match_candidates(ingredient_description: str, k: int = 5, dataset: Dataset = None) -> list:
+    '''Returns the k SHARP food items most similar to the description, as (food item, similarity) pairs.'''
+    fuzzy_index = (dataset or get_dataset()).fuzzy_index
+    return [(fuzzy_index.names[row_id], similarity) for row_id, similarity in fuzzy_index.top_k(ingredient_description, k)]
+
+
+def add_sustainability_factors(amount: float, ghge: float, land_usage: float) -> float:
+    '''Amount has to be in kilograms.'''
+    return (amount * land_usage) + (amount * ghge)
 
+
+@dataclass
+class ScoredIngredient:
+    '''The result of running one raw ingredient string through the parse -> match -> score pipeline.'''
+    raw_string: str
+    quantity: float
+    measurement: str
+    description: str
+    food_item: Optional[str] = None  # None when nothing matched
+    row_id: Optional[int] = None  # The row ID of the match (see "food_store.py")
+    score: float = 0
+    weight: Optional[WeightEntry] = None  # The weight of one whole unit, only set for 'whole' measurements
+    density: Optional[DensityEntry] = None  # Only set for volume measurements
+    dataset_version: str = None  # The version of the dataset it was scored with
+
+    def details(self) -> dict:
+        '''The parsed details, in the shape returned by get_parsed_string().'''
+        return {'quantity': self.quantity, 'measurement': self.measurement, 'description': self.description}
+
+
+def score_ingredient(raw_ingredient_string: str) -> ScoredIngredient:
     '''
+    Parses an ingredient string once, matches the description against the SHARP-DB once and calculates its score.
 
-    def add_sustainability_factors(amount: int, ghge: float, land_usage: float) -> float:
-        '''Amount has to be in kilograms.'''
-        return (amount * land_usage) + (amount * ghge)
+    The result holds everything needed by both /score and /parse, so callers needing more than the score
+    should use this rather than combining calculate_score(), get_food_match() and get_parsed_string().
+    Every step uses the same dataset, even if a new one is swapped in meanwhile (see "dataset.py").
+    '''
+    dataset = get_dataset()
 
-    score = 0
+    with stage_timer('parse'):
+        parsed = get_parsed_string(raw_ingredient_string)
+    result = ScoredIngredient(raw_ingredient_string, **parsed, dataset_version=dataset.version)
 
-    ingredient = get_ingredient_description(raw_ingredient_string)
-    search = match_ingredient(ingredient)
+    check_budget()
+    with stage_timer('match'):
+        row_id = match_row_id(result.description, dataset)
 
     # If there's a match between recipe ingredient and SHARP-DB:
-    if len(search) > 0:
+    if row_id is not None:
+        foods = dataset.foods
+        result.row_id = row_id
+        result.food_item = foods.names[row_id]
+
         # Retrieve the sustainability properties.
-        ghge = float(search.at[0, 'GHGE'])
-        land_use = float(search.at[0, 'Land Use'])
+        ghge = float(foods.ghge[row_id])
+        land_use = float(foods.land_use[row_id])
 
-        quantity = get_quantity(raw_ingredient_string)
-        measurement = get_unit_of_measurement(raw_ingredient_string)
+        quantity = result.quantity
+        measurement = result.measurement
 
         if measurement == 'whole':
             # If the measurement used is provided as 'whole' we try to find the ingredients weight in the weight_table.csv
             measurement = 'grams'
-            # Returns 0 if weight not found
-            quantity = (lookup_weight_in_grams() * quantity)
+            # Falls back to the default weight if the ingredient isn't in the table
+            with stage_timer('weight'):
+                result.weight = lookup_weight(result.description, dataset)
+            quantity = result.weight.grams * quantity
+
+        with stage_timer('score'):
+            if is_volume(measurement):
+                result.density = lookup_density(result.food_item, dataset)
+
+            try:
+                quantity_kg = convert_measurement_to_kg(measurement, quantity, result.density.grams_per_ml if result.density else 1.0)
+                score = add_sustainability_factors(quantity_kg, ghge, land_use)
+                # SHARP rows without GHGE or land use data score 0 (NaN isn't valid JSON), like in score_grouped().
+                result.score = score if score == score else 0.0
+            except UnknownUnitError:
+                # Unknown measurements score 0.
+                pass
+
+    if row_id is None:
+        match_misses.inc()
+
+    return result
+
+
+@dataclass
+class FoodItemScore:
+    '''The ingredients of a recipe matching the same food item in the same unit, scored as one.'''
+    food_item: str
+    measurement: str  # Whole units are weighed in grams
+    quantity: float  # Summed over the ingredients
+    score: float = 0
+    ingredients: List[str] = field(default_factory=list)
+
+
+@dataclass
+class GroupedScore:
+    '''The result of score_grouped().'''
+    score: float
+    food_items: List[FoodItemScore]
+    unmatched: List[str]  # Ingredient strings without a match, they score 0
+    dataset_version: str = None
+
+
+def normalize_ingredient(raw_ingredient_string: str, dataset: Dataset) -> Optional[tuple]:
+    '''
+    Parses and matches an ingredient string, returns (food item, unit, quantity, GHGE, land use), or None without a match.
+    Whole units are weighed in grams, and units are spelled the same way (see canonical_unit()), so quantities of the
+    same food item and unit can be added up.
+    '''
+    parsed = get_parsed_string(raw_ingredient_string)
+    row_id = match_row_id(parsed['description'], dataset)
+    if row_id is None:
+        match_misses.inc()
+        return None
 
-        quantity_kg = convert_measurement_to_kg(measurement, quantity)
+    quantity, measurement = parsed['quantity'], parsed['measurement']
+    if measurement == 'whole':
+        quantity, measurement = lookup_weight(parsed['description'], dataset).grams * quantity, 'grams'
+    foods = dataset.foods
+    return foods.names[row_id], canonical_unit(measurement), quantity, float(foods.ghge[row_id]), float(foods.land_use[row_id])
 
-        try:
-            score = add_sustainability_factors(quantity_kg, ghge, land_use)
-        except TypeError:
-            return score
 
-    return score
+def normalize_ingredients(raw_ingredient_strings: List[str]) -> list:
+    '''normalize_ingredient() for every string, with the current dataset. The part of score_grouped() run in parallel.'''
+    dataset = get_dataset()
+    with stage_timer('match'):
+        return [normalize_ingredient(raw_ingredient_string, dataset) for raw_ingredient_string in raw_ingredient_strings]
 
 
-def get_food_match(raw_ingredient_string: str) -> float:
+def group_ingredients(raw_ingredient_strings: List[str], normalized: dict) -> GroupedScore:
     '''
-    Returns the food item that was used as a match.
+    Groups the ingredients by food item and unit, and scores every group once. normalized maps every ingredient string to
+    its normalize_ingredient() result.
+    '''
+    dataset = get_dataset()
+    groups = {}  # (food item, unit) -> FoodItemScore
+    factors = {}  # Food item -> (GHGE, land use)
+    unmatched = []
+
+    for raw_ingredient_string in raw_ingredient_strings:
+        ingredient = normalized[raw_ingredient_string]
+        if ingredient is None:
+            unmatched.append(raw_ingredient_string)
+            continue
+
+        food_item, measurement, quantity, ghge, land_use = ingredient
+        group = groups.get((food_item, measurement))
+        if group is None:
+            group = groups[food_item, measurement] = FoodItemScore(food_item, measurement, 0.0)
+            factors[food_item] = (ghge, land_use)
+        group.quantity += quantity
+        group.ingredients.append(raw_ingredient_string)
+
+    with stage_timer('score'):
+        for group in groups.values():
+            density = lookup_density(group.food_item, dataset).grams_per_ml if is_volume(group.measurement) else 1.0
+            try:
+                score = add_sustainability_factors(convert_measurement_to_kg(group.measurement, group.quantity, density),
+                                                   *factors[group.food_item])
+            except UnknownUnitError:
+                score = 0.0
+            # SHARP rows without GHGE or land use data score 0 (NaN isn't valid JSON).
+            group.score = score if score == score else 0.0
+
+    food_items = list(groups.values())
+    return GroupedScore(sum(group.score for group in food_items), food_items, unmatched, dataset.version)
+
+
+def score_grouped(raw_ingredient_strings: List[str]) -> GroupedScore:
+    '''
+    Scores a recipe by food item: ingredients matching the same food item in the same unit (i.e "1 cup milk" and
+    "½ cup of milk") are grouped, their quantities summed, and every group is scored once.
+
+    Each distinct string is parsed and matched once. Scores are linear in the quantity, so the total is the sum of the
+    ingredient scores, except that ingredients without a score (unknown units, SHARP rows without data) count as 0.
+    '''
+    distinct_strings = list(dict.fromkeys(raw_ingredient_strings))
+    return group_ingredients(raw_ingredient_strings, dict(zip(distinct_strings, normalize_ingredients(distinct_strings))))
+
+
+def calculate_score(raw_ingredient_string: str) -> float:
     '''
+    Calculates the sustainability score of an ingredient string (i.e: "2 ounces of milk")
+    Performs a re.search() based filter with it on the SHARP database. Calculates the availables scores found and returns the sustainability score.
 
-    ingredient = get_ingredient_description(raw_ingredient_string)
-    search = match_ingredient(ingredient)
+    '''
+    return score_ingredient(raw_ingredient_string).score
 
-    print(search)
 
-    return search.at[0, 'Food item']
+def get_food_match(raw_ingredient_string: str) -> float:
+    '''
+    Returns the food item that was used as a match.
+    '''
+    return score_ingredient(raw_ingredient_string).food_item
@@ -0,0 +1,234 @@
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+import hashlib
+import os
+import threading
+import pandas as pd
+from core.utils.cache import invalidate_caches
+from core.utils.food_store import FoodStore
+from core.utils.fuzzy_index import FuzzyIndex
+from core.utils.match_index import MatchIndex
+from core.utils.measurement_conversions import DensityIndex, density_table_csv
+from core.utils.noun_extraction import rebuild_noun_extractor
+from core.utils.snapshot import frequencies_csv, hash_sources, load_tables, sharp_csv, snapshot_file, weight_table_csv
+from core.utils.weight_index import WeightIndex
+
+'''
+dataset.py
+
+A versioned registry of the data used for scoring: the SHARP, frequency, weight and density tables, and the indexes
+built from them. The whole set is one immutable Dataset object, so it can be replaced without restarting the API:
+
+|- A reload builds a new Dataset next to the current one (rebuilding the snapshot if the CSVs changed).
+|- Once it is complete, the registry swaps its reference to it in one assignment. Requests that already picked up
+|  the old Dataset finish with it, new requests get the new one.
+|- A reload is triggered with DatasetRegistry.reload() (i.e by POST /admin/dataset/reload), or by watching the
+|  CSVs for changes (GREEN_BITE_DATASET_WATCH_INTERVAL: seconds between checks, default 0 = don't watch).
+
+The version of a Dataset is a hash of the CSVs it was built from, so workers with the same data report the same version.
+
+Creating the registry doesn't load anything: the first Dataset is built on first use, or by the warm-up when the API
+starts (see "startup.py").
+'''
+
+WATCH_INTERVAL = float(os.environ.get('GREEN_BITE_DATASET_WATCH_INTERVAL', 0))
+
+
+class DatasetFiles(NamedTuple):
+    sharp: str = sharp_csv
+    frequencies: str = frequencies_csv
+    weight_table: str = weight_table_csv
+    density_table: str = density_table_csv
+    snapshot: str = snapshot_file
+
+    def sources(self) -> list:
+        return [self.sharp, self.frequencies, self.weight_table, self.density_table]
+
+
+class Dataset(NamedTuple):
+    version: str
+    sharp: pd.DataFrame
+    frequencies: pd.DataFrame
+    food_weights: pd.DataFrame
+    foods: Any  # FoodStore
+    match_index: Any  # MatchIndex
+    fuzzy_index: Any  # FuzzyIndex
+    weight_index: Any  # WeightIndex
+    density_index: Any  # DensityIndex
+    source: str  # 'csv' or 'snapshot'
+    sources: dict  # Source file name -> SHA-256
+    loaded_at: str
+
+    def info(self) -> dict:
+        return {'version': self.version, 'source': self.source, 'loadedAt': self.loaded_at, 'sources': self.sources,
+                'foodItems': len(self.sharp)}
+
+
+def get_version(sources: dict) -> str:
+    return hashlib.sha256(repr(sorted(sources.items())).encode('utf-8')).hexdigest()[:12]
+
+
+def build_dataset(files: DatasetFiles = DatasetFiles(), rebuild_snapshot: bool = False) -> Dataset:
+    '''Loads the tables (see "snapshot.py") and builds every index on them.'''
+    sources = hash_sources(files.sources())
+    tables = load_tables(files.snapshot, files.sharp, files.frequencies, files.weight_table, rebuild=rebuild_snapshot)
+
+    # The SHARP columns as arrays, indexed by the row IDs matches are returned as (see "food_store.py").
+    foods = FoodStore.from_table(tables.sharp)
+    # Resolves plain substring lookups without scanning the SHARP or frequency tables.
+    match_index = MatchIndex(tables.sharp, tables.frequencies, ranks=tables.frequency_ranks)
+
+    return Dataset(
+        version=get_version(sources),
+        sharp=tables.sharp,
+        frequencies=tables.frequencies,
+        food_weights=tables.food_weights,
+        foods=foods,
+        match_index=match_index,
+        # Used when a description isn't a substring of any name (i.e misspellings), see "fuzzy_index.py".
+        fuzzy_index=FuzzyIndex(foods.names, ranks=match_index.ranks),
+        # Weight of one whole unit of an ingredient, by name (see "weight_index.py").
+        weight_index=WeightIndex(tables.food_weights['ingredient'], tables.food_weights['grams']),
+        # Density of SHARP food items, to weigh volumes (see "measurement_conversions.py").
+        density_index=DensityIndex.from_csv(files.density_table),
+        source=tables.source,
+        sources=sources,
+        loaded_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+class DatasetRegistry:
+    '''Holds the current Dataset, and replaces it when the data changes.'''
+
+    def __init__(self, files: DatasetFiles = DatasetFiles()):
+        self.files = files
+        self._current = None
+        self._load_lock = threading.Lock()
+        self.reloads = 0
+        self.last_error = None
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def add_listener(self, listener):
+        '''listener(dataset) is called after every swap.'''
+        self._listeners.append(listener)
+
+    @property
+    def current(self) -> Dataset:
+        '''The current Dataset, built on first use.'''
+        if self._current is None:
+            self.load()
+        return self._current
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    def load(self) -> Dataset:
+        '''Builds the first Dataset, unless it's already built. Concurrent callers wait for the same build.'''
+        with self._load_lock:
+            if self._current is None:
+                self._current = build_dataset(self.files)
+        return self._current
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def reload(self, force: bool = False, blocking: bool = True) -> bool:
+        '''
+        Builds a new Dataset and swaps it in, unless the source files are unchanged (and force isn't set).
+        Returns True if the dataset was swapped. Without blocking, returns False right away if a reload is running.
+        '''
+        if not self._reload_lock.acquire(blocking=blocking):
+            return False
+        try:
+            if not force and hash_sources(self.files.sources()) == self.current.sources:
+                return False
+            try:
+                dataset = build_dataset(self.files, rebuild_snapshot=True)
+            except Exception as error:
+                # Keep serving the current dataset, i.e when a CSV was caught half written.
+                self.last_error = repr(error)
+                raise
+
+            self._current = dataset
+            self.reloads += 1
+            self.last_error = None
+            invalidate_caches()
+            for listener in self._listeners:
+                listener(dataset)
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, force: bool = False) -> bool:
+        '''Starts a reload in a thread. Returns False if a reload is already running.'''
+        if self.reloading:
+            return False
+        threading.Thread(target=self._reload_quietly, args=(force, False), name='dataset-reload', daemon=True).start()
+        return True
+
+    def _reload_quietly(self, force: bool = False, blocking: bool = True):
+        try:
+            self.reload(force=force, blocking=blocking)
+        except Exception:
+            pass  # Recorded in last_error
+
+    def file_signature(self) -> tuple:
+        signature = []
+        for filepath in self.files.sources():
+            try:
+                stat = os.stat(filepath)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def watch(self, interval: float = WATCH_INTERVAL):
+        '''Checks the source files for changes every interval seconds (in a thread), and reloads when they change.'''
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def check_for_changes():
+            signature = self.file_signature()
+            while not self._stop_watching.wait(interval):
+                new_signature = self.file_signature()
+                if new_signature != signature:
+                    signature = new_signature
+                    self._reload_quietly()
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=check_for_changes, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def info(self) -> dict:
+        return {**self.current.info(), 'reloads': self.reloads, 'reloading': self.reloading,
+                'watching': self._watcher is not None, 'lastError': self.last_error}
+
+
+registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DatasetRegistry:
+    '''Returns the registry used by the app, creating it on first use. The data is only loaded when it's needed.'''
+    global registry
+    with _registry_lock:
+        if registry is None:
+            registry = DatasetRegistry()
+            # The lexicon of the noun extractor is built from the SHARP and frequency tables as well.
+            registry.add_listener(rebuild_noun_extractor)
+    return registry
+
+
+def get_dataset() -> Dataset:
+    return get_registry().current
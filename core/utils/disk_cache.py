@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from core.utils.cache import register_persistent_cache
+
+'''
+disk_cache.py
+
+A persistent cache in a local SQLite file, shared by every worker on the same host and kept across restarts.
+
+The in-process caches (see "cache.py") start empty in every worker, and after every restart. With a disk cache
+behind them, a worker that misses in memory looks the key up on disk first, so the common ingredients are only
+matched once per host (and dataset version) instead of once per worker.
+
+|- Keys and values are stored as JSON, so tuples come back as lists.
+|- The file is opened in WAL mode: readers don't block the writer, and every thread and process gets its own
+|  connection. Concurrent writers wait for each other (up to a timeout), a write that still fails is skipped.
+|- Every entry records when it was last used (to the minute). Once the cache holds more than maxsize entries, the least recently
+|  used ones are deleted, down to 90% of maxsize. Entries of older dataset versions are never used, so they go first.
+
+It is configured through environment variables:
+
+|- GREEN_BITE_DISK_CACHE: Path of the SQLite file (default: no disk cache).
+|- GREEN_BITE_DISK_CACHE_SIZE: Max number of entries per cache (default 100000).
+'''
+
+DEFAULT_DISK_CACHE_SIZE = int(os.environ.get('GREEN_BITE_DISK_CACHE_SIZE', 100000))
+
+# How many writes (per process) between two checks of the number of entries.
+EVICTION_CHECK_INTERVAL = 100
+# Seconds before a hit updates the last use of an entry again. Saves a write on most hits, eviction only needs the
+# rough order.
+TOUCH_INTERVAL = 60
+
+
+def encode_key(key) -> str:
+    return json.dumps(key, separators=(',', ':'))
+
+
+class DiskCache:
+    '''A size bounded, least recently used cache stored in a table of a SQLite file.'''
+
+    def __init__(self, path: str, name: str, maxsize: int = DEFAULT_DISK_CACHE_SIZE, timeout: float = 5.0):
+        self.path = path
+        self.name = name
+        self.table = f'cache_{name}'
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._writes = 0
+
+        with self._connect() as connection:
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table} '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)')
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table} (last_used)')
+
+    def _connect(self) -> sqlite3.Connection:
+        '''Returns the connection of this thread, connections aren't shared across threads or (forked) processes.'''
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def __len__(self) -> int:
+        return self._connect().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def get(self, key, default=None):
+        '''Returns the cached value for key (marking it as used), or default.'''
+        encoded_key = encode_key(key)
+        try:
+            with self._connect() as connection:
+                row = connection.execute(f'SELECT value, last_used FROM {self.table} WHERE key = ?', (encoded_key,)).fetchone()
+                now = time.time()
+                if row is not None and row[1] < now - TOUCH_INTERVAL:
+                    connection.execute(f'UPDATE {self.table} SET last_used = ? WHERE key = ?', (now, encoded_key))
+        except sqlite3.OperationalError:
+            # The file is locked or unavailable, carry on without the cache.
+            self.errors += 1
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def get_or_compute(self, key, compute):
+        '''Returns the cached value for key, or calls compute(key) and caches the result.'''
+        value = self.get(key, default=self)
+        if value is self:
+            value = compute(key)
+            self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items: list):
+        '''Stores (key, value) pairs in one transaction, evicting the least recently used entries if the cache is full.'''
+        if self.maxsize <= 0 or not items:
+            return
+
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                connection.executemany(f'INSERT OR REPLACE INTO {self.table} (key, value, last_used) VALUES (?, ?, ?)',
+                                       [(encode_key(key), json.dumps(value), now) for key, value in items])
+        except sqlite3.OperationalError:
+            self.errors += 1
+            return
+
+        self._writes += len(items)
+        if self._writes >= EVICTION_CHECK_INTERVAL or len(items) > 1:
+            self._writes = 0
+            self.evict()
+
+    def missing(self, keys: list) -> list:
+        '''Returns the keys that aren't in the cache, without marking any entry as used.'''
+        cached = set()
+        encoded_keys = [encode_key(key) for key in keys]
+        try:
+            connection = self._connect()
+            # Stays well below SQLite's limit on the number of query parameters.
+            for start in range(0, len(encoded_keys), 500):
+                chunk = encoded_keys[start:start + 500]
+                query = f'SELECT key FROM {self.table} WHERE key IN ({",".join("?" * len(chunk))})'
+                cached.update(row[0] for row in connection.execute(query, chunk))
+        except sqlite3.OperationalError:
+            # As in get(), carry on as if nothing was cached.
+            self.errors += 1
+            return list(keys)
+        return [key for key, encoded_key in zip(keys, encoded_keys) if encoded_key not in cached]
+
+    def evict(self) -> int:
+        '''Deletes the least recently used entries if there are more than maxsize, returns how many were deleted.'''
+        try:
+            with self._connect() as connection:
+                size = connection.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+                if size <= self.maxsize:
+                    return 0
+                excess = size - int(self.maxsize * 0.9)
+                connection.execute(f'DELETE FROM {self.table} WHERE key IN '
+                                   f'(SELECT key FROM {self.table} ORDER BY last_used LIMIT ?)', (excess,))
+        except sqlite3.OperationalError:
+            self.errors += 1
+            return 0
+        self.evictions += excess
+        return excess
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute(f'DELETE FROM {self.table}')
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        try:
+            size = len(self)
+        except sqlite3.OperationalError:
+            # Reported as unknown, rather than failing GET /cache/stats and GET /metrics.
+            self.errors += 1
+            size = None
+        return {
+            'path': self.path,
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'hitRate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def get_disk_cache(name: str, path: str = None):
+    '''
+    Opens the disk cache called name in the GREEN_BITE_DISK_CACHE file (or path), and registers it for its stats.
+    Returns None when no file is configured.
+    '''
+    path = path or os.environ.get('GREEN_BITE_DISK_CACHE')
+    if not path:
+        return None
+    cache = DiskCache(path, name)
+    register_persistent_cache(f'{name}-disk', cache)
+    return cache
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Fill the disk cache with the matches of the most frequent ingredient names.')
+    parser.add_argument('path', help='SQLite file, the same as GREEN_BITE_DISK_CACHE')
+    parser.add_argument('--limit', type=int, default=None, help='Number of ingredient names (default: GREEN_BITE_DISK_CACHE_WARM)')
+    args = parser.parse_args()
+
+    os.environ['GREEN_BITE_DISK_CACHE'] = args.path
+    from core.utils.calculator import warm_disk_cache
+    start = time.perf_counter()
+    print(f'Matched {warm_disk_cache(args.limit)} ingredient names in {time.perf_counter() - start:.1f}s')
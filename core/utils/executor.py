@@ -0,0 +1,218 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+import asyncio
+import os
+import threading
+from core.utils.calculator import GroupedScore, calculate_score, group_ingredients, normalize_ingredients, score_grouped, score_ingredient
+from core.utils.dataset import get_registry
+from core.utils.metrics import collect_timings
+
+'''
+executor.py
+
+Runs the CPU bound scoring work outside of the event loop, so one slow recipe doesn't stall every other request.
+
+The executor is configured through environment variables:
+
+|- GREEN_BITE_EXECUTOR: "thread" (default), "process", or "inline" (run on the event loop, as before).
+|- GREEN_BITE_WORKERS: Number of threads/processes in the pool (default: number of CPUs).
+|- GREEN_BITE_MAX_PENDING: Max number of requests being scored at once. Requests beyond that are rejected with
+|                          ExecutorOverloaded (a 503 response), instead of queueing up without bound (default: workers * 4).
+|- GREEN_BITE_CHUNK_SIZE: Number of distinct ingredient strings per chunk, for recipes parsed and matched in chunks
+|                         spread over the pool (see score_grouped_in_chunks(), default 8).
+
+Process pools load the data once per process, when the process starts (see warm_up()). When the dataset is reloaded
+(see "dataset.py"), the pool is replaced by a new one, so workers don't keep scoring with the old data.
+'''
+
+EXECUTOR_KINDS = ('inline', 'thread', 'process')
+
+
+class ExecutorOverloaded(Exception):
+    '''Raised when more requests are in flight than the executor accepts.'''
+
+
+def warm_up():
+    '''Loads the data, indexes and noun extraction backend, so the first request doesn't pay for it.'''
+    from core.utils.noun_extraction import get_noun_extractor
+    get_noun_extractor()
+    calculate_score('1 cup of milk')
+
+
+def score_ingredient_with_timings(ingredient_string: str) -> tuple:
+    '''Scores an ingredient string, returns the result and the time spent in each stage (in seconds).'''
+    with collect_timings() as timings:
+        result = score_ingredient(ingredient_string)
+    return result, timings
+
+
+class ScoringExecutor:
+    '''Runs scoring functions in a thread or process pool, with a bound on the number of requests in flight.'''
+
+    def __init__(self, kind: str = 'thread', workers: int = None, max_pending: int = None, chunk_size: int = 8):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f'Unknown executor "{kind}", expected one of: {", ".join(EXECUTOR_KINDS)}')
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.chunk_size = chunk_size
+        self.pending = 0
+        self._pending_lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        # Created on first use, so importing the app doesn't spawn any threads or processes.
+        if self._pool is None and self.kind == 'thread':
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scoring')
+        elif self._pool is None and self.kind == 'process':
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        return self._pool
+
+    def _admit(self):
+        with self._pending_lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorOverloaded(f'{self.pending} requests are already being scored')
+            self.pending += 1
+
+    def _release(self):
+        with self._pending_lock:
+            self.pending -= 1
+
+    def _release_when_done(self, futures: list):
+        '''Releases a pending request once all of its futures are done, from whichever thread finishes the last one.'''
+        if not futures:
+            self._release()
+            return
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(future):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self._release()
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    async def _submit(self, function, *args):
+        if self.kind == 'inline':
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+
+    async def run(self, function, *args):
+        '''Runs function(*args) in the pool. Functions must be picklable (defined at module level) for process pools.'''
+        self._admit()
+        try:
+            return await self._submit(function, *args)
+        finally:
+            self._release()
+
+    async def map_items(self, function, items: list, *args, timeout: float = None) -> list:
+        '''
+        Runs function(item, *args) for every item as its own task, all in parallel, and returns the results in order.
+        The whole call counts as a single pending request.
+
+        With a timeout (in seconds), returns once it expires even if some items haven't finished (i.e they are queued
+        behind other requests, or stuck in a slow step). Their result is None. Items that haven't started running by
+        then are cancelled, as they are when the caller is cancelled. Items already running can't be interrupted: the
+        request stays pending until they finish, so max_pending keeps bounding the work handed to the pool.
+        '''
+        self._admit()
+        if self.kind == 'inline':
+            try:
+                return [function(item, *args) for item in items]
+            finally:
+                self._release()
+
+        futures = [self.pool.submit(function, item, *args) for item in items]
+        try:
+            if not futures:
+                return []
+            results = [asyncio.wrap_future(future) for future in futures]
+            done, _ = await asyncio.wait(results, timeout=timeout)
+            return [result.result() if result in done else None for result in results]
+        finally:
+            self._release_when_done([future for future in futures if not future.cancel()])
+
+    async def map_chunks(self, function, items: list) -> list:
+        '''
+        Splits the items into chunks of chunk_size, runs function(chunk) for all chunks in parallel (see map_items()),
+        and concatenates the results. The whole call counts as a single pending request.
+        '''
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        return [result for chunk_results in await self.map_items(function, chunks) for result in chunk_results]
+
+    def stats(self) -> dict:
+        return {'kind': self.kind, 'workers': self.workers, 'maxPending': self.max_pending, 'pending': self.pending}
+
+    def start(self):
+        '''Creates the pool ahead of the first request. Process pools also load the data in every process.'''
+        pool = self.pool
+        if self.kind == 'process':
+            # Every process runs warm_up() when it starts, wait until they all have.
+            wait([pool.submit(warm_up) for _ in range(self.workers)])
+
+    def restart(self):
+        '''Replaces the pool with a new one. Work already submitted to the old pool finishes there.'''
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+            if self.kind == 'process':
+                # The pool only starts a process per task it's given: give it one per worker, so every process loads
+                # the new data now rather than on its first request. Requests keep being served by the old pool meanwhile.
+                for _ in range(self.workers):
+                    self.pool.submit(warm_up)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def create_executor_from_environment() -> ScoringExecutor:
+    return ScoringExecutor(
+        kind=os.environ.get('GREEN_BITE_EXECUTOR', 'thread'),
+        workers=int(os.environ['GREEN_BITE_WORKERS']) if os.environ.get('GREEN_BITE_WORKERS') else None,
+        max_pending=int(os.environ['GREEN_BITE_MAX_PENDING']) if os.environ.get('GREEN_BITE_MAX_PENDING') else None,
+        chunk_size=int(os.environ.get('GREEN_BITE_CHUNK_SIZE', 8)),
+    )
+
+
+scoring_executor = create_executor_from_environment()
+
+
+def configure_executor(**kwargs) -> ScoringExecutor:
+    '''Replaces the executor used by the app (i.e to compare executors in a load test).'''
+    global scoring_executor
+    scoring_executor.shutdown()
+    scoring_executor = ScoringExecutor(**kwargs)
+    return scoring_executor
+
+
+def get_executor() -> ScoringExecutor:
+    return scoring_executor
+
+
+async def score_grouped_in_chunks(raw_ingredient_strings: list, executor: ScoringExecutor = None) -> GroupedScore:
+    '''
+    score_grouped() on the executor. A long recipe fans out: its distinct ingredient strings are parsed and matched in
+    chunks spread over the pool, then grouped and scored in one more task. Shorter ones are scored as a single task.
+    '''
+    executor = executor or get_executor()
+    distinct_strings = list(dict.fromkeys(raw_ingredient_strings))
+    if len(distinct_strings) <= executor.chunk_size:
+        return await executor.run(score_grouped, raw_ingredient_strings)
+
+    normalized = await executor.map_chunks(normalize_ingredients, distinct_strings)
+    return await executor.run(group_ingredients, raw_ingredient_strings, dict(zip(distinct_strings, normalized)))
+
+
+def restart_process_pool(dataset=None):
+    '''Processes hold their own copy of the dataset, they are replaced when it's reloaded. Threads share the new one.'''
+    if scoring_executor.kind == 'process':
+        scoring_executor.restart()
+
+
+get_registry().add_listener(restart_process_pool)
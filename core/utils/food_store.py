@@ -0,0 +1,34 @@
+import sys
+import numpy as np
+import pandas as pd
+
+'''
+food_store.py
+
+A columnar copy of the SHARP table, used on the scoring hot path instead of DataFrame row access.
+
+Every SHARP row is identified by its row ID (its position in the table, the same IDs as in "match_index.py" and
+"fuzzy_index.py"), and its columns are stored as plain arrays:
+
+|- names: The food item names, interned, so the indexes and cached results all share one copy of each string.
+|- ghge, land_use: Contiguous float64 arrays, GHGE and land use per kilogram.
+
+Matches are returned as row IDs (see match_row_ids() in "calculator.py"), so caching a match stores a few integers
+rather than a DataFrame, and scoring a match is a couple of array lookups.
+'''
+
+
+class FoodStore:
+    '''Columnar SHARP table, indexed by row ID.'''
+
+    def __init__(self, names: list, ghge, land_use):
+        self.names = [sys.intern(str(name)) for name in names]
+        self.ghge = np.ascontiguousarray(ghge, dtype=np.float64)
+        self.land_use = np.ascontiguousarray(land_use, dtype=np.float64)
+
+    @classmethod
+    def from_table(cls, sharp: pd.DataFrame):
+        return cls(sharp['Food item'], sharp['GHGE'].to_numpy(), sharp['Land Use'].to_numpy())
+
+    def __len__(self) -> int:
+        return len(self.names)
@@ -0,0 +1,94 @@
+from collections import Counter
+import math
+import numpy as np
+
+'''
+fuzzy_index.py
+
+Approximate matching of ingredient descriptions against the SHARP food item names, used by match_row_ids() in
+"calculator.py" when a description isn't a substring of any name (i.e misspellings like "tomatos", or "brocoli").
+
+Names and queries are compared as TF-IDF weighted vectors of their character trigrams, by cosine similarity:
+
+|- Every name is padded with a space on both ends (so word boundaries count), and broken into trigrams.
+|- Trigrams found in few names weigh more than common ones (i.e "oes" says less than "tom").
+|- The index maps each trigram to the rows containing it and their (normalized) weights, as NumPy arrays.
+
+A query only touches the postings of its own trigrams, the similarity of every row is accumulated with one np.bincount().
+'''
+
+
+def padded_ngrams(string: str, n: int = 3) -> Counter:
+    '''Counts the character n-grams of a string, padded with a space on both ends.'''
+    string = f' {string} '
+    return Counter(string[i:i + n] for i in range(len(string) - n + 1))
+
+
+class FuzzyIndex:
+    '''
+    Sparse TF-IDF index over character n-grams of the SHARP food item names.
+
+    Row IDs are positions in the list of names the index was built from, the same as in MatchIndex ("match_index.py").
+    When ranks (frequency ranks, see compute_frequency_ranks()) are given, equally similar names are ordered by them.
+    '''
+
+    def __init__(self, names: list, n: int = 3, ranks: list = None):
+        self.n = n
+        self.names = list(names)
+        self.ranks = list(ranks) if ranks is not None else [0] * len(self.names)
+
+        ngram_counts = [padded_ngrams(name, n) for name in self.names]
+        document_frequencies = Counter(ngram for counts in ngram_counts for ngram in counts)
+        # Smoothed IDF, as if one more name contained every n-gram. Unseen n-grams get the highest weight.
+        self.idf = {ngram: math.log((1 + len(self.names)) / (1 + frequency)) + 1
+                    for ngram, frequency in document_frequencies.items()}
+        self.unseen_idf = math.log(1 + len(self.names)) + 1
+
+        postings = {}
+        for row_id, counts in enumerate(ngram_counts):
+            weights = {ngram: count * self.idf[ngram] for ngram, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for ngram, weight in weights.items():
+                row_ids, row_weights = postings.setdefault(ngram, ([], []))
+                row_ids.append(row_id)
+                row_weights.append(weight / norm)
+
+        self.postings = {ngram: (np.array(row_ids, dtype=np.intp), np.array(row_weights))
+                         for ngram, (row_ids, row_weights) in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def similarities(self, query: str) -> np.ndarray:
+        '''Returns the cosine similarity (0 to 1) between the query and every name.'''
+        counts = padded_ngrams(query.lower(), self.n)
+        weights = {ngram: count * self.idf.get(ngram, self.unseen_idf) for ngram, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+
+        row_ids, row_weights = [], []
+        for ngram, weight in weights.items():
+            posting = self.postings.get(ngram)
+            if posting is not None:
+                row_ids.append(posting[0])
+                row_weights.append(posting[1] * (weight / norm))
+
+        if not row_ids:
+            return np.zeros(len(self.names))
+        return np.bincount(np.concatenate(row_ids), weights=np.concatenate(row_weights), minlength=len(self.names))
+
+    def top_k(self, query: str, k: int = 5, min_similarity: float = 0.0) -> list:
+        '''
+        Returns up to k (row ID, similarity) pairs, most similar first, leaving out those below min_similarity.
+        Ties are broken by frequency rank (highest first), then by row ID.
+        '''
+        scores = self.similarities(query)
+        # Names sharing no n-gram with the query are never returned, leave them out before sorting.
+        candidates = (scores > 0) & (scores >= min_similarity)
+        if k < np.count_nonzero(candidates):
+            # Keep everything tied with the k-th best, so the tie breaking below sees all of them.
+            kth_score = -np.partition(-scores, k - 1)[k - 1]
+            candidates &= scores >= kth_score
+        row_ids = np.flatnonzero(candidates)
+
+        ranked = sorted(row_ids.tolist(), key=lambda row_id: (-round(scores[row_id], 9), -self.ranks[row_id], row_id))
+        return [(row_id, float(scores[row_id])) for row_id in ranked[:k]]
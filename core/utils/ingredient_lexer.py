@@ -0,0 +1,95 @@
+from fractions import Fraction
+from typing import NamedTuple, Optional
+import re
+import unicodedata
+
+'''
+ingredient_lexer.py
+
+A precompiled lexer for raw ingredient strings, used by the functions in "ingredient_parser.py".
+
+The patterns are compiled once. One search finds the first quantity, and one pass over the words of the string
+yields both the unit and the remaining description: every word is looked up in a set of units and a set of
+blacklisted words, rather than searching the string for each of them. Anything that isn't a word (punctuation,
+stray digits) is dropped from the description, as is anything between parenthesis.
+
+|- Quantities: "2", "1.5", "1/2", "1 1/2", "1½", "½", and ranges such as "2-3" or "2 to 3" (the midpoint is used).
+|- Units and blacklisted words only match whole words, so "can" is not stripped from "pecans".
+'''
+
+FRACTION_SYMBOLS = '¼-¾⅐-⅞↉'  # e.g ½
+NUMBER = r'\d+(?:\.\d+)?'
+NOT_A_LETTER_AFTER = r'(?![^\W\d_])'
+
+QUANTITY = (
+    rf'(?P<range_start>{NUMBER})\s*(?:-|–|to{NOT_A_LETTER_AFTER})\s*(?P<range_end>{NUMBER})(?!\s*/)'
+    rf'|(?P<mixed_whole>\d+)\s+(?P<mixed_numerator>\d+)/(?P<mixed_denominator>\d+)'
+    rf'|(?P<numerator>\d+)/(?P<denominator>\d+)'
+    rf'|(?P<number>{NUMBER})?\s*(?P<symbol>[{FRACTION_SYMBOLS}])'
+    rf'|(?P<integer>{NUMBER})'
+)
+
+
+class LexedIngredient(NamedTuple):
+    quantity: float
+    unit: Optional[str]
+    description: str
+
+
+def get_quantity_value(match: re.Match) -> float:
+    '''Converts a match of the QUANTITY pattern to a number.'''
+    if match.group('range_start') is not None:
+        return (float(match.group('range_start')) + float(match.group('range_end'))) / 2
+    if match.group('mixed_whole') is not None:
+        fraction = Fraction(int(match.group('mixed_numerator')), int(match.group('mixed_denominator')))
+        return int(match.group('mixed_whole')) + float(fraction)
+    if match.group('numerator') is not None:
+        return float(Fraction(int(match.group('numerator')), int(match.group('denominator'))))
+    if match.group('symbol') is not None:
+        return float(match.group('number') or 0) + unicodedata.numeric(match.group('symbol'))
+    return float(match.group('integer'))
+
+
+class IngredientLexer:
+    '''Extracts the quantity, unit and description of a raw ingredient string.'''
+
+    quantity_pattern = re.compile(QUANTITY)
+    word_pattern = re.compile(r'[^\W\d_]+')
+    parenthesis_pattern = re.compile(r'\([^()]*\)')
+
+    def __init__(self, units: list, blacklisted_words: list):
+        # Units and blacklisted words are single words, so they are looked up per word instead of being searched for.
+        self.units = {unit.lower() for unit in units}
+        self.blacklisted_words = {word.lower() for word in blacklisted_words}
+
+    def lex(self, raw_string: str) -> LexedIngredient:
+        parenthesis = []
+        if '(' in raw_string:
+            parenthesis = self.parenthesis_pattern.findall(raw_string)
+            raw_string = self.parenthesis_pattern.sub(' ', raw_string)
+
+        match = self.quantity_pattern.search(raw_string)
+        quantity = get_quantity_value(match) if match else None
+
+        # A single pass over the words finds the unit, and drops it along with any blacklisted word.
+        unit = None
+        description = []
+        for word in self.word_pattern.findall(raw_string):
+            lowered = word.lower()
+            if lowered in self.units:
+                if unit is None:
+                    unit = lowered
+            elif lowered not in self.blacklisted_words:
+                description.append(word)
+
+        # Things like "1 (14 ounce) can", only look inside the parenthesis if nothing was found outside of them.
+        for inner_string in parenthesis:
+            if quantity is not None and unit is not None:
+                break
+            inner = self.lex(inner_string[1:-1])
+            if quantity is None and inner.quantity:
+                quantity = inner.quantity
+            if unit is None:
+                unit = inner.unit
+
+        return LexedIngredient(quantity or 0.0, unit, ' '.join(description))
@@ -1,7 +1,9 @@
-from fractions import Fraction
-from textblob import TextBlob
-import unicodedata
-import re
+from functools import lru_cache
+from core.utils.cache import LRUCache
+from core.utils.metrics import stage_timer
+from core.utils.ingredient_lexer import IngredientLexer, LexedIngredient
+from core.utils.measurement_conversions import unit_table
+from core.utils.noun_extraction import get_noun
 
 '''
 ingredientparser.py
@@ -20,131 +22,92 @@ would return the following using the functions defined here:
 
 
 def generate_list_of_all_units() -> list:
-    '''Returns a list of all measurement units that our API should recognize.'''
-    units = {
-        'cup': {'desc': 'cup'},
-        'tablespoon': {'desc': 'tbsp'},
-        'teaspoon': {'desc': 'tsp'},
-        'ounce': {'desc': 'ounce'},
-        'gram': {'desc': 'gram'},
-        'pound': {'desc': 'pound'},
-        'kilogram': {'desc': 'kg'},
-        'deciliter': {'desc': 'dl'},
-        'milliliter': {'desc': 'ml'}
-    }
-
-    # Create a list of all measurement units that we wish to look for in a recipe string.
-    list_of_units = list(set([x for key, value in units.items()
-                              for x in [key, value['desc'], key + 's', value['desc'] + 's']]))
-    list_of_units.sort()  # Sets are unordered, so we order them..
-    # ..then reverse the list to enforce plurals being matched before singular measurements with RegEx.
-    list_of_units.reverse()
-
-    return list_of_units
+    '''
+    Returns a list of all measurement units that our API should recognize: every unit (and spelling variant) in
+    unit_table.csv, the same table the measurements are converted with (see "measurement_conversions.py").
+    '''
+    return sorted({str(unit).lower() for unit in unit_table.index})
 
 
 list_of_units = generate_list_of_all_units()
 
 
-def get_ingredient_description(raw_string: str = '100½ cups cheese', unit_exclusion_list: list = list_of_units) -> str:
-    '''Retrieve the possible descriptions of an ingredient from a raw ingredient string, return them all as a tuple.
+# Remove these words from raw ingredient strings (usually adjectives), they don't really tell you anything about the ingredient itself (other than how to prepeare it).
+blacklisted_words = ['cubed', 'package', 'vermicelli', 'halves', 'breast', 'boneless', 'skinless', 'semisweet', 'prepared', 'graham', 'ripe', 'container', 'cooked', 'packaged', 'can', 'cans',
+                     'ground', 'shredded', 'crushed', 'slices', 'sliced', 'firm', 'trimmed', 'thinly', 'diced', 'medium', 'bulk', 'fluid', 'cut', 'boiling', 'french', 'italian', 'Filippo', 'Berio', 'bag']
 
-    This function attempts to remove the amount, as well as the measurement used to specify that amount, from
-    a raw ingredient string from an online recipe. This (hopefully) leaves the string with the ingredient description.
-    RegularExpressions are used to match unwanted parts of the raw string until the description remains.
 
-    '''
+@lru_cache(maxsize=None)
+def get_lexer(units: tuple = tuple(list_of_units)) -> IngredientLexer:
+    '''Returns the compiled lexer for a set of units. Lexers are compiled once, and reused.'''
+    return IngredientLexer(list(units), blacklisted_words)
 
-    # Remove these words from raw ingredient strings (usually adjectives), they don't really tell you anything about the ingredient itself (other than how to prepeare it).
-    blacklisted_words = ['cubed', 'package', 'vermicelli', 'halves', 'breast', 'boneless', 'skinless', 'semisweet', 'prepared', 'graham', 'ripe', 'container', 'cooked', 'package', 'packaged', 'can', 'cans',
-                         'ground', 'shredded', 'crushed', 'slices', 'sliced', 'firm', 'trimmed', 'thinly', 'diced', 'medium', 'bulk', 'fluid', 'cut', 'boiling', 'french', 'italian', 'Filippo', 'Berio', "/", "-" 'bag']
-
-    def get_noun(string: str) -> str:
-        '''Returns the first noun detected in a string.
-        Using TextBlob: https://textblob.readthedocs.io/en/dev/
-        '''
-        blob = TextBlob(string)
-        for word, pos in blob.tags:
-            if "NN" in pos:  # NN == Nouns
-                return word
-        return string
-
-    # Substitute all occurrences of unicode fractions from the string with an empty string.
-    string = re.sub(r'[\u00BC-\u00BE\u2150-\u215E\u2189]+', '', raw_string)
-    # Remove parenthesis, and everything in between them
-    string = re.sub(r"\([^()]*\)", "", string)
-    # Substitute all occurrences of 1-9 from the string with an empty string.
-    string = re.sub(r'[0-9]+', '', string)
-    # Substitute all occurrences of elements found in "list_of_units" from the string with an empty string.
-    string = re.sub('|'.join(unit_exclusion_list), '', string)
-    # Remove blacklisted words (non food words that can be interpreted as nouns by TextBlob)
-    string = re.sub('|'.join(blacklisted_words), '', string)
-    # Remove commas from the string
-    string = re.sub(',', '', string)
-
-    string = get_noun(string)
 
-    return string.strip()
+default_lexer = get_lexer()
 
 
-def get_quantity(raw_string: str = '100 ½ cups cheese') -> str:
-    '''Retrieve the specified amount of an ingredient string.
+def lex(raw_string: str, units: list = list_of_units) -> LexedIngredient:
+    lexer = default_lexer if units is list_of_units else get_lexer(tuple(units))
+    return lexer.lex(raw_string)
 
-    The raw_string will be matched against two regex patterns, searching for integers and fraction symbols,
-    respectively. All matches will be converted to integers, added up, and returned as a float. The number must
-    be interpreted along the results of get_measurement() in order to make any meaning out of the quantity.
 
-    '''
+def get_ingredient_description(raw_string: str = '100½ cups cheese', unit_exclusion_list: list = list_of_units, extract_noun: bool = True) -> str:
+    '''Retrieve the possible descriptions of an ingredient from a raw ingredient string, return them all as a tuple.
 
-    # TODO: Write unit tests for fraction conversion.
+    This function attempts to remove the amount, as well as the measurement used to specify that amount, from
+    a raw ingredient string from an online recipe. This (hopefully) leaves the string with the ingredient description.
+    The lexer (see "ingredient_lexer.py") drops quantities, units, parenthesis and blacklisted words until the description remains.
+    Finally the noun is picked out of the description (see "noun_extraction.py"), unless extract_noun is False.
 
-    quantity = 0.0
+    '''
+    string = lex(raw_string, unit_exclusion_list).description
 
-    # RegEx patterns can be tested using: https://regexr.com/
-    fraction_symbols = r'[\u00BC-\u00BE\u2150-\u215E\u2189]+'  # e.g ½
-    written_fractions = r'(?:[1-9][0-9]*|0)\/[1-9][0-9]*'      # e.g 1/2
-    integers = r'[0-9]+'
+    if extract_noun:
+        string = get_noun(string)
 
-    # Test the RegEx patterns against the functions raw_string argument.
-    find_fraction_symbols = re.search(fraction_symbols, raw_string)
-    find_written_fractions = re.search(written_fractions, raw_string)
-    find_integers = re.search(integers, raw_string)
+    return string.strip()
 
-    if bool(find_fraction_symbols):
-        # Convert the matches to integers and add them to the quantity.
-        quantity += unicodedata.numeric(find_fraction_symbols.group(0))
 
-    if bool(find_written_fractions):
-        # Use the fractions module to convert the written fraction to a float and add it to the quantity.
-        fraction_string = find_written_fractions.group(0)
-        quantity += float(Fraction(fraction_string))
+def get_quantity(raw_string: str = '100 ½ cups cheese') -> float:
+    '''Retrieve the specified amount of an ingredient string.
 
-    if bool(find_integers):
-        quantity += int(find_integers.group(0))
+    The first quantity in the raw_string is converted to a float, whether it is written as an integer, a decimal,
+    a fraction (1/2), a fraction symbol (½), a mixed number (1 1/2 or 1½) or a range (2-3, the midpoint is used).
+    Returns 0 if there is no quantity. The number must be interpreted along the results of get_unit_of_measurement()
+    in order to make any meaning out of the quantity.
 
-    return quantity
+    '''
+    return lex(raw_string).quantity
 
 
 def get_unit_of_measurement(raw_string: str = '100½ cups cheese', unit_list: list = list_of_units) -> str:
     '''Retrieve the measurement unit of a raw ingredient string.
 
-    Simply matches the raw string against a RegEx pattern of all the units mentioned in "unit_list".
+    Returns the first (whole word) occurrence of any of the units mentioned in "unit_list", in lower case.
     If none of the measurements are returned, the function assumes that the ingredients are measured in
     discrete terms (i.e "1 whole egg") without any specific measurement
 
     '''
+    return lex(raw_string, unit_list).unit or 'whole'
 
-    search = re.search('|'.join(unit_list), raw_string)
-    if search:
-        return search.group(0)
-    else:
-        return 'whole'
 
+# Raw ingredient string -> parsed details.
+parse_cache = LRUCache('parse')
 
-# Show the results of the functions above in a dictionary.
-def get_parsed_string(test_string: str = '½ pound shredded mozzarella cheese'):
-    q = get_quantity(test_string)
-    m = get_unit_of_measurement(test_string)
-    d = get_ingredient_description(test_string)
+
+def parse_ingredient_string(raw_string: str) -> dict:
+    # A single scan gives the quantity, measurement and description.
+    with stage_timer('lex'):
+        lexed = lex(raw_string)
+    q = lexed.quantity
+    m = lexed.unit or 'whole'
+    with stage_timer('noun'):
+        d = get_noun(lexed.description).strip()
 
     return {'quantity': q, 'measurement': m, 'description': d}
+
+
+# Show the results of the functions above in a dictionary.
+def get_parsed_string(test_string: str = '½ pound shredded mozzarella cheese'):
+    # Copy the cached details, so callers can't modify the cached entry.
+    return dict(parse_cache.get_or_compute(test_string, parse_ingredient_string))
@@ -0,0 +1,95 @@
+import pandas as pd
+
+'''
+match_index.py
+
+A precomputed index over the Food item names in the SHARP-DB, used by match_row_ids() in "calculator.py".
+
+The naive matcher runs a substring search over every SHARP name, and then scans "ingredient_frequency.csv" once per candidate
+to pick the most frequently used one. The index does both of those things up front:
+
+|- Every SHARP name is broken into character trigrams, and each trigram points to the rows containing it.
+|- Every SHARP row gets its frequency rank attached (the highest frequency of any ingredient name containing it).
+
+A lookup then only has to intersect a handful of (small) trigram postings and verify the survivors.
+'''
+
+
+def generate_ngrams(string: str, n: int = 3) -> set:
+    '''Returns the set of all (overlapping) character n-grams in a string.'''
+    return {string[i:i + n] for i in range(len(string) - n + 1)}
+
+
+def compute_frequency_ranks(names: list, frequencies: pd.DataFrame) -> list:
+    '''
+    For each name, find the highest frequency among the ingredient names that contain it (0 if there are none).
+    Ingredient names are visited from most to least frequent, so the first hit is the highest frequency.
+    '''
+    ingredient_frequencies = frequencies.sort_values('frequency', ascending=False)
+    ingredient_frequencies = list(zip(ingredient_frequencies['ingredient_name'].astype(str),
+                                      ingredient_frequencies['frequency'].astype(int)))
+
+    ranks = []
+    for name in names:
+        rank = 0
+        for ingredient_name, frequency in ingredient_frequencies:
+            if name in ingredient_name:
+                rank = frequency
+                break
+        ranks.append(rank)
+    return ranks
+
+
+class MatchIndex:
+    '''
+    Inverted trigram index over SHARP food item names, with each item's frequency rank attached.
+
+    Row IDs are positions in the SHARP dataframe the index was built from (0..len(sharp)-1), in the original order,
+    so ties are resolved the same way as iterating over the dataframe would.
+    '''
+
+    def __init__(self, sharp: pd.DataFrame, frequencies: pd.DataFrame, n: int = 3, ranks: list = None):
+        self.n = n
+        self.names = [str(name) for name in sharp['Food item']]
+        # The ranks can be passed in when they were precomputed (see "snapshot.py").
+        self.ranks = list(ranks) if ranks is not None else compute_frequency_ranks(self.names, frequencies)
+
+        self.postings = {}
+        for row_id, name in enumerate(self.names):
+            for ngram in generate_ngrams(name, n):
+                self.postings.setdefault(ngram, []).append(row_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def candidates(self, ingredient_description: str) -> list:
+        '''Returns the (sorted) row IDs of every name that contains the description as a substring.'''
+        if len(ingredient_description) < self.n:
+            # Too short to produce an n-gram, fall back to checking every name.
+            return [row_id for row_id, name in enumerate(self.names) if ingredient_description in name]
+
+        # Intersect the postings, smallest first, so the candidate set shrinks as quickly as possible.
+        postings = []
+        for ngram in generate_ngrams(ingredient_description, self.n):
+            posting = self.postings.get(ngram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        row_ids = set(postings[0])
+        for posting in postings[1:]:
+            row_ids.intersection_update(posting)
+            if not row_ids:
+                return []
+
+        # Sharing every trigram does not guarantee containment (i.e "abcab" vs "cabc"), so verify each survivor.
+        return sorted(row_id for row_id in row_ids if ingredient_description in self.names[row_id])
+
+    def most_frequent(self, row_ids: list):
+        '''Returns the first row ID with the highest frequency rank, or None if there are no row IDs.'''
+        best_row_id = None
+        for row_id in row_ids:
+            if best_row_id is None or self.ranks[best_row_id] < self.ranks[row_id]:
+                best_row_id = row_id
+        return best_row_id
@@ -1,65 +1,149 @@
-def convert_measurement_to_kg(measurement: str, amount: float) -> float:
-    '''A switch statement, chooses the appropriate conversion function based on the string argument.'''
-    switch_statement = {
-        'pound': pounds_to_metric,
-        'pounds': pounds_to_metric,
-        'ounce': ounce_to_metric,
-        'ounces': ounce_to_metric,
-        'oz': ounce_to_metric,
-        'cup': cups_to_metric,
-        'cups': cups_to_metric,
-        'tablespoon': tablespoons_to_metric,
-        'tablespoons': tablespoons_to_metric,
-        'tbsp': tablespoons_to_metric,
-        'teaspoons': teaspoons_to_metric,
-        'teaspoon': teaspoons_to_metric,
-        'tsp': teaspoons_to_metric,
-        'tsps': teaspoons_to_metric,
-        'kilogram': amount,
-        'kilograms': amount,
-        'kg': amount,
-        'kgs': amount,
-        'gram': lambda a: a / 1000,
-        'grams': lambda a: a / 1000,
-        'g': lambda a: a / 1000
-    }
-
-    chosen_conversion = switch_statement.get(
-        measurement, lambda a: f'Error: Measure "{measurement}" not included in function: convert_measuremnt_to_kg().')
+from typing import NamedTuple, Optional
+import os
+import re
+import numpy as np
+import pandas as pd
+from core.utils.noun_extraction import singular_variants
 
+'''
+measurement_conversions.py
+
+Converts amounts in any known unit to kilograms, from two tables in "core/data":
+
+|- unit_table.csv: Every unit (and its spelling variants), whether it measures mass or volume, and its factor:
+|                  kilograms per unit for mass, milliliters per unit for volume.
+|- density_table.csv: Grams per milliliter of SHARP food items, used to weigh volumes (i.e "2 cups of flour").
+
+Densities are looked up by SHARP food item name (see DensityIndex). Food items without an entry, or volumes converted
+without a food item, use the density of water (GREEN_BITE_DEFAULT_DENSITY, 1 g/ml by default).
+
+Unknown units raise UnknownUnitError. The vectorized convert_measurements_to_kg() can turn them into NaN instead.
+'''
+
+# Filepath to CSV data
+unit_table_csv = 'core/data/unit_table.csv'
+density_table_csv = 'core/data/density_table.csv'
+
+DEFAULT_DENSITY = float(os.environ.get('GREEN_BITE_DEFAULT_DENSITY', 1.0))
+
+
+class UnknownUnitError(ValueError):
+    '''Raised when converting a measurement that isn't in the unit table.'''
+
+    def __init__(self, measurements):
+        self.measurements = measurements
+        super().__init__(f'Unknown measurement: {", ".join(map(repr, measurements))}')
+
+
+class Unit(NamedTuple):
+    name: str
+    dimension: str  # 'mass' or 'volume'
+    factor: float  # Kilograms per unit for mass, milliliters per unit for volume
+
+
+def read_unit_table(filepath: str = unit_table_csv) -> pd.DataFrame:
+    units = pd.read_csv(filepath, index_col='unit', dtype={'unit': str, 'dimension': str, 'factor': float})
+    # Kilograms per unit, for a density of 1 g/ml. Volumes are multiplied by the density on top of this.
+    units['kilograms'] = np.where(units['dimension'] == 'volume', units['factor'] / 1000, units['factor'])
+    units['is_volume'] = units['dimension'] == 'volume'
+    return units
+
+
+unit_table = read_unit_table()
+units = {name: Unit(name, row.dimension, row.factor) for name, row in unit_table.iterrows()}
+_kilograms_per_unit = dict(zip(unit_table.index, unit_table['kilograms']))
+_volume_units = frozenset(unit_table.index[unit_table['is_volume']])
+# Every spelling of a unit -> its first spelling in the table (i.e "cups" -> "cup", "g" -> "gram").
+_canonical_units = dict(zip(unit_table.index,
+                            unit_table.reset_index().groupby(['dimension', 'factor'])['unit'].transform('first')))
+
+
+def get_unit(measurement: str) -> Unit:
     try:
-        return chosen_conversion(amount)
-    except TypeError:
-        return amount
+        return units[measurement]
+    except (KeyError, TypeError):
+        raise UnknownUnitError([measurement]) from None
+
+
+def is_volume(measurement: str) -> bool:
+    return measurement in _volume_units
+
+
+def canonical_unit(measurement: str) -> str:
+    '''Returns the same spelling for every spelling of a unit, so amounts in the same unit can be added up. Unknown units are kept.'''
+    return _canonical_units.get(measurement, measurement)
+
+
+def convert_measurement_to_kg(measurement: str, amount: float, density: float = DEFAULT_DENSITY) -> float:
+    '''Converts an amount to kilograms. Volumes are weighed with the density (in grams per milliliter).'''
+    kilograms_per_unit = _kilograms_per_unit.get(measurement)
+    if kilograms_per_unit is None:
+        raise UnknownUnitError([measurement])
+    if measurement in _volume_units:
+        return amount * kilograms_per_unit * density
+    return amount * kilograms_per_unit
+
+
+def convert_measurements_to_kg(measurements, amounts, densities=DEFAULT_DENSITY, errors: str = 'raise') -> np.ndarray:
+    '''
+    Converts arrays of measurements and amounts to kilograms, weighing volumes with densities (one per amount, or a
+    single density for all of them). Unknown measurements raise UnknownUnitError, or become NaN with errors='coerce'.
+    '''
+    table = unit_table.reindex(pd.Index(measurements, dtype=object))
+    kilograms_per_unit = table['kilograms'].to_numpy()
+
+    unknown = np.isnan(kilograms_per_unit)
+    if errors == 'raise' and unknown.any():
+        raise UnknownUnitError(sorted(set(map(str, table.index[unknown]))))
 
+    volume = table['is_volume'].eq(True).to_numpy()
+    density = np.where(volume, np.broadcast_to(np.asarray(densities, dtype=float), volume.shape), 1.0)
+    return np.asarray(amounts, dtype=float) * kilograms_per_unit * density
 
-def pounds_to_metric(pounds: float = 1) -> float:
-    '''Converts pounds to kilograms'''
-    return round(pounds * 0.45359237, 3)
 
+class DensityEntry(NamedTuple):
+    food_item: Optional[str]  # The density table entry used, None when the default density was used
+    grams_per_ml: float
 
-def ounce_to_metric(ounce: float = 1) -> float:
-    '''Converts ounces to kilograms.'''
-    return round(ounce * 0.0283495231, 3)
 
+class DensityIndex:
+    '''
+    Dictionary from density table names to their entry, looked up with SHARP food item names.
 
-'''The measures below are problematic as they are not measures of mass, but measures of volume.
-In order to get the exact values one needs the mass density of the substance in question. '''
+    A food item is looked up as a whole, then by the part before its first comma or parenthesis ("olive oil, virgin"
+    -> "olive oil"), then without its leading words ("sunflower seed oil" -> "seed oil" -> "oil"), with the singular
+    forms of the last word each time. Table entries can so be specific SHARP items, or generic ones ("flour").
+    '''
 
+    def __init__(self, food_items: list, grams_per_ml: list, default_grams_per_ml: float = DEFAULT_DENSITY):
+        self.default = DensityEntry(None, default_grams_per_ml)
+        self.entries = {}
+        for food_item, density in zip(food_items, grams_per_ml):
+            name = ' '.join(str(food_item).lower().split())
+            self.entries.setdefault(name, DensityEntry(name, float(density)))
 
-def cups_to_metric(cups: float = 1) -> float:
-    '''Converts cups to kilograms. (Formula based on sugar) '''
-    kilograms = cups / 4.960
-    return kilograms
+    @classmethod
+    def from_csv(cls, filepath: str = density_table_csv, default_grams_per_ml: float = DEFAULT_DENSITY):
+        table = pd.read_csv(filepath)
+        return cls(table['food_item'], table['grams_per_ml'], default_grams_per_ml)
 
+    def __len__(self) -> int:
+        return len(self.entries)
 
-def tablespoons_to_metric(tbsp: float = 1) -> float:
-    '''Converts tablespoons to kilograms. (Formula based on water) '''
-    kilograms = tbsp / 67
-    return kilograms
+    def lookup(self, food_item: str) -> DensityEntry:
+        '''Returns the entry for the food item, or the default when there is none.'''
+        if not isinstance(food_item, str):
+            return self.default
 
+        name = ' '.join(food_item.lower().split())
+        entry = self.entries.get(name)
+        if entry is not None:
+            return entry
 
-def teaspoons_to_metric(tsp: float = 1) -> float:
-    '''Converts teaspoons to kilograms.'''
-    kilograms = tsp / 123
-    return kilograms
+        words = re.sub(r'[^a-z ]+', ' ', re.split(r'[,(]', name, maxsplit=1)[0]).split()
+        for start in range(len(words)):
+            for key in singular_variants(' '.join(words[start:])):
+                entry = self.entries.get(key)
+                if entry is not None:
+                    return entry
+        return self.default
@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+from core.utils.cache import get_cache_stats
+
+'''
+metrics.py
+
+Latency histograms and counters for the parse -> match -> score pipeline, rendered in the Prometheus text format.
+
+Stages are timed with stage_timer("<stage>"), which records into the green_bite_stage_duration_seconds histogram. Code
+that wants a breakdown of a single call (i.e the opt-in timings of /parse) wraps it in collect_timings().
+
+Metrics live in the process that recorded them. With the process executor (see "executor.py"), the stages run in
+the pool's processes, so the stage histograms of the API process only cover the work it did itself.
+'''
+
+# Upper bounds (in seconds) of the histogram buckets, from 10 microseconds to 10 seconds.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+_collected_timings = ContextVar('collected_timings', default=None)
+# Stage name -> its series of the stage duration histogram, saves building the label key on every timed block.
+_stage_series = {}
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Counter:
+
+    def __init__(self, name: str, description: str, label_names: tuple = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{format_labels(dict(zip(self.label_names, key)))} {value}')
+        return lines
+
+
+class HistogramSeries:
+    '''The bucket counts, sum and count of one set of label values of a histogram.'''
+
+    __slots__ = ('buckets', 'bucket_counts', 'total', 'count', '_lock')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.total += value
+            self.count += 1
+
+
+class Histogram:
+
+    def __init__(self, name: str, description: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, **labels) -> HistogramSeries:
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        series = self.series.get(key)
+        if series is None:
+            with self._lock:
+                series = self.series.setdefault(key, HistogramSeries(self.buckets))
+        return series
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(self.series.items()):
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + ('+Inf',), series.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{format_labels({**labels, "le": upper_bound})} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {series.total}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {series.count}')
+        return lines
+
+
+stage_duration = Histogram('green_bite_stage_duration_seconds', 'Time spent in each stage of the scoring pipeline.', ('stage',))
+match_misses = Counter('green_bite_match_misses_total', 'Ingredient descriptions without any match in the SHARP-DB.')
+http_request_duration = Histogram('green_bite_http_request_duration_seconds', 'Time spent handling HTTP requests.', ('path', 'method'))
+http_responses = Counter('green_bite_http_responses_total', 'HTTP responses sent, by path and status code.', ('path', 'method', 'status'))
+
+
+class stage_timer:
+    '''Context manager, times the enclosed block as one stage of the pipeline (i.e: with stage_timer('match'): ...).'''
+
+    __slots__ = ('stage', 'series', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.series = _stage_series.get(stage) or _stage_series.setdefault(stage, stage_duration.labels(stage=stage))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.series.observe(elapsed)
+        timings = _collected_timings.get()
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + elapsed
+
+
+@contextmanager
+def collect_timings():
+    '''Collects the time spent per stage (in seconds) within the block, into the yielded dict.'''
+    timings = {}
+    token = _collected_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected_timings.reset(token)
+
+
+def render_cache_metrics() -> list:
+    stats = get_cache_stats()
+    lines = []
+    for metric, kind, description in [('hits', 'counter', 'Cache lookups that found an entry.'),
+                                      ('misses', 'counter', 'Cache lookups that did not find an entry.'),
+                                      ('evictions', 'counter', 'Entries evicted because the cache was full.'),
+                                      ('size', 'gauge', 'Number of entries in the cache.')]:
+        name = f'green_bite_cache_{metric}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        # Sizes that couldn't be read (i.e of a locked disk cache) are None, and left out.
+        lines += [f'{name}{format_labels({"cache": cache})} {cache_stats[metric]}' for cache, cache_stats in stats.items()
+                  if cache_stats[metric] is not None]
+    return lines
+
+
+def render_metrics() -> str:
+    '''Renders every metric in the Prometheus text exposition format.'''
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    lines += render_cache_metrics()
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,232 @@
+import csv
+import os
+import re
+import sys
+import time
+from core.utils.cache import invalidate_caches
+
+'''
+noun_extraction.py
+
+Backends for picking the noun (the actual food) out of a cleaned up ingredient string, used by
+get_ingredient_description() in "ingredient_parser.py". For instance: "smoked salmon" -> "salmon".
+
+|- lexicon (default): Looks the words up in a vocabulary of food nouns, built from the SHARP and frequency tables of
+|                     the current dataset (and rebuilt when it's reloaded).
+|                     Costs a dictionary lookup per word, and needs no NLTK data.
+|- textblob: Runs the NLTK perceptron tagger through TextBlob, and returns the first word tagged as a noun.
+|            TextBlob is only imported when this backend is used.
+
+The backend is chosen with the GREEN_BITE_NOUN_EXTRACTOR environment variable, or set_noun_extractor().
+
+Run "python -m core.utils.noun_extraction" to compare the backends (agreement and latency) on a corpus of
+ingredient strings generated from ingredient_frequency.csv.
+'''
+
+sharp_csv = 'core/data/SHARP.csv'
+frequencies_csv = 'core/data/ingredient_frequency.csv'
+
+# Words that show up in food names, but that a POS tagger would not consider to be the noun of an ingredient string.
+non_nouns = {
+    'a', 'an', 'the', 'of', 'and', 'or', 'with', 'without', 'in', 'into', 'for', 'to', 'at', 'on', 'about', 'plus',
+    'more', 'such', 'as', 'each', 'some', 'other', 'few', 'all', 'any', 'very', 'taste', 'optional', 'divided',
+    'fresh', 'large', 'small', 'big', 'whole', 'extra', 'virgin', 'light', 'dark', 'green', 'red', 'yellow', 'white',
+    'black', 'brown', 'golden', 'purple', 'sweet', 'sour', 'bitter', 'hot', 'cold', 'warm', 'plain', 'purpose',
+    'lean', 'low', 'fat', 'free', 'raw', 'baby', 'young', 'new', 'old', 'soft', 'hard', 'fine', 'coarse', 'thick',
+    'thin', 'regular', 'organic', 'frozen', 'dry', 'mild', 'spicy', 'instant', 'natural', 'pure', 'heavy', 'half',
+    'good', 'quality', 'favorite', 'homemade', 'store', 'bought', 'room', 'temperature', 'kosher', 'unsweetened',
+}
+
+
+def tokenize(string: str) -> list:
+    '''Splits a string into words (letters only, so numbers and punctuation are dropped).'''
+    return re.findall(r"[^\W\d_]+(?:'[^\W\d_]+)?", string)
+
+
+def is_modifier(word: str) -> bool:
+    '''Returns True for words that are most likely not nouns: known non nouns, participles (smoked) and adverbs (finely).'''
+    return word in non_nouns or (word.endswith('ed') and not word.endswith('eed')) or word.endswith('ly')
+
+
+def singularize(word: str) -> list:
+    '''Returns the possible singular forms of a (possibly plural) word, i.e "tomatoes" -> ["tomatoe", "tomato"].'''
+    forms = []
+    if word.endswith('ies'):
+        forms.append(word[:-3] + 'y')
+    if word.endswith('es'):
+        forms.append(word[:-2])
+    if word.endswith('s'):
+        forms.append(word[:-1])
+    return forms
+
+
+def singular_variants(name: str) -> list:
+    '''Returns the name, followed by the name with each possible singular form of its last word.'''
+    words = name.split()
+    if not words:
+        return []
+    return [name] + [' '.join(words[:-1] + [singular]) for singular in singularize(words[-1])]
+
+
+class LexiconNounExtractor:
+    '''Returns the first word found in a vocabulary of food nouns, without doing any tagging.'''
+
+    def __init__(self, nouns: set):
+        self.nouns = nouns
+
+    @classmethod
+    def from_names(cls, ingredient_names, food_items):
+        '''
+        Builds the vocabulary from the head nouns of the ingredient names (their last word) and of the SHARP food
+        items (the last word before the first comma, i.e "Atlantic salmon, smoked" -> "salmon").
+        '''
+        nouns = set()
+        for name in ingredient_names:
+            words = tokenize(str(name).lower())
+            if words:
+                nouns.add(words[-1])
+        for food_item in food_items:
+            words = tokenize(str(food_item).lower().split(',')[0])
+            if words:
+                nouns.add(words[-1])
+
+        return cls({noun for noun in nouns if not is_modifier(noun)})
+
+    @classmethod
+    def from_data(cls, sharp_filepath: str = sharp_csv, frequencies_filepath: str = frequencies_csv):
+        '''Builds the vocabulary from the SHARP and frequency CSVs.'''
+        with open(frequencies_filepath, newline='') as file:
+            ingredient_names = [row['ingredient_name'] for row in csv.DictReader(file)]
+        with open(sharp_filepath, newline='') as file:
+            food_items = [row['Food item'] for row in csv.DictReader(file)]
+        return cls.from_names(ingredient_names, food_items)
+
+    @classmethod
+    def from_dataset(cls, dataset=None):
+        '''Builds the vocabulary from the tables of a Dataset (see "dataset.py"), the current one by default.'''
+        if dataset is None:
+            # Imported here, "dataset.py" rebuilds the extractor when the data is reloaded.
+            from core.utils.dataset import get_dataset
+            dataset = get_dataset()
+        return cls.from_names(dataset.frequencies['ingredient_name'], dataset.sharp['Food item'])
+
+    def is_noun(self, word: str) -> bool:
+        return word in self.nouns or any(form in self.nouns for form in singularize(word))
+
+    def __call__(self, string: str) -> str:
+        words = tokenize(string)
+        for word in words:
+            if self.is_noun(word.lower()):
+                return word
+
+        # Not a food we know, fall back to the first word that doesn't look like a modifier.
+        for word in words:
+            if not is_modifier(word.lower()):
+                return word
+        return string
+
+
+class TextBlobNounExtractor:
+    '''Returns the first noun detected in a string. Using TextBlob: https://textblob.readthedocs.io/en/dev/'''
+
+    def __init__(self):
+        from textblob import TextBlob
+        self.TextBlob = TextBlob
+
+    def __call__(self, string: str) -> str:
+        blob = self.TextBlob(string)
+        for word, pos in blob.tags:
+            if "NN" in pos:  # NN == Nouns
+                return word
+        return string
+
+
+noun_extractors = {
+    'lexicon': LexiconNounExtractor.from_dataset,
+    'textblob': TextBlobNounExtractor,
+}
+
+noun_extractor_name = os.environ.get('GREEN_BITE_NOUN_EXTRACTOR', 'lexicon')
+_noun_extractor = None
+
+
+def set_noun_extractor(name: str):
+    '''Switches the noun extraction backend. The backend is created on its next use, parsed strings are invalidated.'''
+    global noun_extractor_name, _noun_extractor
+    if name not in noun_extractors:
+        raise ValueError(f'Unknown noun extractor "{name}", expected one of: {", ".join(noun_extractors)}')
+    noun_extractor_name = name
+    _noun_extractor = None
+    invalidate_caches()
+
+
+def rebuild_noun_extractor(dataset=None):
+    '''Recreates the backend right away, i.e from the tables of a dataset that was just reloaded.'''
+    global _noun_extractor
+    set_noun_extractor(noun_extractor_name)
+    if noun_extractor_name == 'lexicon':
+        _noun_extractor = LexiconNounExtractor.from_dataset(dataset)
+    else:
+        get_noun_extractor()
+
+
+def get_noun_extractor():
+    '''Returns the configured backend, creating it on first use.'''
+    global _noun_extractor
+    if _noun_extractor is None:
+        _noun_extractor = noun_extractors[noun_extractor_name]()
+    return _noun_extractor
+
+
+def get_noun(string: str) -> str:
+    '''Returns the first noun detected in a string, using the configured backend.'''
+    return get_noun_extractor()(string)
+
+
+def generate_corpus(frequencies_filepath: str = frequencies_csv, size: int = 1000) -> list:
+    '''Generates ingredient strings, such as "2 cups of shredded cheddar cheese", from the most frequent ingredients.'''
+    with open(frequencies_filepath, newline='') as file:
+        rows = sorted(csv.DictReader(file), key=lambda row: int(row['frequency']), reverse=True)[:size]
+
+    templates = ['1 {}', '2 cups {}', '1½ tablespoons of {}', '3 ounces {} (diced)', '½ pound shredded {}']
+    return [templates[i % len(templates)].format(row['ingredient_name']) for i, row in enumerate(rows)]
+
+
+def compare_noun_extractors(strings: list, baseline, candidate) -> dict:
+    '''Runs two backends over the (already cleaned up) strings, returns their agreement and per call latency.'''
+    results = {}
+    for name, extractor in [('baseline', baseline), ('candidate', candidate)]:
+        start = time.perf_counter()
+        nouns = [extractor(string) for string in strings]
+        results[name] = {'nouns': nouns, 'microseconds_per_call': (time.perf_counter() - start) / len(strings) * 1e6}
+
+    agreeing = sum(a.strip().lower() == b.strip().lower() for a, b in zip(results['baseline']['nouns'], results['candidate']['nouns']))
+    results['agreement'] = agreeing / len(strings)
+    return results
+
+
+if __name__ == '__main__':
+    from core.utils.ingredient_parser import get_ingredient_description
+
+    # Strip quantities and units first, as get_ingredient_description() does, but keep the string for the backends.
+    corpus = generate_corpus(size=int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    cleaned = [get_ingredient_description(string, extract_noun=False) for string in corpus]
+
+    lexicon = LexiconNounExtractor.from_data()
+    try:
+        textblob = TextBlobNounExtractor()
+        textblob('warm up')
+    except Exception as error:
+        print(f'TextBlob backend unavailable ({type(error).__name__}), timing the lexicon backend only.')
+        report = compare_noun_extractors(cleaned, lexicon, lexicon)
+        print(f"lexicon: {report['candidate']['microseconds_per_call']:.1f} µs per call")
+        sys.exit(0)
+
+    report = compare_noun_extractors(cleaned, textblob, lexicon)
+    print(f'{len(corpus)} ingredient strings')
+    print(f"textblob: {report['baseline']['microseconds_per_call']:.1f} µs per call")
+    print(f"lexicon: {report['candidate']['microseconds_per_call']:.1f} µs per call")
+    print(f"agreement: {report['agreement']:.1%}")
+    for string, expected, actual in zip(corpus, report['baseline']['nouns'], report['candidate']['nouns']):
+        if expected.strip().lower() != actual.strip().lower():
+            print(f'  {string!r}: textblob={expected!r} lexicon={actual!r}')
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+'''
+profiler.py
+
+Profiles the scoring of individual requests, to find out where the time goes without attaching external tools.
+
+The profiler hooks into every Python and builtin function call of the profiled thread (with sys.setprofile), and
+records the time spent in each distinct call stack. That's deterministic, and slows the profiled call down a lot,
+so it's only used when asked for:
+
+|- Per request: /parse and /score take a "profile" query flag (or an "X-Profile: true" header). The request is scored
+|  under the profiler, the profile is kept, and its ID is returned in an X-Profile-Id header. Profiling is an admin
+|  feature: it needs an X-Admin-Token header matching GREEN_BITE_ADMIN_TOKEN, and is refused without a token.
+|- For a corpus: "benchmarks/profile_corpus.py" profiles many ingredient strings, and writes the reports to files.
+
+Every profile can be read as:
+
+|- Hotspots: the functions with the most time spent in themselves (self) and in their callees (total).
+|- Collapsed stacks: one "caller;callee;... microseconds" line per stack, the input of flamegraph.pl, speedscope or
+|  inferno, to draw a flamegraph.
+
+The last GREEN_BITE_PROFILE_KEEP profiles (default 20) are kept in memory. When GREEN_BITE_PROFILE_DIR is set, they are
+also written there, so profiles taken by any worker can be collected from one place.
+'''
+
+PROFILE_KEEP = int(os.environ.get('GREEN_BITE_PROFILE_KEEP', 20))
+
+# Directory of this repository, stripped from file names in the function labels.
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get_code_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(ROOT):
+        filename = os.path.relpath(filename, ROOT)
+    else:
+        # Keep the interesting part of library paths, i.e "pandas/core/frame.py".
+        parts = filename.replace('\\', '/').split('/')
+        if 'site-packages' in parts:
+            parts = parts[parts.index('site-packages') + 1:]
+        filename = '/'.join(parts[-3:])
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def get_builtin_label(function) -> str:
+    # Methods of builtin types (i.e dict.get) have no module, their qualified name has the type instead.
+    module = getattr(function, '__module__', None)
+    name = getattr(function, '__qualname__', function.__name__)
+    return f'{module}.{name} (builtin)' if module else f'{name} (builtin)'
+
+
+class StackProfiler:
+    '''Records the time spent in every call stack of the current thread, use as a context manager.'''
+
+    def __init__(self):
+        self.stacks = {}  # Tuple of function labels (outermost first) -> seconds spent in the innermost one
+        self.calls = {}  # Function label -> number of calls
+        self._stack = []
+        self._labels = {}
+        self._last = None
+
+    def _record(self, now: float):
+        if self._stack:
+            stack = tuple(self._stack)
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + (now - self._last)
+        self._last = now
+
+    def _profile(self, frame, event, arg):
+        now = time.perf_counter()
+        self._record(now)
+
+        if event == 'call' or event == 'c_call':
+            key = frame.f_code if event == 'call' else arg
+            label = self._labels.get(key)
+            if label is None:
+                label = get_code_label(key) if event == 'call' else get_builtin_label(key)
+                self._labels[key] = label
+            self._stack.append(label)
+            self.calls[label] = self.calls.get(label, 0) + 1
+        elif self._stack:
+            self._stack.pop()
+
+        # Leave out the time spent in this function.
+        self._last = time.perf_counter()
+
+    def __enter__(self):
+        self._last = time.perf_counter()
+        sys.setprofile(self._profile)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+        # Leave out this method, and its call to sys.setprofile.
+        own_label = get_code_label(StackProfiler.__exit__.__code__)
+        self.stacks = {stack: seconds for stack, seconds in self.stacks.items() if stack[0] != own_label}
+        self.calls.pop(own_label, None)
+        self.calls.pop('sys.setprofile (builtin)', None)
+
+
+@dataclass
+class Profile:
+    name: str
+    seconds: float  # Wall clock time of the profiled call, with the profiler's overhead
+    stacks: dict
+    calls: dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    created_at: float = field(default_factory=time.time)
+
+    def hotspots(self, limit: int = 20) -> list:
+        '''The functions with the most self time, with their total time (in milliseconds) and number of calls.'''
+        self_time, total_time = {}, {}
+        for stack, seconds in self.stacks.items():
+            self_time[stack[-1]] = self_time.get(stack[-1], 0.0) + seconds
+            # Recursive functions appear several times in a stack, their time is counted once.
+            for label in set(stack):
+                total_time[label] = total_time.get(label, 0.0) + seconds
+
+        labels = sorted(self_time, key=self_time.get, reverse=True)[:limit]
+        return [{'function': label, 'calls': self.calls.get(label, 0), 'selfMs': round(self_time[label] * 1000, 4),
+                 'totalMs': round(total_time[label] * 1000, 4)} for label in labels]
+
+    def collapsed(self) -> str:
+        '''The stacks in the collapsed format of flamegraph.pl, with the time in (whole) microseconds.'''
+        lines = []
+        for stack, seconds in sorted(self.stacks.items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds > 0:
+                lines.append(';'.join(label.replace(';', ':') for label in stack) + f' {microseconds}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, limit: int = 20) -> dict:
+        return {'id': self.id, 'name': self.name, 'createdAt': self.created_at, 'ms': round(self.seconds * 1000, 4),
+                'profiledMs': round(sum(self.stacks.values()) * 1000, 4), 'hotspots': self.hotspots(limit)}
+
+
+def profile_call(name: str, function, *args) -> tuple:
+    '''Calls function(*args) under the profiler, returns its result and the Profile.'''
+    start = time.perf_counter()
+    with StackProfiler() as profiler:
+        result = function(*args)
+    return result, Profile(name, time.perf_counter() - start, profiler.stacks, profiler.calls)
+
+
+def merge_profiles(profiles: list, name: str) -> Profile:
+    '''Adds up the stacks and calls of several profiles, i.e of every ingredient string in a corpus.'''
+    stacks, calls = {}, {}
+    for profile in profiles:
+        for stack, seconds in profile.stacks.items():
+            stacks[stack] = stacks.get(stack, 0.0) + seconds
+        for label, count in profile.calls.items():
+            calls[label] = calls.get(label, 0) + count
+    return Profile(name, sum(profile.seconds for profile in profiles), stacks, calls)
+
+
+def write_profile(profile: Profile, directory: str, limit: int = 50):
+    '''Writes the hotspots (<id>.json) and collapsed stacks (<id>.collapsed) of a profile into directory.'''
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{profile.id}.json'), 'w') as file:
+        json.dump(profile.summary(limit), file, indent=2)
+    with open(os.path.join(directory, f'{profile.id}.collapsed'), 'w') as file:
+        file.write(profile.collapsed())
+
+
+class ProfileStore:
+    '''The most recent profiles, by ID.'''
+
+    def __init__(self, keep: int = PROFILE_KEEP, directory: str = None):
+        self.keep = keep
+        self.directory = directory
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        if self.directory:
+            write_profile(profile, self.directory)
+
+    def get(self, profile_id: str):
+        return self._profiles.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [{'id': profile.id, 'name': profile.name, 'createdAt': profile.created_at,
+                 'ms': round(profile.seconds * 1000, 4)} for profile in reversed(profiles)]
+
+
+profile_store = ProfileStore(directory=os.environ.get('GREEN_BITE_PROFILE_DIR') or None)
+
+
+def get_profile_store() -> ProfileStore:
+    return profile_store
@@ -0,0 +1,212 @@
+from typing import NamedTuple, Optional
+import hashlib
+import json
+import mmap
+import os
+import sys
+import numpy as np
+import pandas as pd
+from core.utils.match_index import compute_frequency_ranks
+
+'''
+snapshot.py
+
+Loads the SHARP, frequency and weight tables, either from the CSVs or from a precompiled binary snapshot of them.
+
+Parsing the CSVs, lower casing the food items and computing the frequency rank of every SHARP item costs a few hundred
+milliseconds, in every worker process. The snapshot stores the result of all of that in one file:
+
+|- MAGIC (8 bytes) | header length (8 bytes) | JSON header | padding | array sections, each aligned to 64 bytes |
+|- Strings are stored as string tables: one UTF-8 blob, plus an array with the offset of every string in it.
+|- Numbers are stored as little endian NumPy arrays (GHGE, land use, frequencies, frequency ranks, weights).
+
+The file is memory mapped, so the numeric arrays are read straight from the page cache, and shared between workers.
+The header records a SHA-256 of each source CSV, a snapshot is ignored (and the CSVs are parsed) when it is missing,
+unreadable or was built from different CSVs.
+
+Build it with: python -m core.utils.snapshot
+'''
+
+# Filepath to CSV data
+sharp_csv = 'core/data/SHARP.csv'
+frequencies_csv = 'core/data/ingredient_frequency.csv'
+weight_table_csv = 'core/data/weight_table.csv'
+snapshot_file = 'core/data/snapshot.bin'
+
+MAGIC = b'GBSNAP01'
+ALIGNMENT = 64
+
+
+class DataTables(NamedTuple):
+    sharp: pd.DataFrame
+    frequencies: pd.DataFrame
+    food_weights: pd.DataFrame
+    frequency_ranks: list
+    source: str  # 'csv' or 'snapshot'
+
+
+def read_sharp_csv(filepath: str = sharp_csv) -> pd.DataFrame:
+    sharp = pd.read_csv(filepath,
+                        usecols=[
+                            "Food item", "GHGE of 1 kg food as consumed_kgCO2eq",
+                            "Land use of 1 kg food as consumed_m2_yr"
+                        ])
+    sharp["Food item"] = sharp["Food item"].str.lower()
+
+    return sharp.rename(columns={"GHGE of 1 kg food as consumed_kgCO2eq": 'GHGE',
+                                 "Land use of 1 kg food as consumed_m2_yr": 'Land Use'})
+
+
+def read_csv_tables(sharp_filepath: str = sharp_csv, frequencies_filepath: str = frequencies_csv,
+                    weight_table_filepath: str = weight_table_csv) -> DataTables:
+    '''Parses the CSVs, and computes the frequency rank of every SHARP item.'''
+    sharp = read_sharp_csv(sharp_filepath)
+    food_weights = pd.read_csv(weight_table_filepath)
+    frequencies = pd.read_csv(frequencies_filepath)
+    frequencies = frequencies.sort_values('frequency', ascending=False)
+    frequency_ranks = compute_frequency_ranks([str(name) for name in sharp['Food item']], frequencies)
+
+    return DataTables(sharp, frequencies, food_weights, frequency_ranks, 'csv')
+
+
+def hash_file(filepath: str) -> str:
+    with open(filepath, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def hash_sources(filepaths: list) -> dict:
+    return {os.path.basename(filepath): hash_file(filepath) for filepath in filepaths}
+
+
+def encode_strings(strings) -> tuple:
+    '''Encodes strings as a string table: (UTF-8 blob, offsets), string i is blob[offsets[i]:offsets[i + 1]].'''
+    encoded = [str(string).encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(blob: np.ndarray, offsets: np.ndarray) -> list:
+    data = blob.tobytes()
+    return [sys.intern(data[start:end].decode('utf-8')) for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def build_snapshot(filepath: str = snapshot_file, sharp_filepath: str = sharp_csv,
+                   frequencies_filepath: str = frequencies_csv, weight_table_filepath: str = weight_table_csv) -> DataTables:
+    '''Parses the CSVs and writes the snapshot. Returns the tables it was built from.'''
+    tables = read_csv_tables(sharp_filepath, frequencies_filepath, weight_table_filepath)
+    sharp, frequencies, food_weights = tables.sharp, tables.frequencies, tables.food_weights
+
+    sharp_names, sharp_name_offsets = encode_strings(sharp['Food item'])
+    ingredient_names, ingredient_name_offsets = encode_strings(frequencies['ingredient_name'])
+    weight_names, weight_name_offsets = encode_strings(food_weights['ingredient'])
+    arrays = {
+        'sharp_names': sharp_names,
+        'sharp_name_offsets': sharp_name_offsets,
+        'sharp_ghge': sharp['GHGE'].to_numpy(dtype='<f8'),
+        'sharp_land_use': sharp['Land Use'].to_numpy(dtype='<f8'),
+        'sharp_frequency_ranks': np.asarray(tables.frequency_ranks, dtype='<i8'),
+        'frequency_ids': frequencies['id'].to_numpy(dtype='<i8'),
+        'frequency_names': ingredient_names,
+        'frequency_name_offsets': ingredient_name_offsets,
+        'frequency_frequencies': frequencies['frequency'].to_numpy(dtype='<i8'),
+        'frequency_ranks': frequencies['rank'].to_numpy(dtype='<i8'),
+        'weight_names': weight_names,
+        'weight_name_offsets': weight_name_offsets,
+        'weight_grams': food_weights['grams'].to_numpy(dtype='<i8'),
+    }
+
+    # Lay the arrays out back to back, each starting on an aligned offset (relative to the end of the header).
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {'offset': offset, 'dtype': array.dtype.str, 'length': len(array)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({
+        'sources': hash_sources([sharp_filepath, frequencies_filepath, weight_table_filepath]),
+        'sections': sections,
+    }).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+
+    temporary_filepath = filepath + '.tmp'
+    with open(temporary_filepath, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        for name, array in arrays.items():
+            data = array.tobytes()
+            file.write(data + b'\0' * (-len(data) % ALIGNMENT))
+    # Replace the snapshot in one step, so workers never map a half written file.
+    os.replace(temporary_filepath, filepath)
+
+    return tables
+
+
+def load_snapshot(filepath: str = snapshot_file, sharp_filepath: str = sharp_csv,
+                  frequencies_filepath: str = frequencies_csv, weight_table_filepath: str = weight_table_csv) -> Optional[DataTables]:
+    '''Memory maps the snapshot. Returns None if it is missing, unreadable or stale (built from other CSVs).'''
+    try:
+        with open(filepath, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        header_length = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], 'little')
+        header_end = len(MAGIC) + 8 + header_length
+        header = json.loads(mapped[len(MAGIC) + 8:header_end])
+
+        if header['sources'] != hash_sources([sharp_filepath, frequencies_filepath, weight_table_filepath]):
+            return None
+
+        arrays = {
+            name: np.frombuffer(mapped, dtype=section['dtype'], count=section['length'], offset=header_end + section['offset'])
+            for name, section in header['sections'].items()
+        }
+    except (ValueError, KeyError, OSError):
+        return None
+
+    sharp = pd.DataFrame({
+        'Food item': decode_strings(arrays['sharp_names'], arrays['sharp_name_offsets']),
+        'GHGE': arrays['sharp_ghge'],
+        'Land Use': arrays['sharp_land_use'],
+    }, copy=False)
+    frequencies = pd.DataFrame({
+        'id': arrays['frequency_ids'],
+        'ingredient_name': decode_strings(arrays['frequency_names'], arrays['frequency_name_offsets']),
+        'frequency': arrays['frequency_frequencies'],
+        'rank': arrays['frequency_ranks'],
+    }, copy=False)
+    food_weights = pd.DataFrame({
+        'ingredient': decode_strings(arrays['weight_names'], arrays['weight_name_offsets']),
+        'grams': arrays['weight_grams'],
+    }, copy=False)
+
+    return DataTables(sharp, frequencies, food_weights, arrays['sharp_frequency_ranks'].tolist(), 'snapshot')
+
+
+def load_tables(filepath: str = snapshot_file, sharp_filepath: str = sharp_csv,
+                frequencies_filepath: str = frequencies_csv, weight_table_filepath: str = weight_table_csv,
+                rebuild: bool = False) -> DataTables:
+    '''
+    Loads the tables from the snapshot, falling back to the CSVs when the snapshot is missing or stale.
+    With rebuild set, a missing or stale snapshot is rebuilt from the CSVs first (if the file can be written).
+    '''
+    tables = load_snapshot(filepath, sharp_filepath, frequencies_filepath, weight_table_filepath)
+    if tables is None and rebuild:
+        try:
+            build_snapshot(filepath, sharp_filepath, frequencies_filepath, weight_table_filepath)
+            tables = load_snapshot(filepath, sharp_filepath, frequencies_filepath, weight_table_filepath)
+        except OSError:
+            pass
+    if tables is None:
+        tables = read_csv_tables(sharp_filepath, frequencies_filepath, weight_table_filepath)
+    return tables
+
+
+if __name__ == '__main__':
+    build_snapshot(sys.argv[1] if len(sys.argv) > 1 else snapshot_file)
+    print(f'Snapshot written to {sys.argv[1] if len(sys.argv) > 1 else snapshot_file}')
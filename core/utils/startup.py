@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from core.utils.calculator import calculate_score, warm_disk_cache
+from core.utils.dataset import get_registry
+from core.utils.executor import get_executor
+from core.utils.noun_extraction import get_noun_extractor
+
+'''
+startup.py
+
+Warms the API up before it takes traffic, so the first requests don't pay for loading the data.
+
+Importing the app doesn't load any data: the dataset, its indexes and the noun extractor are built on first use.
+The FastAPI lifespan runs the warm-up instead, depending on GREEN_BITE_WARM_UP:
+
+|- background (default): The server accepts connections right away, and warms up in a thread. GET /ready answers
+|                        503 until the warm-up is done, so a load balancer only routes traffic to ready workers.
+|- blocking: The server only accepts connections once the warm-up is done.
+|- lazy: No warm-up, the first request that needs the data loads it. GET /ready is ready right away.
+
+The warm-up loads the dataset, builds the noun extractor, scores a first ingredient, fills the disk cache (if there is
+one, see "disk_cache.py") and starts the executor's pool (loading the data in every process of a process pool). The time spent in each step is reported by GET /ready.
+'''
+
+WARM_UP_MODES = ('background', 'blocking', 'lazy')
+
+# When the module was imported, close enough to when the worker started.
+started_at = time.perf_counter()
+
+
+def warm_up_dataset():
+    get_registry().load()
+
+
+def warm_up_scoring():
+    calculate_score('1 cup of milk')
+
+
+warm_up_steps = [
+    ('dataset', warm_up_dataset),
+    ('noun_extractor', get_noun_extractor),
+    ('scoring', warm_up_scoring),
+    ('disk_cache', warm_disk_cache),
+    ('executor', lambda: get_executor().start()),
+]
+
+
+class Readiness:
+    '''State of the warm-up: "starting", "warming", "ready" or "failed".'''
+
+    def __init__(self):
+        self.state = 'starting'
+        self.steps = {}
+        self.error = None
+        self.ready_after = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == 'ready'
+
+    def warm_up(self, steps: list = None):
+        '''Runs the warm-up steps, timing each one. Does nothing if the warm-up already ran (or is running).'''
+        with self._lock:
+            if self.state != 'starting':
+                return
+            self.state = 'warming'
+
+        try:
+            for name, step in steps if steps is not None else warm_up_steps:
+                start = time.perf_counter()
+                step()
+                self.steps[name] = time.perf_counter() - start
+        except Exception as error:
+            self.error = repr(error)
+            self.state = 'failed'
+            raise
+        self.ready_after = time.perf_counter() - started_at
+        self.state = 'ready'
+
+    def skip(self):
+        '''Reports ready without warming up (lazy mode).'''
+        self.ready_after = time.perf_counter() - started_at
+        self.state = 'ready'
+
+    def start(self, mode: str = None):
+        '''Warms up according to the mode (see above). Returns right away, unless the mode is "blocking".'''
+        mode = mode or os.environ.get('GREEN_BITE_WARM_UP', 'background')
+        if mode not in WARM_UP_MODES:
+            raise ValueError(f'Unknown warm-up mode "{mode}", expected one of: {", ".join(WARM_UP_MODES)}')
+
+        if mode == 'lazy':
+            self.skip()
+        elif mode == 'blocking':
+            self.warm_up()
+        else:
+            threading.Thread(target=self._warm_up_quietly, name='warm-up', daemon=True).start()
+
+    def _warm_up_quietly(self):
+        try:
+            self.warm_up()
+        except Exception:
+            pass  # Recorded in error, and reported by GET /ready
+
+    def info(self) -> dict:
+        return {
+            'status': self.state,
+            'steps': {name: round(seconds * 1000, 3) for name, seconds in self.steps.items()},
+            'readyAfterSeconds': round(self.ready_after, 3) if self.ready_after is not None else None,
+            'error': self.error,
+        }
+
+
+readiness = Readiness()
+
+
+def get_readiness() -> Readiness:
+    return readiness
@@ -0,0 +1,188 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from core.utils.calculator import score_ingredient
+from core.utils.executor import warm_up
+
+'''
+stream_scorer.py
+
+Scores recipe dumps that are too large to send through the HTTP API, with constant memory.
+
+|- Input: JSONL, one recipe per line ({"id": ..., "ingredients": [...]}, the same shape as POST /score/batch),
+|         or CSV, one ingredient per row (with a recipe id and an ingredient column).
+|- Output: JSONL, one line per ingredient with the recipe id, parsed details, matched food item and score.
+
+The input is read in chunks of ingredient lines. Identical strings within a chunk are only scored once, and chunks are
+scored in parallel by a process pool while the results are written in input order. After every chunk is written, a
+checkpoint (<output>.checkpoint) records how far the input and output got, so a crashed run resumes from there.
+
+Run with: python -m core.utils.stream_scorer recipes.jsonl scores.jsonl
+'''
+
+
+def score_lines(lines: list) -> list:
+    '''Scores a chunk of (recipe id, ingredient string) pairs, returns one JSON line per pair.'''
+    results = {}
+    output = []
+    for recipe_id, ingredient in lines:
+        if ingredient not in results:
+            result = score_ingredient(ingredient)
+            score = result.score if isinstance(result.score, (int, float)) and math.isfinite(result.score) else None
+            results[ingredient] = {
+                'ingredientMatched': result.food_item if isinstance(result.food_item, str) else None,
+                'sustainabilityScore': score,
+                'details': result.details(),
+            }
+        record = {'recipe': recipe_id, 'inputIngredientString': ingredient, **results[ingredient]}
+        output.append(json.dumps(record, ensure_ascii=False) + '\n')
+    return output
+
+
+def detect_format(filepath: str) -> str:
+    return 'csv' if filepath.lower().endswith('.csv') else 'jsonl'
+
+
+def read_lines(file, start_offset: int):
+    '''Yields (line, end offset) for every line of a binary file, starting at start_offset.'''
+    file.seek(start_offset)
+    offset = start_offset
+    for line in file:
+        offset += len(line)
+        yield line.decode('utf-8'), offset
+
+
+def read_jsonl_records(file, start_offset: int):
+    '''Yields (ingredient lines, end offset) for every recipe.'''
+    for line, offset in read_lines(file, start_offset):
+        if not line.strip():
+            continue
+        recipe = json.loads(line)
+        yield [(recipe.get('id'), ingredient) for ingredient in recipe.get('ingredients', [])], offset
+
+
+def read_csv_records(file, start_offset: int, id_column: str, ingredient_column: str):
+    '''Yields (ingredient lines, end offset) for every row. Fields spanning multiple lines are not supported.'''
+    file.seek(0)
+    header_line = file.readline()
+    header = next(csv.reader([header_line.decode('utf-8')]))
+    id_index, ingredient_index = header.index(id_column), header.index(ingredient_column)
+
+    for line, offset in read_lines(file, max(start_offset, len(header_line))):
+        if not line.strip():
+            continue
+        row = next(csv.reader(io.StringIO(line)))
+        yield [(row[id_index], row[ingredient_index])], offset
+
+
+def read_chunks(records, chunk_size: int):
+    '''Groups records into chunks of about chunk_size ingredient lines. Yields (lines, end offset of the chunk).'''
+    chunk = []
+    offset = None
+    for lines, offset in records:
+        chunk.extend(lines)
+        if len(chunk) >= chunk_size:
+            yield chunk, offset
+            chunk = []
+    if chunk:
+        yield chunk, offset
+
+
+def read_checkpoint(checkpoint_path: str, input_path: str) -> dict:
+    try:
+        with open(checkpoint_path) as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    # A checkpoint for another input (or an input that has since changed size) can't be resumed from.
+    if checkpoint.get('input') != os.path.abspath(input_path) or checkpoint.get('inputSize') != os.path.getsize(input_path):
+        return None
+    return checkpoint
+
+
+def write_checkpoint(checkpoint_path: str, checkpoint: dict):
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(checkpoint, file)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def score_stream(input_path: str, output_path: str, input_format: str = None, chunk_size: int = 5000,
+                 workers: int = None, resume: bool = True, id_column: str = 'recipe_id',
+                 ingredient_column: str = 'ingredient') -> dict:
+    '''
+    Scores every ingredient in input_path, and writes the results to output_path as JSONL.
+    Resumes from the last checkpoint if there is one (and resume is set): the output is cut back to what the checkpoint
+    recorded, and the rest is appended. Otherwise the output file is overwritten.
+    Returns the number of lines written, and the output path.
+    '''
+    input_format = input_format or detect_format(input_path)
+    workers = os.cpu_count() if workers is None else workers
+    checkpoint_path = output_path + '.checkpoint'
+
+    checkpoint = read_checkpoint(checkpoint_path, input_path) if resume else None
+    checkpoint = checkpoint or {'input': os.path.abspath(input_path), 'inputSize': os.path.getsize(input_path),
+                                'inputOffset': 0, 'outputOffset': 0, 'lines': 0}
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up) if workers > 1 else None
+    # At most this many chunks are held in memory (being scored or waiting to be written).
+    max_in_flight = workers * 2 if pool else 1
+    in_flight = deque()
+
+    with open(input_path, 'rb') as input_file, open(output_path, 'a+b') as output_file:
+        # Drop anything written after the last checkpoint, it will be scored again.
+        output_file.truncate(checkpoint['outputOffset'])
+        output_file.seek(checkpoint['outputOffset'])
+
+        def write_oldest_chunk():
+            future_or_lines, offset, count = in_flight.popleft()
+            lines = future_or_lines.result() if pool else future_or_lines
+            output_file.write(''.join(lines).encode('utf-8'))
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            checkpoint.update(inputOffset=offset, outputOffset=output_file.tell(), lines=checkpoint['lines'] + count)
+            write_checkpoint(checkpoint_path, checkpoint)
+
+        if input_format == 'csv':
+            records = read_csv_records(input_file, checkpoint['inputOffset'], id_column, ingredient_column)
+        else:
+            records = read_jsonl_records(input_file, checkpoint['inputOffset'])
+
+        try:
+            for lines, offset in read_chunks(records, chunk_size):
+                scored = pool.submit(score_lines, lines) if pool else score_lines(lines)
+                in_flight.append((scored, offset, len(lines)))
+                if len(in_flight) >= max_in_flight:
+                    write_oldest_chunk()
+            while in_flight:
+                write_oldest_chunk()
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    return {'lines': checkpoint['lines'], 'output': output_path}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a CSV or JSONL file of recipes, and write the scores as JSONL.')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None, help='Input format (default: from the extension)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Ingredient lines per chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Processes to score chunks with (default: number of CPUs)')
+    parser.add_argument('--restart', action='store_true', help='Ignore any checkpoint, and start over')
+    parser.add_argument('--id-column', default='recipe_id', help='CSV column with the recipe id')
+    parser.add_argument('--ingredient-column', default='ingredient', help='CSV column with the ingredient string')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = score_stream(args.input, args.output, args.format, args.chunk_size, args.workers, not args.restart,
+                         args.id_column, args.ingredient_column)
+    print(f"Scored {stats['lines']} ingredient lines in {time.perf_counter() - start:.1f}s", file=sys.stderr)
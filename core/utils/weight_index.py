@@ -0,0 +1,53 @@
+from typing import NamedTuple, Optional
+import os
+from core.utils.noun_extraction import singular_variants
+
+'''
+weight_index.py
+
+Resolves the weight of one whole unit of an ingredient (i.e "3 tomatoes"), from "weight_table.csv".
+
+The weight table is turned into a dictionary once, so a lookup is a handful of dictionary hits instead of a
+str.contains() over the whole table:
+
+|- Entries are indexed by name, and by the singular forms of their last word ("green beans" -> "green bean").
+|- A description is looked up as a whole first, then without its leading words ("large red onions" -> "red onions"
+|  -> "onions"), trying the singular forms of the last word each time ("onions" -> "onion").
+|- Descriptions without an entry get the default weight (GREEN_BITE_DEFAULT_WHOLE_WEIGHT grams, 50 by default,
+|  which is what every whole ingredient used to weigh).
+'''
+
+DEFAULT_WHOLE_WEIGHT = float(os.environ.get('GREEN_BITE_DEFAULT_WHOLE_WEIGHT', 50))
+
+
+class WeightEntry(NamedTuple):
+    ingredient: Optional[str]  # The weight table entry used, None when the default weight was used
+    grams: float
+
+
+class WeightIndex:
+    '''Dictionary from (normalized) weight table names to their entry.'''
+
+    def __init__(self, ingredients: list, grams: list, default_grams: float = DEFAULT_WHOLE_WEIGHT):
+        self.default = WeightEntry(None, default_grams)
+        self.entries = {}
+        for ingredient, weight in zip(ingredients, grams):
+            name = ' '.join(str(ingredient).lower().split())
+            entry = WeightEntry(name, float(weight))
+            # The first entry wins for duplicate names, like the table scan did.
+            self.entries.setdefault(name, entry)
+            for key in singular_variants(name)[1:]:
+                self.entries.setdefault(key, entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, description: str) -> WeightEntry:
+        '''Returns the entry for the description, or the default when there is none.'''
+        words = ''.join(character if character.isalpha() else ' ' for character in str(description).lower()).split()
+        for start in range(len(words)):
+            for key in singular_variants(' '.join(words[start:])):
+                entry = self.entries.get(key)
+                if entry is not None:
+                    return entry
+        return self.default
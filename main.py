@@ -1,8 +1,22 @@
-from fastapi import FastAPI, HTTPException, Query, Path
-from core.utils.calculator import calculate_score, get_food_match
-from core.utils.ingredient_parser import get_parsed_string
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Path, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from core.utils.calculator import get_match_candidates, score_grouped, score_ingredient
 from core.models.parsed_ingredient_response import ParsedIngredientResponse
-from typing import List
+from core.models.batch_score import BatchScoreRequest, BatchScoreResponse, PartialScoreResponse
+from core.models.score_breakdown import ScoreBreakdownResponse
+from core.utils.async_scorer import INGREDIENT_BUDGET, score_recipes as score_recipes_within_budget
+from core.utils.batch_scorer import score_batch
+from core.utils.cache import get_cache_stats
+from core.utils.dataset import get_registry
+from core.utils.executor import ExecutorOverloaded, get_executor, score_grouped_in_chunks, score_ingredient_with_timings
+from core.utils.metrics import http_request_duration, http_responses, render_metrics
+from core.utils.profiler import get_profile_store, profile_call
+from core.utils.startup import get_readiness
+from typing import List, Optional, Union
+import os
+import time
 
 
 description = """
@@ -25,51 +39,321 @@ The API makes __a lot__ of assumptions and simplifications. Take the results wit
 * Many ingredients are not in the database (or not in the format one might expect them to be).
 """
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the data and start the executor before taking traffic (see GREEN_BITE_WARM_UP in "startup.py").
+    get_readiness().start()
+    # Reload the dataset when its CSVs change (only when GREEN_BITE_DATASET_WATCH_INTERVAL is set).
+    get_registry().watch()
+    yield
+    get_registry().stop_watching()
+    get_executor().shutdown()
+
+
 app = FastAPI(
     title="Green Bite API 🥗",
     description=description,
     version="0.0.1",
+    lifespan=lifespan,
 )
 
 
-@app.get("/parse/ingredient/{string}", tags=["Parse Ingredient String 🪄"])
-async def parse_ingredient_string(string: str = Path(description="i.e: '1 kg of bacon' or '2 pounds smoked salmon'")) -> ParsedIngredientResponse:
+@app.exception_handler(ExecutorOverloaded)
+async def executor_overloaded(request: Request, exc: ExecutorOverloaded):
+    # Too many requests are being scored already, ask the client to back off.
+    return JSONResponse(status_code=503, content={"detail": "Server is busy, try again later"}, headers={"Retry-After": "1"})
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (not the raw path), so every ingredient string doesn't become its own time series.
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    http_request_duration.observe(time.perf_counter() - start, path=path, method=request.method)
+    http_responses.inc(path=path, method=request.method, status=str(response.status_code))
+    registry = get_registry()
+    if registry.loaded:
+        # Don't load the data just for the header (i.e for GET /ready while warming up).
+        response.headers["X-Dataset-Version"] = registry.current.version
+    return response
+
+
+def check_admin_token(x_admin_token: Optional[str]):
+    """
+    Admin endpoints need the GREEN_BITE_ADMIN_TOKEN in an X-Admin-Token header. Without a token configured they are
+    closed, unless GREEN_BITE_ADMIN_OPEN explicitly opens them (i.e for local development).
+    """
+    admin_token = os.environ.get("GREEN_BITE_ADMIN_TOKEN")
+    if not admin_token:
+        if os.environ.get("GREEN_BITE_ADMIN_OPEN", "false").lower() in ("1", "true", "yes"):
+            return
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set GREEN_BITE_ADMIN_TOKEN")
+    if x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+async def run_scoring(function, argument, response: Response, profile: bool = False, x_admin_token: Optional[str] = None):
+    """
+    Runs function(argument) on the executor. When profiling, runs it under the profiler (see "profiler.py"), keeps the
+    profile and returns its ID in the X-Profile-Id header.
+    """
+    if not profile:
+        return await get_executor().run(function, argument)
+
+    check_admin_token(x_admin_token)
+    result, request_profile = await get_executor().run(profile_call, f"{function.__name__}({argument!r})", function, argument)
+    get_profile_store().add(request_profile)
+    response.headers["X-Profile-Id"] = request_profile.id
+    return result
+
+
+@app.get("/parse/ingredient/{string}", tags=["Parse Ingredient String 🪄"], response_model_exclude_unset=True)
+async def parse_ingredient_string(
+    response: Response,
+    string: str = Path(description="i.e: '1 kg of bacon' or '2 pounds smoked salmon'"),
+    timings: bool = Query(False, description="Include the milliseconds spent in each stage of the pipeline"),
+    candidates: int = Query(0, ge=0, le=20, description="Include this many of the most similar SHARP food items"),
+    profile: bool = Query(False, description="Profile the request, the profile ID is returned in X-Profile-Id"),
+    x_profile: bool = Header(False),
+    x_admin_token: Optional[str] = Header(None)
+) -> ParsedIngredientResponse:
     """
         Parse a raw ingredient string and return details about the attempted sustainability score.
     """
-    parsed = parseOneIngredient(string)
-    return parsed
+    if not timings:
+        result = await run_scoring(score_ingredient, string, response, profile or x_profile, x_admin_token)
+        res = parseOneIngredient(string, result)
+    else:
+        result, stage_timings = await run_scoring(score_ingredient_with_timings, string, response, profile or x_profile, x_admin_token)
+        res = parseOneIngredient(string, result)
+        res["timings"] = {stage: round(seconds * 1000, 4) for stage, seconds in stage_timings.items()}
+
+    if candidates:
+        # A single sparse index lookup (well under a millisecond), not worth a trip to the executor.
+        res["candidates"] = [{"foodItem": food_item, "similarity": round(similarity, 4)}
+                             for food_item, similarity in get_match_candidates(result.description, candidates)]
+    return res
 
 
 @app.post("/score", tags=["Scoring 🌱"])
 async def score(
+    response: Response,
     ingredients: List[str] = Query(examples=[
         "1 pound of cheese",
-        "2 cups of milk"])
-) -> float:
+        "2 cups of milk"]),
+    breakdown: bool = Query(False, description="Return the score of every food item, with the ingredients grouped into it"),
+    profile: bool = Query(False, description="Profile the request, the profile ID is returned in X-Profile-Id"),
+    x_profile: bool = Header(False),
+    x_admin_token: Optional[str] = Header(None)
+) -> Union[float, ScoreBreakdownResponse]:
     """
     Calculate the combined sustainability score of 1 or more ingredients.
+
+    Ingredients matching the same food item in the same unit (i.e "1 cup milk" and "½ cup of milk") are added up and
+    scored once. With `breakdown=true`, the response lists these groups. Long recipes are spread over the pool.
+    """
+    if profile or x_profile:
+        result = await run_scoring(score_grouped, ingredients, response, True, x_admin_token)
+    else:
+        # Long recipes are parsed and matched in chunks, spread over the pool.
+        result = await score_grouped_in_chunks(ingredients)
+    if not breakdown:
+        return result.score
+
+    food_items = [{
+        "foodItem": group.food_item,
+        "measurement": group.measurement,
+        "quantity": group.quantity,
+        "sustainabilityScore": group.score,
+        "ingredients": group.ingredients
+    } for group in result.food_items]
+    return {"sustainabilityScore": result.score, "foodItems": food_items, "unmatched": result.unmatched,
+            "datasetVersion": result.dataset_version}
+
+
+@app.post("/score/batch", tags=["Scoring 🌱"])
+async def score_recipes(batch: BatchScoreRequest) -> BatchScoreResponse:
+    """
+    Score many recipes at once. Returns the score of every ingredient, and the combined score of every recipe.
+    """
+    ingredients, recipe_scores = await get_executor().run(score_batch, [recipe.ingredients for recipe in batch.recipes])
+    ingredients_by_recipe = ingredients.groupby('recipe')
+
+    recipes = []
+    for recipe_id, recipe in enumerate(batch.recipes):
+        recipe_ingredients = []
+        if recipe.ingredients:
+            for row in ingredients_by_recipe.get_group(recipe_id).itertuples():
+                recipe_ingredients.append({
+                    "inputIngredientString": row.ingredient,
+                    "ingredientMatched": row.food_item,
+                    "sustainabilityScore": row.score
+                })
+
+        recipes.append({
+            "id": recipe.id,
+            "sustainabilityScore": recipe_scores[recipe_id],
+            "ingredients": recipe_ingredients
+        })
+
+    return {"recipes": recipes, "datasetVersion": ingredients.attrs.get("dataset_version")}
+
+
+@app.post("/score/recipes", tags=["Scoring 🌱"])
+async def score_recipes_partially(
+    batch: BatchScoreRequest,
+    budget: float = Query(INGREDIENT_BUDGET * 1000, gt=0, le=10000, description="Milliseconds the whole request may take, counted from when it arrived")
+) -> PartialScoreResponse:
+    """
+    Score many recipes within a time budget. Ingredients that aren't scored once it's spent are reported as
+    "timedOut" instead of holding up the response, and their recipe is scored without them ("partial").
+    """
+    outcomes = await score_recipes_within_budget([recipe.ingredients for recipe in batch.recipes], budget / 1000)
+
+    recipes = []
+    for recipe, outcome in zip(batch.recipes, outcomes):
+        recipes.append({
+            "id": recipe.id,
+            "status": outcome.status,
+            "sustainabilityScore": outcome.score,
+            "ingredients": [{
+                "inputIngredientString": ingredient.raw_string,
+                "status": ingredient.status,
+                "ingredientMatched": ingredient.result.food_item if ingredient.result else None,
+                "sustainabilityScore": ingredient.score
+            } for ingredient in outcome.ingredients]
+        })
+
+    return {"recipes": recipes}
+
+
+@app.get("/cache/stats", tags=["Monitoring 📈"])
+async def cache_stats() -> dict:
+    """
+    Hit, miss and eviction counters of the parse and match caches.
+    """
+    return get_cache_stats()
+
+
+@app.get("/executor/stats", tags=["Monitoring 📈"])
+async def executor_stats() -> dict:
+    """
+    Configuration and number of requests currently being scored by the executor.
+    """
+    return get_executor().stats()
+
+
+@app.get("/ready", tags=["Monitoring 📈"])
+async def ready() -> JSONResponse:
+    """
+    Readiness probe: 200 once the data is loaded and the executor is started, 503 while warming up (or if it failed).
+    """
+    readiness = get_readiness()
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.info())
+
+
+@app.get("/dataset", tags=["Monitoring 📈"])
+async def dataset_info() -> dict:
+    """
+    Version, source files and load time of the dataset used for scoring, and the state of reloads.
+    """
+    return get_registry().info()
+
+
+@app.post("/admin/dataset/reload", tags=["Admin 🔧"], status_code=202)
+async def reload_dataset(
+    force: bool = Query(False, description="Reload even if the source files are unchanged"),
+    wait: bool = Query(False, description="Wait for the reload to finish, and return the new dataset"),
+    x_admin_token: Optional[str] = Header(None)
+) -> dict:
+    """
+    Rebuild the dataset from its CSVs and swap it in, without restarting. Requests in flight finish with the old one.
+    """
+    check_admin_token(x_admin_token)
+
+    registry = get_registry()
+    if not wait:
+        started = registry.reload_in_background(force=force)
+        return {"status": "reloading" if started else "alreadyReloading", "version": registry.current.version}
+
+    try:
+        # Building the indexes takes a few seconds, keep the event loop free meanwhile.
+        reloaded = await run_in_threadpool(registry.reload, force=force)
+    except Exception:
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving {registry.current.version}")
+    return {"status": "reloaded" if reloaded else "unchanged", "version": registry.current.version}
+
+
+@app.get("/admin/profiles", tags=["Admin 🔧"])
+async def list_profiles(x_admin_token: Optional[str] = Header(None)) -> list:
+    """
+    The profiles kept by this worker (taken with `profile=true` on /parse or /score), most recent first.
+    """
+    check_admin_token(x_admin_token)
+    return get_profile_store().list()
+
+
+@app.get("/admin/profiles/{profile_id}", tags=["Admin 🔧"])
+async def get_profile(
+    profile_id: str,
+    limit: int = Query(20, ge=1, le=500, description="Number of hotspots"),
+    x_admin_token: Optional[str] = Header(None)
+) -> dict:
+    """
+    The functions with the most time spent in them (self and total milliseconds, and number of calls) in a profile.
+    """
+    check_admin_token(x_admin_token)
+    request_profile = get_profile_store().get(profile_id)
+    if request_profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return request_profile.summary(limit)
+
+
+@app.get("/admin/profiles/{profile_id}/collapsed", tags=["Admin 🔧"], response_class=PlainTextResponse)
+async def get_profile_stacks(profile_id: str, x_admin_token: Optional[str] = Header(None)) -> PlainTextResponse:
+    """
+    The call stacks of a profile in the collapsed format (microseconds), i.e for `flamegraph.pl` or speedscope.
+    """
+    check_admin_token(x_admin_token)
+    request_profile = get_profile_store().get(profile_id)
+    if request_profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(request_profile.collapsed())
+
+
+@app.get("/metrics", tags=["Monitoring 📈"], response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Stage latency histograms, match misses, HTTP responses by status and cache counters, in the Prometheus text format.
     """
-    score = 0
-    for ingredient in ingredients:
-        score += calculate_score(ingredient)
-    return score
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
-def parseOneIngredient(string):
-    score = calculate_score(string)
-    food_match = get_food_match(string)
-    details = get_parsed_string(string)
+def parseOneIngredient(string, result=None):
+    # Parse, match and score the ingredient in a single pass (unless it was already scored by the executor).
+    if result is None:
+        result = score_ingredient(string)
 
-    if score is None:
-        raise HTTPException(status_code=404, detail="Item not found")
+    details = result.details()
+    if result.weight is not None:
+        details["weight"] = {"grams": result.weight.grams, "isDefault": result.weight.ingredient is None}
+        if result.weight.ingredient is not None:
+            details["weight"]["ingredient"] = result.weight.ingredient
+    if result.density is not None:
+        details["density"] = {"gramsPerMl": result.density.grams_per_ml, "isDefault": result.density.food_item is None}
+        if result.density.food_item is not None:
+            details["density"]["foodItem"] = result.density.food_item
 
     # Parses an ingredient, and returns details about DB match and score.
     res = {
         "inputIngredientString": string,
-        "ingredientMatched": food_match,
-        "sustainabilityScore": score,
-        "details": details
+        "ingredientMatched": result.food_item,
+        "sustainabilityScore": result.score,
+        "details": details,
+        "datasetVersion": result.dataset_version
     }
 
     return res
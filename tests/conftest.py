@@ -1,4 +1,3 @@
-import nltk
 import pytest
 
 '''
@@ -7,8 +6,14 @@ Fixtures are functions that run before the unit tests in order to set up the env
 '''
 
 
-@pytest.fixture(scope='session', autouse=True)
-def setup_nltk_data():
-    # Download the NLTK data needed for the tests, if not already present
-    nltk.download('punkt')
-    nltk.download('averaged_perceptron_tagger')
+@pytest.fixture(scope='session')
+def nltk_data():
+    # Only needed by tests of the TextBlob noun extractor: NLTK is imported, and its data downloaded, when requested.
+    # The tests are skipped when the data isn't installed and can't be downloaded (i.e without network access).
+    import nltk
+    for resource, path in [('punkt', 'tokenizers/punkt'), ('averaged_perceptron_tagger', 'taggers/averaged_perceptron_tagger')]:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if not nltk.download(resource, quiet=True):
+                pytest.skip(f'NLTK data "{resource}" is not available')
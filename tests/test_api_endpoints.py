@@ -14,9 +14,56 @@ def test_parse_ingredient():
     assert "sustainabilityScore" in data
 
 
+def test_parse_unmatched_ingredient():
+    for string in ["zzqxv", "1 cup qqqqq"]:
+        response = client.get(f"/parse/ingredient/{string}")
+        assert response.status_code == 200
+        assert response.json()["ingredientMatched"] is None
+        assert response.json()["sustainabilityScore"] == 0
+
+
+def test_parse_ingredient_without_data():
+    # Matches a SHARP row without GHGE or land use data.
+    response = client.get("/parse/ingredient/4 teaspoon baking powder")
+    assert response.status_code == 200
+    assert response.json()["ingredientMatched"] == "curry powder"
+    assert response.json()["sustainabilityScore"] == 0
+    assert response.json()["details"]["density"] == {"gramsPerMl": 1.0, "isDefault": True}
+
+
 def test_score_calculation():
     # Test scoring multiple ingredients
     response = client.post(
         "/score?ingredients=1%20cups%20of%20milk&ingredients=3%20tablespoons%20sugar&ingredients=2%20tablespoons%20cornstarch")
     assert response.status_code == 200
     assert isinstance(response.json(), float)
+
+
+def test_score_breakdown():
+    params = {"ingredients": ["1 cup milk", "½ cup of milk", "3 eggs", "1 cup of xyzzy"]}
+    total = client.post("/score", params=params).json()
+    breakdown = client.post("/score", params={**params, "breakdown": True}).json()
+
+    assert breakdown["sustainabilityScore"] == total
+    assert [food_item["foodItem"] for food_item in breakdown["foodItems"]] == ["milk", "eggs"]
+    assert breakdown["foodItems"][0]["ingredients"] == ["1 cup milk", "½ cup of milk"]
+    assert breakdown["unmatched"] == ["1 cup of xyzzy"]
+
+
+def test_score_long_recipe():
+    # More distinct strings than GREEN_BITE_CHUNK_SIZE, parsed and matched in chunks on the pool.
+    ingredients = [f"{amount} cups of milk" for amount in range(1, 12)] + ["3 eggs", "1 cup of xyzzy"]
+    breakdown = client.post("/score", params={"ingredients": ingredients, "breakdown": True}).json()
+
+    assert [food_item["foodItem"] for food_item in breakdown["foodItems"]] == ["milk", "eggs"]
+    assert breakdown["foodItems"][0]["quantity"] == sum(range(1, 12))
+    assert breakdown["unmatched"] == ["1 cup of xyzzy"]
+
+
+def test_cache_stats():
+    response = client.get("/cache/stats")
+    assert response.status_code == 200
+    data = response.json()
+
+    assert "parse" in data
+    assert "match" in data
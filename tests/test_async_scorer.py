@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from core.utils.async_scorer import SCORED, TIMED_OUT, UNMATCHED, score_recipes
+from core.utils.budget import BudgetExceeded, check_budget, time_budget
+from core.utils.calculator import calculate_score
+from core.utils.executor import ExecutorOverloaded, ScoringExecutor
+from main import app
+
+client = TestClient(app)
+
+RECIPES = [["1 cups of milk", "3 eggs", "1 cup of xyzzy"], ["3 eggs", "1 kg of bacon"]]
+
+
+@pytest.fixture
+def executor():
+    executor = ScoringExecutor(kind='thread', workers=2)
+    yield executor
+    executor.shutdown()
+
+
+def test_check_budget():
+    check_budget()  # No budget set
+    with time_budget(60):
+        check_budget()
+    with pytest.raises(BudgetExceeded):
+        with time_budget(0):
+            check_budget()
+
+
+def test_scores_within_budget(executor):
+    outcomes = asyncio.run(score_recipes(RECIPES, budget=10, executor=executor))
+
+    assert [outcome.status for outcome in outcomes] == ['complete', 'complete']
+    assert [ingredient.status for ingredient in outcomes[0].ingredients] == [SCORED, SCORED, UNMATCHED]
+    for recipe, outcome in zip(RECIPES, outcomes):
+        assert outcome.score == pytest.approx(sum(calculate_score(ingredient) for ingredient in recipe))
+    assert executor.pending == 0
+
+
+def test_spent_budget_gives_partial_results(executor):
+    outcomes = asyncio.run(score_recipes(RECIPES, budget=0, executor=executor))
+
+    assert [outcome.status for outcome in outcomes] == ['partial', 'partial']
+    assert all(ingredient.status == TIMED_OUT and ingredient.score is None
+               for outcome in outcomes for ingredient in outcome.ingredients)
+    assert outcomes[0].score == 0
+
+
+def test_saturated_executor_returns_partial_results_in_time():
+    executor = ScoringExecutor(kind='thread', workers=1)
+    release = threading.Event()
+
+    async def score_behind_a_slow_request():
+        # The only worker is busy, every ingredient stays queued.
+        slow_request = asyncio.ensure_future(executor.run(release.wait, 10))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        outcomes = await score_recipes(RECIPES, budget=0.2, executor=executor)
+        elapsed = time.perf_counter() - start
+        release.set()
+        await slow_request
+        return outcomes, elapsed
+
+    try:
+        outcomes, elapsed = asyncio.run(score_behind_a_slow_request())
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert elapsed < 1
+    assert [outcome.status for outcome in outcomes] == ['partial', 'partial']
+    assert all(ingredient.status == TIMED_OUT for outcome in outcomes for ingredient in outcome.ingredients)
+    assert executor.pending == 0
+
+
+def test_score_recipes_endpoint():
+    body = {"recipes": [{"id": "a", "ingredients": RECIPES[0] + ["(", "1 cup", "a.b*"]}, {"ingredients": RECIPES[1]}]}
+    data = client.post("/score/recipes", json=body).json()
+
+    assert [recipe["id"] for recipe in data["recipes"]] == ["a", None]
+    assert data["recipes"][0]["ingredients"][0] == {
+        "inputIngredientString": "1 cups of milk", "status": "scored", "ingredientMatched": "milk",
+        "sustainabilityScore": pytest.approx(calculate_score("1 cups of milk"))
+    }
+    assert [ingredient["status"] for ingredient in data["recipes"][0]["ingredients"][2:]] == ["unmatched"] * 4
+
+
+def test_score_recipes_endpoint_timed_out():
+    data = client.post("/score/recipes?budget=0.000001", json={"recipes": [{"ingredients": ["5 cups of brocolli rabe"]}]}).json()
+    assert data["recipes"][0]["status"] == "partial"
+    assert data["recipes"][0]["ingredients"][0]["status"] == "timedOut"
+    assert data["recipes"][0]["ingredients"][0]["sustainabilityScore"] is None
+
+    assert client.post("/score/recipes?budget=0", json={"recipes": []}).status_code == 422
+
+
+def test_running_items_stay_pending_after_the_timeout():
+    executor = ScoringExecutor(kind='thread', workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def time_out_while_running():
+        results = await executor.map_items(release.wait, [10], timeout=0.05)
+        # The item is still running on the only worker, so the executor doesn't admit more work yet.
+        with pytest.raises(ExecutorOverloaded):
+            await executor.run(calculate_score, '1 cup of milk')
+        return results
+
+    try:
+        assert asyncio.run(time_out_while_running()) == [None]
+        assert executor.pending == 1
+        release.set()
+        executor.shutdown()
+        assert executor.pending == 0
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from core.utils.batch_scorer import score_batch
+from core.utils.calculator import calculate_score
+from core.utils.measurement_conversions import UnknownUnitError, convert_measurement_to_kg, convert_measurements_to_kg
+from main import app
+
+client = TestClient(app)
+
+RECIPES = [
+    ["1 cups of milk", "3 tablespoons sugar", "2 tablespoons cornstarch"],
+    ["2 pounds smoked salmon", "3 eggs", "1 cups of milk"],
+    [],
+]
+
+
+def test_vectorized_conversion_matches_scalar():
+    measurements = ['pounds', 'ounce', 'cups', 'tbsp', 'tsp', 'kg', 'grams', 'ml', 'handful']
+    amounts = [1.5, 3, 2, 0.5, 4, 1, 250, 100, 1]
+    densities = [1, 1, 0.53, 1.42, 0.85, 1, 1, 1.03, 1]
+    kilograms = convert_measurements_to_kg(measurements, amounts, densities, errors='coerce')
+
+    for measurement, amount, density, kg in zip(measurements[:-1], amounts, densities, kilograms):
+        assert kg == convert_measurement_to_kg(measurement, amount, density)
+    assert kilograms[-1] != kilograms[-1]  # Unknown measurements are NaN
+
+    with pytest.raises(UnknownUnitError):
+        convert_measurements_to_kg(measurements, amounts)
+
+
+def test_batch_matches_calculate_score():
+    ingredients, recipe_scores = score_batch(RECIPES)
+
+    for row in ingredients.itertuples():
+        assert row.score == pytest.approx(calculate_score(row.ingredient))
+    for recipe, recipe_score in zip(RECIPES, recipe_scores):
+        assert recipe_score == pytest.approx(sum(calculate_score(ingredient) for ingredient in recipe))
+
+
+def test_batch_endpoint():
+    body = {"recipes": [{"id": str(i), "ingredients": recipe} for i, recipe in enumerate(RECIPES)]}
+    response = client.post("/score/batch", json=body)
+    assert response.status_code == 200
+    recipes = response.json()["recipes"]
+
+    assert [recipe["id"] for recipe in recipes] == ["0", "1", "2"]
+    assert [len(recipe["ingredients"]) for recipe in recipes] == [3, 3, 0]
+    assert recipes[0]["sustainabilityScore"] == pytest.approx(
+        sum(ingredient["sustainabilityScore"] for ingredient in recipes[0]["ingredients"]))
+
+
+@pytest.mark.parametrize('recipes, expected', [
+    ([], []),
+    ([{"ingredients": []}], [{"id": None, "sustainabilityScore": 0.0, "ingredients": []}]),
+])
+def test_batch_endpoint_without_ingredients(recipes, expected):
+    response = client.post("/score/batch", json={"recipes": recipes})
+    assert response.status_code == 200
+    assert response.json()["recipes"] == expected
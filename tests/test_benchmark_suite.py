@@ -0,0 +1,31 @@
+from benchmarks.suite import compare_results, generate_ingredient_strings, generate_recipes, run_suite
+
+
+def test_corpus_is_reproducible():
+    assert generate_ingredient_strings(50, seed=1) == generate_ingredient_strings(50, seed=1)
+    assert generate_ingredient_strings(50, seed=1) != generate_ingredient_strings(50, seed=2)
+
+    recipes = generate_recipes(10, seed=1, min_size=2, max_size=5)
+    assert len(recipes) == 10
+    assert all(2 <= len(recipe) <= 5 for recipe in recipes)
+
+
+def test_run_suite():
+    results = run_suite(size=20, requests=5, repeat=1, concurrency=2)
+
+    assert {'get_quantity', 'match_ingredient (cold)', 'calculate_score (warm)'} <= set(results['results']['micro'])
+    assert results['results']['endpoints']['/score (warm, sequential)']['requests'] > 0
+    assert results['results']['startup']['first /score (lazy)']['repeat'] == 1
+    assert results['metadata']['parameters']['seed'] == 0
+
+
+def test_compare_flags_regressions():
+    baseline = {'results': {'micro': {'a': {'unit': 'us', 'median': 10.0}, 'b': {'unit': 'us', 'median': 10.0}}}}
+    current = {'results': {'micro': {'a': {'unit': 'us', 'median': 10.5}, 'b': {'unit': 'us', 'median': 13.0},
+                                     'new': {'unit': 'us', 'median': 1.0}}}}
+
+    rows = {row['benchmark']: row for row in compare_results(baseline, current, threshold=0.1)}
+
+    assert not rows['micro: a']['regression']
+    assert rows['micro: b']['regression']
+    assert 'micro: new' not in rows  # Not in the baseline, nothing to compare against
@@ -0,0 +1,52 @@
+import pytest
+from core.utils import cache as cache_module
+from core.utils.cache import LRUCache, get_cache_stats, invalidate_caches, register_invalidation_hook
+
+
+@pytest.fixture(autouse=True)
+def cache_registries(monkeypatch):
+    # The caches and hooks created here are registered globally, work on copies so they're gone after each test.
+    monkeypatch.setattr(cache_module, '_registered_caches', dict(cache_module._registered_caches))
+    monkeypatch.setattr(cache_module, '_invalidation_hooks', list(cache_module._invalidation_hooks))
+
+
+def test_lru_eviction():
+    cache = LRUCache('test-eviction', maxsize=2)
+    cache.get_or_compute('a', str.upper)
+    cache.get_or_compute('b', str.upper)
+    cache.get_or_compute('a', str.upper)  # 'a' is now the most recently used entry
+    cache.get_or_compute('c', str.upper)  # Evicts 'b'
+
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 3
+
+
+def test_ttl_expiry():
+    cache = LRUCache('test-ttl', maxsize=2, ttl=1e-9)
+    calls = []
+    cache.get_or_compute('a', calls.append)
+    cache.get_or_compute('a', calls.append)
+
+    assert calls == ['a', 'a']
+    assert cache.stats()['expirations'] == 1
+
+
+def test_disabled_cache():
+    cache = LRUCache('test-disabled', maxsize=0)
+    assert cache.get_or_compute('a', str.upper) == 'A'
+    assert len(cache) == 0
+
+
+def test_invalidation():
+    cache = LRUCache('test-invalidation')
+    cache.get_or_compute('a', str.upper)
+    hook_calls = []
+    register_invalidation_hook(lambda: hook_calls.append(True))
+
+    invalidate_caches()
+
+    assert len(cache) == 0
+    assert hook_calls == [True]
+    assert 'test-invalidation' in get_cache_stats()
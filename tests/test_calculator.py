@@ -0,0 +1,44 @@
+import pytest
+from core.utils.calculator import calculate_score, get_food_match, match_row_ids, score_grouped, score_ingredient
+from core.utils.ingredient_parser import get_parsed_string
+from core.utils.measurement_conversions import canonical_unit
+
+INGREDIENTS = ["1 kg of bacon", "2 cups of milk", "3 eggs", "½ pound shredded mozzarella cheese"]
+
+
+@pytest.mark.parametrize('ingredient', INGREDIENTS)
+def test_score_ingredient_matches_wrappers(ingredient):
+    result = score_ingredient(ingredient)
+
+    assert result.score == calculate_score(ingredient)
+    assert result.food_item == get_food_match(ingredient)
+    assert result.details() == get_parsed_string(ingredient)
+
+
+def test_score_grouped_adds_up_quantities():
+    recipe = ["1 cup milk", "½ cup of milk", "2 cups milk", "3 eggs", "2 large eggs", "2 pounds smoked salmon", "1 cup of xyzzy"]
+    result = score_grouped(recipe)
+
+    assert result.unmatched == ["1 cup of xyzzy"]
+    assert result.score == pytest.approx(sum(calculate_score(ingredient) for ingredient in recipe))
+    assert [group.food_item for group in result.food_items] == ["milk", "eggs", "smoked salmon"]
+
+    milk = result.food_items[0]
+    assert (milk.food_item, milk.measurement, milk.quantity) == ("milk", "cup", 3.5)
+    assert milk.ingredients == ["1 cup milk", "½ cup of milk", "2 cups milk"]
+
+
+@pytest.mark.parametrize('description', ['', ' ', '(', '.*', 'b'])
+def test_descriptions_without_words_are_not_matched(description):
+    assert match_row_ids(description) == ()
+    assert match_row_ids(description, use_frequencies=False) == ()
+
+
+def test_breakdown_leaves_out_descriptions_without_words():
+    result = score_grouped(["(", "1 cup milk"])
+    assert result.unmatched == ["("]
+    assert [group.food_item for group in result.food_items] == ["milk"]
+
+
+def test_canonical_unit():
+    assert [canonical_unit(unit) for unit in ["cups", "cup", "g", "grams", "handful"]] == ["cup", "cup", "gram", "gram", "handful"]
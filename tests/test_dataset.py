@@ -0,0 +1,109 @@
+import shutil
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from core.utils import dataset as dataset_module
+from core.utils.calculator import score_ingredient
+from core.utils.dataset import DatasetFiles, DatasetRegistry
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def files(tmp_path):
+    defaults = DatasetFiles()
+    copies = {}
+    for field, filepath in zip(defaults._fields, defaults):
+        copies[field] = str(tmp_path / filepath.split('/')[-1])
+        if field != 'snapshot':
+            shutil.copy(filepath, copies[field])
+    return DatasetFiles(**copies)
+
+
+def set_density(files: DatasetFiles, food_item: str, grams_per_ml: float):
+    densities = pd.read_csv(files.density_table, index_col='food_item')
+    densities.loc[food_item, 'grams_per_ml'] = grams_per_ml
+    densities.to_csv(files.density_table)
+
+
+def test_reload_swaps_the_dataset(files):
+    registry = DatasetRegistry(files)
+    old = registry.current
+
+    assert not registry.reload()  # Nothing changed
+    assert registry.current is old
+
+    set_density(files, 'test food', 2.5)
+    assert registry.reload()
+
+    assert registry.current.version != old.version
+    assert registry.current.density_index.lookup('test food').grams_per_ml == 2.5
+    assert registry.reloads == 1
+    # Whoever still holds the old dataset can keep using it.
+    assert old.density_index.lookup('test food').food_item is None
+    assert old.fuzzy_index.top_k('milk', 1)
+
+
+def test_failed_reload_keeps_the_current_dataset(files):
+    registry = DatasetRegistry(files)
+    old = registry.current
+
+    pd.DataFrame({'unexpected': [1]}).to_csv(files.density_table, index=False)
+    with pytest.raises(KeyError):
+        registry.reload()
+
+    assert registry.current is old
+    assert registry.last_error is not None
+
+
+def test_scores_follow_the_current_dataset(files, monkeypatch):
+    monkeypatch.setattr(dataset_module, 'registry', DatasetRegistry(files))
+    before = score_ingredient('1 cup of milk')
+
+    set_density(files, 'milk', 2.0)
+    dataset_module.registry.reload()
+    after = score_ingredient('1 cup of milk')
+
+    assert after.dataset_version != before.dataset_version
+    assert after.score > before.score
+
+
+def test_dataset_endpoints(files, monkeypatch):
+    monkeypatch.setattr(dataset_module, 'registry', DatasetRegistry(files))
+    monkeypatch.setenv('GREEN_BITE_ADMIN_TOKEN', 'secret')
+    version = dataset_module.registry.current.version
+
+    response = client.get('/dataset')
+    assert response.json()['version'] == version
+    assert response.headers['X-Dataset-Version'] == version
+
+    response = client.post('/admin/dataset/reload', params={'wait': True}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 202
+    assert response.json() == {'status': 'unchanged', 'version': version}
+
+    set_density(files, 'milk', 2.0)
+    response = client.post('/admin/dataset/reload', params={'wait': True}, headers={'X-Admin-Token': 'secret'})
+    assert response.json()['status'] == 'reloaded'
+    assert response.headers['X-Dataset-Version'] == response.json()['version'] != version
+
+    parsed = client.get('/parse/ingredient/1 cup of milk').json()
+    assert parsed['datasetVersion'] == response.json()['version']
+
+
+def test_reload_requires_the_admin_token(monkeypatch):
+    monkeypatch.setenv('GREEN_BITE_ADMIN_TOKEN', 'secret')
+
+    assert client.post('/admin/dataset/reload').status_code == 403
+    assert client.post('/admin/dataset/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+
+def test_reload_is_closed_without_an_admin_token(monkeypatch):
+    monkeypatch.delenv('GREEN_BITE_ADMIN_TOKEN', raising=False)
+    monkeypatch.delenv('GREEN_BITE_ADMIN_OPEN', raising=False)
+    response = client.post('/admin/dataset/reload', headers={'X-Admin-Token': ''})
+    assert response.status_code == 403
+    assert response.json()['detail'] == 'Admin endpoints are disabled, set GREEN_BITE_ADMIN_TOKEN'
+
+    monkeypatch.setenv('GREEN_BITE_ADMIN_OPEN', 'true')
+    assert client.post('/admin/dataset/reload', params={'wait': True}).json()['status'] == 'unchanged'
@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+import pytest
+from core.utils import cache, calculator
+from core.utils.calculator import find_row_ids, match_row_ids, warm_disk_cache
+from core.utils.dataset import get_dataset
+from core.utils.disk_cache import DiskCache, get_disk_cache
+from core.utils.metrics import render_metrics
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.db')
+
+
+@pytest.fixture
+def disk_match_cache(monkeypatch, path):
+    disk_cache = DiskCache(path, 'match')
+    monkeypatch.setattr(calculator, 'disk_match_cache', disk_cache)
+    calculator.match_cache.clear()
+    yield disk_cache
+    calculator.match_cache.clear()
+
+
+def test_get_or_compute(path):
+    disk_cache = DiskCache(path, 'test')
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return (1, 2)
+
+    assert disk_cache.get_or_compute(('v1', 'milk'), compute) == (1, 2)
+    assert disk_cache.get_or_compute(('v1', 'milk'), compute) == [1, 2]  # Stored as JSON
+    assert calls == [('v1', 'milk')]
+    assert disk_cache.get(('v2', 'milk')) is None
+    assert disk_cache.stats()['hits'] == 1
+    assert disk_cache.stats()['size'] == 1
+
+
+def test_shared_across_connections(path):
+    writer, reader = DiskCache(path, 'test'), DiskCache(path, 'test')
+    threads = [threading.Thread(target=writer.set, args=(f'key {i}', i)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert reader.get('key 3') == 3
+    assert reader.missing(['key 1', 'key 9']) == ['key 9']
+    assert len(reader) == 8
+
+
+def test_evicts_least_recently_used(path):
+    disk_cache = DiskCache(path, 'test', maxsize=10)
+    disk_cache.set_many([(f'key {i}', i) for i in range(10)])
+    # Make 'key 0' the oldest entry, and 'key 1' the most recently used.
+    with disk_cache._connect() as connection:
+        connection.execute(f'UPDATE {disk_cache.table} SET last_used = 1')
+        connection.execute(f'UPDATE {disk_cache.table} SET last_used = 0 WHERE key = \'"key 0"\'')
+    disk_cache.set_many([('key 10', 10), ('key 1', 1)])
+
+    # 11 entries, down to 9.
+    assert len(disk_cache) == 9
+    assert disk_cache.evictions == 2
+    assert disk_cache.missing(['key 0', 'key 1', 'key 10']) == ['key 0']
+
+
+def test_missing(path):
+    disk_cache = DiskCache(path, 'test')
+    disk_cache.set(('milk',), [1])
+    assert disk_cache.missing([('milk',), ('eggs',)]) == [('eggs',)]
+
+    # A cache that can't be read reports every key as missing, instead of raising.
+    with sqlite3.connect(path) as connection:
+        connection.execute(f'DROP TABLE {disk_cache.table}')
+    assert disk_cache.missing([('milk',), ('eggs',)]) == [('milk',), ('eggs',)]
+    assert disk_cache.errors == 1
+
+
+def test_stats_without_a_readable_cache(monkeypatch, path):
+    monkeypatch.setattr(cache, '_persistent_caches', {})
+    disk_cache = get_disk_cache('test', path)
+    with sqlite3.connect(path) as connection:
+        connection.execute(f'DROP TABLE {disk_cache.table}')
+
+    assert disk_cache.stats()['size'] is None
+    assert disk_cache.errors == 1
+    assert 'green_bite_cache_size{cache="test-disk"}' not in render_metrics()
+    assert 'green_bite_cache_hits_total{cache="test-disk"} 0' in render_metrics()
+
+
+def test_disabled_without_path(monkeypatch, path):
+    monkeypatch.delenv('GREEN_BITE_DISK_CACHE', raising=False)
+    assert get_disk_cache('match') is None
+
+    monkeypatch.setattr(cache, '_persistent_caches', {})
+    get_disk_cache('match', path)
+    assert cache.get_cache_stats()['match-disk']['path'] == path
+
+
+def test_match_row_ids_use_disk_cache(disk_match_cache):
+    assert match_row_ids('milk') == find_row_ids(('milk', True))
+    assert len(disk_match_cache) == 1
+
+    # Another worker (or this one after a restart) starts with an empty memory cache.
+    calculator.match_cache.clear()
+    assert match_row_ids('milk') == find_row_ids(('milk', True))
+    assert disk_match_cache.hits == 1
+
+
+def test_warm_disk_cache(disk_match_cache):
+    assert warm_disk_cache(limit=50) == 50
+    assert warm_disk_cache(limit=50) == 0
+    assert warm_disk_cache(limit=60) == 10
+
+    dataset = get_dataset()
+    name = str(dataset.frequencies.sort_values('frequency', ascending=False)['ingredient_name'].iloc[0]).lower()
+    assert match_row_ids(name) == find_row_ids((name, True))
+    assert disk_match_cache.hits == 1
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from core.utils.calculator import calculate_score, normalize_ingredients, score_grouped
+import core.utils.executor as executor_module
+from core.utils.executor import ExecutorOverloaded, ScoringExecutor, score_grouped_in_chunks, warm_up
+
+INGREDIENTS = ["1 cups of milk", "3 tablespoons sugar", "2 tablespoons cornstarch", "3 eggs", "1 kg of bacon"]
+
+
+@pytest.mark.parametrize('kind', ['inline', 'thread'])
+def test_map_items_keeps_order(kind):
+    executor = ScoringExecutor(kind=kind, workers=2)
+    try:
+        scores = asyncio.run(executor.map_items(calculate_score, INGREDIENTS))
+    finally:
+        executor.shutdown()
+
+    assert scores == [calculate_score(ingredient) for ingredient in INGREDIENTS]
+    assert executor.pending == 0
+
+
+def test_rejects_requests_beyond_max_pending():
+    executor = ScoringExecutor(kind='thread', workers=1, max_pending=1)
+
+    async def score_twice():
+        first = asyncio.ensure_future(executor.run(calculate_score, INGREDIENTS[0]))
+        await asyncio.sleep(0)  # Let the first request be admitted
+        with pytest.raises(ExecutorOverloaded):
+            await executor.run(calculate_score, INGREDIENTS[1])
+        return await first
+
+    try:
+        assert asyncio.run(score_twice()) == calculate_score(INGREDIENTS[0])
+    finally:
+        executor.shutdown()
+
+
+def test_unknown_executor_kind():
+    with pytest.raises(ValueError):
+        ScoringExecutor(kind='gpu')
+
+
+def test_restart_replaces_the_pool():
+    executor = ScoringExecutor(kind='thread', workers=1)
+    pool = executor.pool
+    executor.restart()
+
+    assert executor.pool is not pool
+    assert asyncio.run(executor.run(calculate_score, '1 cup of milk')) == calculate_score('1 cup of milk')
+    executor.shutdown()
+
+
+def test_restart_warms_every_process(monkeypatch):
+    class RecordingPool:
+        def __init__(self, max_workers, initializer):
+            self.submitted = []
+
+        def submit(self, function, *args):
+            self.submitted.append(function)
+
+        def shutdown(self, wait=True):
+            pass
+
+    monkeypatch.setattr(executor_module, 'ProcessPoolExecutor', RecordingPool)
+    executor = ScoringExecutor(kind='process', workers=3)
+    executor.pool
+    executor.restart()
+
+    assert executor.pool.submitted == [warm_up] * 3
+
+
+def score_chunk(ingredient_strings: list) -> list:
+    return [calculate_score(ingredient_string) for ingredient_string in ingredient_strings]
+
+
+def test_map_chunks_keeps_order():
+    executor = ScoringExecutor(kind='thread', workers=2, chunk_size=2)
+    try:
+        scores = asyncio.run(executor.map_chunks(score_chunk, INGREDIENTS))
+    finally:
+        executor.shutdown()
+
+    assert scores == [calculate_score(ingredient) for ingredient in INGREDIENTS]
+    assert executor.pending == 0
+
+
+@pytest.mark.parametrize('kind', ['inline', 'thread'])
+def test_long_recipes_fan_out(kind, monkeypatch):
+    executor = ScoringExecutor(kind=kind, workers=2, chunk_size=2)
+    chunks = []
+    monkeypatch.setattr(executor_module, 'normalize_ingredients', lambda strings: chunks.append(strings) or normalize_ingredients(strings))
+    recipe = INGREDIENTS + ["½ cup of milk"]
+    try:
+        result = asyncio.run(score_grouped_in_chunks(recipe, executor))
+    finally:
+        executor.shutdown()
+
+    assert chunks == [recipe[0:2], recipe[2:4], recipe[4:6]]
+    assert result == score_grouped(recipe)
+    assert executor.pending == 0
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from core.utils.calculator import foods, match_ingredient, match_row_id, sharp
+from core.utils.food_store import FoodStore
+
+
+def test_columns_follow_the_sharp_table():
+    assert len(foods) == len(sharp)
+    assert foods.names == list(sharp['Food item'])
+    np.testing.assert_array_equal(foods.ghge, sharp['GHGE'].to_numpy())
+    assert foods.ghge.flags['C_CONTIGUOUS']
+
+
+def test_names_are_interned():
+    store = FoodStore([''.join(['mi', 'lk']), ''.join(['m', 'ilk'])], [1.0, 1.0], [2.0, 2.0])
+    assert store.names[0] is store.names[1]
+
+
+@pytest.mark.parametrize('description', ['milk', 'cheese', 'tomatos', 'mil.', 'xyzzy'])
+def test_row_ids_match_the_dataframe(description):
+    search = match_ingredient(description)
+    row_id = match_row_id(description)
+
+    if row_id is None:
+        assert search.at[0, 'Food item'] == 0
+    else:
+        assert search.at[0, 'Food item'] == foods.names[row_id]
+        assert search.at[0, 'index'] == row_id
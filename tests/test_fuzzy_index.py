@@ -0,0 +1,67 @@
+import pytest
+from core.utils.calculator import fuzzy_index, get_match_candidates, match_ingredient, score_ingredient
+from core.utils.fuzzy_index import FuzzyIndex
+from main import app
+from fastapi.testclient import TestClient
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize('description, expected', [
+    ('tomatos', 'tomatoes'),
+    ('brocoli', 'broccoli'),
+    ('garlic cloves', 'garlic clove'),
+])
+def test_misspellings_match(description, expected):
+    assert match_ingredient(description).at[0, 'Food item'] == expected
+
+
+def test_exact_matches_are_unchanged():
+    assert score_ingredient('2 onions').food_item == 'onions'
+    assert score_ingredient('1 kg of bacon').score == 26.05213129
+
+
+def test_dissimilar_descriptions_still_miss():
+    assert match_ingredient('xyzzy').at[0, 'Food item'] == 0
+
+
+def test_invalid_regex_does_not_match_whole_table():
+    # Descriptions are matched literally, "(" is just a parenthesis.
+    search = match_ingredient('milk (')
+    assert len(search) == 1
+    assert search.at[0, 'Food item'] == 'coconut milk (cocos nucifera) liquid'
+
+
+def test_top_k_order_and_ties():
+    index = FuzzyIndex(['apple', 'apple pie', 'pineapple', 'pear'], ranks=[0, 0, 0, 0])
+    candidates = index.top_k('apple', k=3)
+
+    assert [row_id for row_id, similarity in candidates][0] == 0
+    assert candidates[0][1] == pytest.approx(1.0)
+    assert all(a[1] >= b[1] for a, b in zip(candidates, candidates[1:]))
+
+    # Identical names are equally similar, the one with the highest frequency rank comes first.
+    index = FuzzyIndex(['milk', 'milk'], ranks=[1, 5])
+    assert index.top_k('milk', k=1)[0][0] == 1
+
+
+def test_top_k_leaves_out_names_without_shared_ngrams():
+    index = FuzzyIndex(['apple', 'apple pie', 'plum', 'fig'], ranks=[0, 0, 0, 0])
+    assert index.top_k('qqqq', k=2) == []
+    assert [row_id for row_id, similarity in index.top_k('apple', k=3)] == [0, 1]
+    assert index.top_k('apple', k=3, min_similarity=0.9) == [(0, pytest.approx(1.0))]
+
+
+def test_candidates():
+    candidates = get_match_candidates('chiken', k=3)
+    assert len(candidates) == 3
+    assert candidates[0][0] == 'chicken'
+    assert fuzzy_index.top_k('qqqq') == []
+
+
+def test_parse_candidates_are_opt_in():
+    assert "candidates" not in client.get("/parse/ingredient/1%20kg%20of%20bacon").json()
+
+    data = client.get("/parse/ingredient/1%20kg%20of%20bacon?candidates=3").json()
+    assert len(data["candidates"]) == 3
+    assert data["candidates"][0] == {"foodItem": "bacon", "similarity": 1.0}
@@ -0,0 +1,63 @@
+import pytest
+from core.utils.calculator import score_ingredient
+from core.utils.ingredient_parser import get_ingredient_description, get_parsed_string, get_quantity, get_unit_of_measurement, list_of_units
+from core.utils.measurement_conversions import unit_table
+
+
+@pytest.mark.parametrize('string, quantity', [
+    ('2 cups milk', 2),
+    ('1.5 kg beef', 1.5),
+    ('1/2 cup sugar', 0.5),
+    ('1 1/2 cups flour', 1.5),
+    ('1½ cup parmesan cheese', 1.5),
+    ('1 ½ cup parmesan cheese', 1.5),
+    ('¼ cup fresh lemon juice', 0.25),
+    ('2-3 tomatoes', 2.5),
+    ('2 to 3 tomatoes', 2.5),
+    ('2 tomatoes', 2),
+    ('salt to taste', 0),
+    ('1 (14 ounce) can tomatoes', 1),
+    ('(14 ounce) can tomatoes', 14),
+])
+def test_get_quantity(string, quantity):
+    assert get_quantity(string) == quantity
+
+
+@pytest.mark.parametrize('string, unit', [
+    ('2 cups milk', 'cups'),
+    ('1 Cup milk', 'cup'),
+    ('500ml milk', 'ml'),
+    ('2 cups noodles', 'cups'),
+    ('8 noodles', 'whole'),
+    ('3 eggs', 'whole'),
+    ('1 (14 ounce) can tomatoes', 'ounce'),
+    # Every unit of unit_table.csv is recognized.
+    ('1 liter milk', 'liter'),
+    ('2 liters milk', 'liters'),
+    ('1 l milk', 'l'),
+    ('3 oz cheese', 'oz'),
+    ('1 lb beef', 'lb'),
+    ('2 lbs beef', 'lbs'),
+    ('2 kgs flour', 'kgs'),
+    ('100g sugar', 'g'),
+])
+def test_get_unit_of_measurement(string, unit):
+    assert get_unit_of_measurement(string) == unit
+
+
+def test_units_come_from_unit_table():
+    assert set(list_of_units) == set(unit_table.index)
+    # Weighed as a liter of milk, not as a single 50 gram item.
+    assert score_ingredient('1 liter milk').score == pytest.approx(score_ingredient('1000 ml milk').score)
+
+
+def test_units_and_blacklisted_words_match_whole_words():
+    assert get_ingredient_description('1 cup pecans', extract_noun=False) == 'pecans'
+    assert get_ingredient_description('1 can of beans', extract_noun=False) == 'of beans'
+    assert get_ingredient_description('2 cups noodles', extract_noun=False) == 'noodles'
+    assert get_ingredient_description('1 cup all-purpose flour (sifted)', extract_noun=False) == 'all purpose flour'
+
+
+def test_get_parsed_string():
+    assert get_parsed_string('½ pound shredded mozzarella cheese') == {
+        'quantity': 0.5, 'measurement': 'pound', 'description': 'mozzarella'}
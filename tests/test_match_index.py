@@ -0,0 +1,82 @@
+import pytest
+from core.utils import calculator
+from core.utils.calculator import frequencies, match_index, match_row_ids, sharp
+from core.utils.dataset import get_dataset
+
+'''
+Parity tests between match_row_ids() (the precomputed match index, behind the caches) and the original full table
+scan, on the bundled CSVs. Exact matching only, match_row_ids() falls back to approximate matching for misses (see
+test_fuzzy_index.py), which is disabled here.
+'''
+
+
+def match_by_scan(description: str, use_frequencies: bool = True) -> list:
+    '''
+    The original matcher, kept as the reference: a str.contains() on every SHARP food item name, then (with
+    use_frequencies) the match with the highest frequency in ingredient_frequency.csv. Returns the matched names.
+    '''
+    # Like find_row_ids(), descriptions with fewer than two letters or digits don't match anything.
+    if sum(character.isalnum() for character in description) < 2:
+        return []
+    dataset = get_dataset()
+    names = dataset.sharp['Food item']
+    matches = list(names[names.str.contains(description.lower(), regex=False)])
+    if not use_frequencies or len(matches) <= 1:
+        return matches
+
+    most_frequent, highest_frequency = None, None
+    for food_item in matches:
+        found = dataset.frequencies[dataset.frequencies['ingredient_name'].str.contains(food_item, regex=False)]
+        frequency = int(found['frequency'].iloc[0]) if len(found) else 0
+        if most_frequent is None or highest_frequency < frequency:
+            most_frequent, highest_frequency = food_item, frequency
+    return [most_frequent]
+
+
+@pytest.fixture(autouse=True)
+def exact_matching(monkeypatch):
+    monkeypatch.setattr(calculator, 'fuzzy_matching', False)
+    monkeypatch.setattr(calculator, 'disk_match_cache', None)
+    calculator.match_cache.clear()
+    yield
+    calculator.match_cache.clear()
+
+
+def build_corpus() -> list:
+    # The most used ingredient names, every word in them, and every word in the SHARP food item names.
+    top_ingredients = list(frequencies['ingredient_name'].head(150))
+    words = {word.strip(',()') for name in top_ingredients + list(sharp['Food item']) for word in name.split()}
+    return top_ingredients + sorted(words) + ['', 'x', 'ol', 'zzz', 'cheese', 'rice', 'salmon']
+
+
+CORPUS = build_corpus()
+
+
+def assert_same_match(description: str, use_frequencies: bool):
+    expected = match_by_scan(description, use_frequencies)
+    actual = [calculator.foods.names[row_id] for row_id in match_row_ids(description, use_frequencies)]
+    assert actual == expected, repr(description)
+    # Again, from the cache.
+    assert [calculator.foods.names[row_id] for row_id in match_row_ids(description, use_frequencies)] == expected
+
+
+@pytest.mark.parametrize('description', CORPUS)
+def test_index_matches_scan(description):
+    assert_same_match(description, use_frequencies=True)
+
+
+@pytest.mark.parametrize('description', ['milk', 'an', 'zzz'])
+def test_index_matches_scan_without_frequencies(description):
+    assert_same_match(description, use_frequencies=False)
+
+
+@pytest.mark.parametrize('description', ['milk (', 'mil.', '(cocos', '.*', 'a+'])
+def test_regex_characters_are_matched_literally(description):
+    assert_same_match(description, use_frequencies=True)
+    assert len(match_row_ids(description, use_frequencies=False)) < len(sharp)
+
+
+def test_candidates_are_verified_substrings():
+    for row_id in match_index.candidates('cheese'):
+        assert 'cheese' in match_index.names[row_id]
+    assert match_index.candidates('qqqqq') == []
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+from core.utils.calculator import lookup_density, match_ingredient, score_ingredient
+from core.utils.measurement_conversions import DensityIndex, UnknownUnitError, convert_measurement_to_kg, get_unit
+from core.utils.ingredient_parser import list_of_units
+from main import app
+
+client = TestClient(app)
+
+
+def test_every_parsed_unit_converts():
+    for unit in list_of_units:
+        assert get_unit(unit).dimension in ('mass', 'volume')
+
+
+def test_mass_ignores_density():
+    assert convert_measurement_to_kg('grams', 250) == 0.25
+    assert convert_measurement_to_kg('pound', 1, density=0.5) == pytest.approx(0.45359237)
+
+
+def test_volume_uses_density():
+    assert convert_measurement_to_kg('dl', 2) == pytest.approx(0.2)
+    assert convert_measurement_to_kg('cup', 1, density=0.53) == pytest.approx(0.2365882365 * 0.53)
+
+
+def test_unknown_unit_raises():
+    with pytest.raises(UnknownUnitError) as error:
+        convert_measurement_to_kg('handful', 1)
+    assert error.value.measurements == ['handful']
+
+
+@pytest.mark.parametrize('food_item, entry', [
+    ('wheat flour', 'wheat flour'),
+    ('olive oil, virgin or extra-virgin', 'olive oil'),
+    ('sunflower seed oil', 'oil'),
+    ('extra hard cheese (parmesan, grana type)', 'extra hard cheese'),
+    ('fruit juices (100% from named source)', 'juice'),
+])
+def test_density_lookup(food_item, entry):
+    assert lookup_density(food_item).food_item == entry
+
+
+def test_default_density():
+    index = DensityIndex(['milk'], [1.03], default_grams_per_ml=1.1)
+    assert index.lookup('granite').food_item is None
+    assert index.lookup('granite').grams_per_ml == 1.1
+    assert index.lookup(0).grams_per_ml == 1.1  # The placeholder of unmatched ingredients
+
+
+def test_volume_scores_use_density():
+    honey = score_ingredient('1 cup of honey')
+    search = match_ingredient('honey')
+
+    assert honey.density.grams_per_ml == 1.42
+    assert honey.score == pytest.approx(0.2365882365 * 1.42 * (search.at[0, 'GHGE'] + search.at[0, 'Land Use']))
+    assert score_ingredient('1 kg of bacon').density is None
+
+
+def test_parse_reports_the_density():
+    details = client.get("/parse/ingredient/2%20tablespoons%20honey").json()["details"]
+    assert details["density"] == {"foodItem": "honey", "gramsPerMl": 1.42, "isDefault": False}
@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+from core.utils.metrics import Counter, Histogram, collect_timings, render_metrics, stage_timer
+from main import app
+
+client = TestClient(app)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_histogram_seconds', 'Test histogram.', ('stage',), buckets=(0.1, 1))
+    histogram.observe(0.05, stage='a')
+    histogram.observe(0.5, stage='a')
+    histogram.observe(5, stage='a')
+
+    lines = histogram.render()
+    assert 'test_histogram_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_histogram_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 'test_histogram_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_histogram_seconds_count{stage="a"} 3' in lines
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter('test_counter_total', 'Test counter.', ('path',))
+    counter.inc(path='/a"b')
+    counter.inc(2, path='/a"b')
+
+    assert 'test_counter_total{path="/a\\"b"} 3' in counter.render()
+
+
+def test_collect_timings():
+    with collect_timings() as timings:
+        with stage_timer('match'):
+            pass
+        with stage_timer('match'):
+            pass
+    with stage_timer('score'):
+        pass
+
+    assert list(timings) == ['match']
+    assert timings['match'] >= 0
+
+
+def test_parse_timings_are_opt_in():
+    response = client.get("/parse/ingredient/2%20cups%20of%20milk")
+    assert "timings" not in response.json()
+
+    response = client.get("/parse/ingredient/2%20cups%20of%20milk?timings=true")
+    assert response.status_code == 200
+    assert {"parse", "match", "score"} <= set(response.json()["timings"])
+
+
+def test_metrics_endpoint():
+    client.get("/parse/ingredient/1%20kg%20of%20bacon")
+    client.post("/score?ingredients=1%20cup%20of%20xyzzy")
+    client.get("/unknown")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    metrics = render_metrics()
+    assert 'green_bite_stage_duration_seconds_count{stage="match"}' in metrics
+    assert 'green_bite_http_responses_total{path="unmatched",method="GET",status="404"}' in metrics
+    assert 'green_bite_match_misses_total ' in metrics
+    assert 'green_bite_cache_hits_total{cache="match"}' in metrics
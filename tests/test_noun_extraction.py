@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+from core.utils.dataset import get_dataset
+from core.utils.noun_extraction import LexiconNounExtractor, TextBlobNounExtractor, compare_noun_extractors, generate_corpus, get_noun_extractor, rebuild_noun_extractor, set_noun_extractor
+
+lexicon = LexiconNounExtractor.from_data()
+
+
+@pytest.mark.parametrize('string, noun', [
+    (' of bacon', 'bacon'),
+    (' smoked salmon', 'salmon'),
+    (' fresh lemon juice', 'lemon'),
+    ('  mozzarella cheese', 'mozzarella'),
+    (' of shallots ', 'shallots'),
+    (' tomatoes', 'tomatoes'),
+    (' of gochujang', 'gochujang'),
+    (' of', ' of'),
+])
+def test_lexicon_extractor(string, noun):
+    assert lexicon(string) == noun
+
+
+def test_backend_selection():
+    with pytest.raises(ValueError):
+        set_noun_extractor('spacy')
+
+    set_noun_extractor('lexicon')
+    assert isinstance(get_noun_extractor(), LexiconNounExtractor)
+
+
+def test_generate_corpus():
+    corpus = generate_corpus(size=10)
+    assert len(corpus) == 10
+    assert all(isinstance(string, str) for string in corpus)
+
+
+def test_lexicon_is_built_from_the_dataset():
+    dataset = get_dataset()._replace(sharp=pd.DataFrame({'Food item': ['Quinoa, cooked']}),
+                                     frequencies=pd.DataFrame({'ingredient_name': ['smoked tempeh']}))
+    assert LexiconNounExtractor.from_dataset(dataset).nouns == {'quinoa', 'tempeh'}
+
+    try:
+        set_noun_extractor('lexicon')
+        rebuild_noun_extractor(dataset)
+        assert get_noun_extractor().nouns == {'quinoa', 'tempeh'}
+    finally:
+        rebuild_noun_extractor(get_dataset())
+    assert get_noun_extractor().nouns == lexicon.nouns
+
+
+def test_textblob_parity(nltk_data):
+    from core.utils.ingredient_parser import get_ingredient_description
+
+    strings = [get_ingredient_description(string, extract_noun=False) for string in generate_corpus(size=200)]
+    report = compare_noun_extractors(strings, TextBlobNounExtractor(), lexicon)
+    assert report['agreement'] >= 0.8
@@ -0,0 +1,106 @@
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.profile_corpus import profile_corpus, write_reports
+from core.utils.profiler import Profile, ProfileStore, StackProfiler, get_profile_store, merge_profiles, profile_call
+from main import app
+
+client = TestClient(app)
+
+
+def inner():
+    return sum(range(1000))
+
+
+def outer():
+    return inner() + inner()
+
+
+def test_stack_profiler():
+    with StackProfiler() as profiler:
+        outer()
+
+    labels = {stack[-1].split(' ')[0]: stack for stack in profiler.stacks}
+    assert [label.split(' ')[0] for label in labels['inner']] == ['outer', 'inner']
+    assert profiler.calls[labels['inner'][-1]] == 2
+    # The profiler's own calls are left out.
+    assert not any('core/utils/profiler.py' in label for stack in profiler.stacks for label in stack)
+
+
+def test_hotspots_and_collapsed_stacks():
+    profile = Profile('test', 0.004, {('a',): 0.001, ('a', 'b'): 0.002, ('a', 'b', 'a'): 0.001}, {'a': 2, 'b': 1})
+
+    hotspots = {row['function']: row for row in profile.hotspots()}
+    assert hotspots['b'] == {'function': 'b', 'calls': 1, 'selfMs': 2.0, 'totalMs': 3.0}
+    # Recursion is only counted once in the total.
+    assert hotspots['a']['selfMs'] == 2.0 and hotspots['a']['totalMs'] == 4.0
+    assert profile.collapsed() == 'a 1000\na;b 2000\na;b;a 1000\n'
+
+    merged = merge_profiles([profile, profile], 'merged')
+    assert merged.stacks[('a', 'b')] == 0.004
+    assert merged.calls == {'a': 4, 'b': 2}
+
+
+def test_profile_store(tmp_path):
+    store = ProfileStore(keep=2, directory=str(tmp_path))
+    profiles = [profile_call(f'outer {i}', outer)[1] for i in range(3)]
+    for profile in profiles:
+        store.add(profile)
+
+    assert store.get(profiles[0].id) is None
+    assert [row['id'] for row in store.list()] == [profiles[2].id, profiles[1].id]
+    assert (tmp_path / f'{profiles[0].id}.collapsed').read_text().startswith('outer')
+    assert (tmp_path / f'{profiles[0].id}.json').exists()
+
+
+def test_profile_requests(monkeypatch):
+    monkeypatch.setenv("GREEN_BITE_ADMIN_OPEN", "true")
+    response = client.get("/parse/ingredient/1%20cup%20milk?profile=true")
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    summary = client.get(f"/admin/profiles/{profile_id}?limit=5").json()
+    assert summary["name"] == "score_ingredient('1 cup milk')"
+    assert len(summary["hotspots"]) == 5
+    assert "score_ingredient (core/utils/calculator.py" in client.get(f"/admin/profiles/{profile_id}/collapsed").text
+
+    response = client.post("/score", params={"ingredients": ["1 cup milk"]}, headers={"X-Profile": "true"})
+    assert response.json() == pytest.approx(client.post("/score", params={"ingredients": ["1 cup milk"]}).json())
+    assert client.get("/admin/profiles").json()[0]["id"] == response.headers["X-Profile-Id"]
+
+    assert "X-Profile-Id" not in client.get("/parse/ingredient/1%20cup%20milk").headers
+    assert client.get("/admin/profiles/unknown").status_code == 404
+    assert client.get("/admin/profiles/unknown/collapsed").status_code == 404
+
+
+def test_profiling_is_closed_without_an_admin_token(monkeypatch):
+    monkeypatch.delenv("GREEN_BITE_ADMIN_TOKEN", raising=False)
+    monkeypatch.delenv("GREEN_BITE_ADMIN_OPEN", raising=False)
+    profiles = get_profile_store().list()
+
+    response = client.post("/score", params={"ingredients": ["1 cup milk"]}, headers={"X-Profile": "true"})
+    assert response.status_code == 403
+    assert client.get("/parse/ingredient/1%20cup%20milk?profile=true").status_code == 403
+    assert client.get("/admin/profiles").status_code == 403
+    assert get_profile_store().list() == profiles
+
+    # Requests without the flag aren't affected.
+    assert client.get("/parse/ingredient/1%20cup%20milk").status_code == 200
+
+
+def test_profiling_needs_admin_token(monkeypatch):
+    monkeypatch.setenv("GREEN_BITE_ADMIN_TOKEN", "secret")
+    assert client.get("/parse/ingredient/1%20cup%20milk?profile=true").status_code == 403
+    assert client.get("/admin/profiles").status_code == 403
+
+    response = client.get("/parse/ingredient/1%20cup%20milk?profile=true", headers={"X-Admin-Token": "secret"})
+    assert "X-Profile-Id" in response.headers
+
+
+def test_profile_corpus(tmp_path):
+    profile, profiles = profile_corpus(['1 cup milk', '2 eggs'], cold=True)
+    write_reports(profile, profiles, str(tmp_path), limit=5)
+
+    assert profile.calls[next(label for label in profile.calls if label.startswith('score_ingredient '))] == 2
+    assert len((tmp_path / 'hotspots.txt').read_text().splitlines()) == 6
+    assert (tmp_path / 'stacks.collapsed').read_text().startswith('score_ingredient')
+    assert (tmp_path / 'slowest.txt').read_text().count('\n') == 2
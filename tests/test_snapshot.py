@@ -0,0 +1,46 @@
+import shutil
+import pandas as pd
+from core.utils.snapshot import build_snapshot, load_snapshot, load_tables, read_csv_tables, sharp_csv
+
+
+def test_snapshot_matches_csvs(tmp_path):
+    filepath = str(tmp_path / 'snapshot.bin')
+    expected = build_snapshot(filepath)
+    actual = load_snapshot(filepath)
+
+    assert actual.source == 'snapshot'
+    assert actual.frequency_ranks == expected.frequency_ranks
+    for name in ['sharp', 'frequencies', 'food_weights']:
+        pd.testing.assert_frame_equal(getattr(actual, name).reset_index(drop=True),
+                                      getattr(expected, name).reset_index(drop=True), check_dtype=False)
+
+
+def test_missing_or_corrupt_snapshot_falls_back_to_csvs(tmp_path):
+    filepath = tmp_path / 'snapshot.bin'
+    assert load_tables(str(filepath)).source == 'csv'
+
+    filepath.write_bytes(b'not a snapshot')
+    assert load_snapshot(str(filepath)) is None
+    assert load_tables(str(filepath)).source == 'csv'
+
+
+def test_stale_snapshot_is_ignored(tmp_path):
+    filepath = str(tmp_path / 'snapshot.bin')
+    sharp_copy = str(tmp_path / 'SHARP.csv')
+    shutil.copy(sharp_csv, sharp_copy)
+    build_snapshot(filepath, sharp_filepath=sharp_copy)
+    assert load_snapshot(filepath, sharp_filepath=sharp_copy) is not None
+
+    with open(sharp_copy, 'a') as file:
+        file.write('A0000,Test item,Test,1,1\n')
+
+    assert load_snapshot(filepath, sharp_filepath=sharp_copy) is None
+    tables = load_tables(filepath, sharp_filepath=sharp_copy)
+    assert tables.source == 'csv'
+    assert tables.sharp['Food item'].iloc[-1] == 'test item'
+
+
+def test_read_csv_tables():
+    tables = read_csv_tables()
+    assert len(tables.sharp) == len(tables.frequency_ranks)
+    assert tables.frequencies['frequency'].is_monotonic_decreasing
@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from core.utils import startup
+from core.utils.dataset import DatasetRegistry
+from core.utils.startup import Readiness
+from main import app
+
+
+def test_warm_up_times_every_step():
+    calls = []
+    readiness = Readiness()
+    readiness.warm_up([('a', lambda: calls.append('a')), ('b', lambda: calls.append('b'))])
+
+    assert calls == ['a', 'b']
+    assert readiness.ready
+    assert list(readiness.info()['steps']) == ['a', 'b']
+
+    readiness.warm_up([('c', lambda: calls.append('c'))])  # Already warm
+    assert calls == ['a', 'b']
+
+
+def test_failed_warm_up_is_reported():
+    def fail():
+        raise OSError('missing file')
+
+    readiness = Readiness()
+    with pytest.raises(OSError):
+        readiness.warm_up([('dataset', fail)])
+
+    assert readiness.state == 'failed'
+    assert 'missing file' in readiness.info()['error']
+
+
+def test_unknown_warm_up_mode():
+    with pytest.raises(ValueError):
+        Readiness().start('eager')
+
+
+def test_registry_loads_on_first_use():
+    registry = DatasetRegistry()
+    assert not registry.loaded
+
+    version = registry.current.version
+    assert registry.loaded
+    assert registry.load().version == version
+
+
+def test_ready_endpoint(monkeypatch):
+    monkeypatch.setattr(startup, 'readiness', Readiness())
+    client = TestClient(app)
+    assert client.get('/ready').status_code == 503
+
+    monkeypatch.setenv('GREEN_BITE_WARM_UP', 'blocking')
+    with TestClient(app) as client:  # Runs the lifespan, and so the warm-up
+        response = client.get('/ready')
+
+    assert response.status_code == 200
+    assert response.json()['status'] == 'ready'
+    assert {'dataset', 'noun_extractor', 'scoring', 'executor'} <= set(response.json()['steps'])
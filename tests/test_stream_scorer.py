@@ -0,0 +1,76 @@
+import json
+import pytest
+import core.utils.stream_scorer as stream_scorer
+from core.utils.calculator import calculate_score
+from core.utils.stream_scorer import score_stream
+
+RECIPES = [
+    {"id": "pudding", "ingredients": ["1 cups of milk", "3 tablespoons sugar", "2 tablespoons cornstarch"]},
+    {"id": "omelette", "ingredients": ["3 eggs", "1 cups of milk"]},
+    {"id": "salmon", "ingredients": ["2 pounds smoked salmon"]},
+]
+
+
+def write_jsonl(path):
+    path.write_text(''.join(json.dumps(recipe) + '\n' for recipe in RECIPES))
+
+
+def read_output(path) -> list:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_score_jsonl(tmp_path):
+    write_jsonl(tmp_path / 'recipes.jsonl')
+    stats = score_stream(str(tmp_path / 'recipes.jsonl'), str(tmp_path / 'scores.jsonl'), chunk_size=2, workers=1)
+    output = read_output(tmp_path / 'scores.jsonl')
+
+    assert stats['lines'] == 6
+    assert [line['recipe'] for line in output] == ['pudding'] * 3 + ['omelette'] * 2 + ['salmon']
+    for line in output:
+        assert line['sustainabilityScore'] == pytest.approx(calculate_score(line['inputIngredientString']))
+
+
+def test_score_csv(tmp_path):
+    rows = [(recipe['id'], ingredient) for recipe in RECIPES for ingredient in recipe['ingredients']]
+    (tmp_path / 'recipes.csv').write_text('recipe_id,ingredient\n' + ''.join(f'{id},"{ingredient}"\n' for id, ingredient in rows))
+    score_stream(str(tmp_path / 'recipes.csv'), str(tmp_path / 'scores.jsonl'), chunk_size=4, workers=1)
+
+    assert [(line['recipe'], line['inputIngredientString']) for line in read_output(tmp_path / 'scores.jsonl')] == rows
+
+
+def test_resume_after_crash(tmp_path, monkeypatch):
+    write_jsonl(tmp_path / 'recipes.jsonl')
+    input_path, output_path = str(tmp_path / 'recipes.jsonl'), str(tmp_path / 'scores.jsonl')
+    score_lines = stream_scorer.score_lines
+    calls = []
+
+    def crash_on_third_chunk(lines):
+        calls.append(lines)
+        if len(calls) == 3:
+            raise RuntimeError('Crashed')
+        return score_lines(lines)
+
+    monkeypatch.setattr(stream_scorer, 'score_lines', crash_on_third_chunk)
+    with pytest.raises(RuntimeError):
+        score_stream(input_path, output_path, chunk_size=1, workers=1)
+    assert len(read_output(tmp_path / 'scores.jsonl')) == 5
+
+    monkeypatch.setattr(stream_scorer, 'score_lines', score_lines)
+    stats = score_stream(input_path, output_path, chunk_size=1, workers=1)
+
+    assert stats['lines'] == 6
+    assert [line['recipe'] for line in read_output(tmp_path / 'scores.jsonl')] == ['pudding'] * 3 + ['omelette'] * 2 + ['salmon']
+
+
+def test_output_is_overwritten_without_a_checkpoint(tmp_path):
+    write_jsonl(tmp_path / 'recipes.jsonl')
+    (tmp_path / 'scores.jsonl').write_text('{"recipe": "left over from another run"}\n')
+    input_path, output_path = str(tmp_path / 'recipes.jsonl'), str(tmp_path / 'scores.jsonl')
+
+    score_stream(input_path, output_path, chunk_size=2, workers=1)
+    assert [line['recipe'] for line in read_output(tmp_path / 'scores.jsonl')] == ['pudding'] * 3 + ['omelette'] * 2 + ['salmon']
+
+    # Finished runs are resumed from their checkpoint, with nothing left to score, unless restarted.
+    assert score_stream(input_path, output_path, chunk_size=2, workers=1)['lines'] == 6
+    score_stream(input_path, output_path, chunk_size=2, workers=1, resume=False)
+    assert len(read_output(tmp_path / 'scores.jsonl')) == 6
@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+from core.utils.calculator import lookup_weight, lookup_weight_in_grams, score_ingredient
+from core.utils.weight_index import WeightIndex
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize('description, ingredient', [
+    ('egg', 'egg'),
+    ('eggs', 'egg'),
+    ('tomatoes', 'tomato'),
+    ('cherries', 'cherry'),
+    ('large red onions', 'onion'),
+    ('garlic cloves', 'garlic clove'),
+    ('green beans', 'green beans'),
+    ('green bean', 'green beans'),
+    ('sweet potatoes', 'sweet potato'),
+])
+def test_lookup_weight(description, ingredient):
+    assert lookup_weight(description).ingredient == ingredient
+
+
+def test_default_weight():
+    index = WeightIndex(['egg'], [50], default_grams=100)
+    assert index.lookup('dragon fruit').ingredient is None
+    assert index.lookup('dragon fruit').grams == 100
+    assert index.lookup('').grams == 100
+
+
+def test_whole_ingredients_are_weighed_by_description():
+    # Used to weigh every whole ingredient as an egg.
+    assert score_ingredient('2 potatoes').weight.grams == lookup_weight_in_grams('potato') == 200
+    assert score_ingredient('2 potatoes').score != score_ingredient('2 eggs').score
+    assert score_ingredient('2 cups of milk').weight is None
+
+
+def test_parse_reports_the_weight_entry():
+    details = client.get("/parse/ingredient/3%20tomatoes").json()["details"]
+    assert details["weight"] == {"ingredient": "tomato", "grams": 170.0, "isDefault": False}
+
+    assert "weight" not in client.get("/parse/ingredient/1%20kg%20of%20bacon").json()["details"]